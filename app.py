@@ -1,14 +1,36 @@
 
 import os
-import re
 import json
+import math
+import queue
+import asyncio
+import hashlib
 import logging
-from typing import Dict, List, Any
+import time
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Generator, Iterator, NamedTuple, Optional
 
 import openai
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 
+from clinic_index import ClinicIndexStore
+from dispatcher import (
+    PRIORITY_ACTIVE, PRIORITY_LOW, PRIORITY_NEW, LLMDispatcher, Overloaded, set_request_class
+)
+from i18n_catalog import DEPARTMENTS
+from llm_cache import LLMCache, make_key
+from llm_json import IncrementalJSONExtractor, extract_json
+from metrics import REGISTRY
+from recommender import DepartmentRecommender, consultation_text
+from sessions import SessionStore
+from singleflight import SingleFlight
+from speculation import SpeculativeJobs
+from tokens import estimate_messages_tokens, estimate_tokens, trim_to_budget
+
 logging.basicConfig(
     level=logging.INFO,
     format="[%(asctime)s] %(levelname)s in %(module)s: %(message)s"
@@ -21,7 +43,7 @@ CORS(app)
 # 基本配置
 # ------------------------------------------------------------------
 openai.api_key = os.getenv("DEEPSEEK_API_KEY", "")
-openai.api_base = "https://api.deepseek.com"
+openai.api_base = os.getenv("DEEPSEEK_API_BASE", "https://api.deepseek.com")
 
 CONFIDENCE_THRESHOLD = 75
 DEPARTMENT_LIST = """
@@ -35,6 +57,117 @@ LANG_MAP: Dict[str, str] = {
     "en": "English",
     "id":"Bahasa indonesia"
 }
+# 前端報告頁使用的語言代碼 → LANG_MAP 鍵
+LANG_ALIASES: Dict[str, str] = {"zh_CN": "zhCN", "zh_TW": "zhTW", "ms": "id"}
+
+# LLM 回覆快取：行程內 LRU，設定 LLM_CACHE_DB 時再加一層多 worker 共用的 SQLite
+LLM_CACHE = LLMCache(
+    max_entries=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+    sqlite_path=os.getenv("LLM_CACHE_DB") or None,
+    sqlite_max_entries=int(os.getenv("LLM_CACHE_DB_SIZE", "100000")),
+)
+# 所有上游呼叫經過調度器：並發上限、有界等待佇列（滿了回 503）、重試與斷路器。
+# LLM_ENDPOINT_LIMITS 以 "translate=8,background=4" 形式限制各端點的並發數。
+LLM_DISPATCHER = LLMDispatcher(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "64")),
+    endpoint_limits={
+        k.strip(): int(v)
+        for k, v in (p.split("=", 1) for p in os.getenv("LLM_ENDPOINT_LIMITS", "").split(",") if "=" in p)
+    },
+    max_queue=int(os.getenv("LLM_QUEUE_SIZE", "256")),
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "30")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+    backoff_base=float(os.getenv("LLM_RETRY_BASE", "0.5")),
+    backoff_max=float(os.getenv("LLM_RETRY_MAX", "8")),
+    breaker_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "10")),
+    breaker_cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+)
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+# 相同 messages 的請求在途時，後到者等待同一個結果而不重複呼叫上游
+SINGLE_FLIGHT = SingleFlight()
+# 不走快取的階段（analysis / plain / professional / translate），逗號分隔
+LLM_CACHE_EXCLUDE = {s.strip() for s in os.getenv("LLM_CACHE_EXCLUDE", "").split(",") if s.strip()}
+
+# 彈出確認框時即在背景預先生成專業報告，使用者同意後直接取用
+SPECULATIVE_PROFESSIONAL = os.getenv("SPECULATIVE_PROFESSIONAL", "1") != "0"
+SPECULATIVE = SpeculativeJobs(
+    max_workers=int(os.getenv("SPECULATIVE_WORKERS", "8")),
+    ttl=float(os.getenv("SPECULATIVE_TTL", "600")),
+)
+
+# 分析與簡易總結並行：off / predict（依上一輪置信度）/ always
+PARALLEL_PLAIN_POLICY = os.getenv("PARALLEL_PLAIN_POLICY", "predict")
+PARALLEL_PLAIN_MIN_CONFIDENCE = float(os.getenv("PARALLEL_PLAIN_MIN_CONFIDENCE", "60"))
+PARALLEL_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PARALLEL_WORKERS", "16")), thread_name_prefix="stage"
+)
+PARALLEL_PLAIN_STATS = {"launched": 0, "saved": 0, "wasted": 0}
+_CONFIDENCE_MEMO: "OrderedDict[str, Any]" = OrderedDict()
+_STATE_LOCK = threading.Lock()
+
+# 批次翻譯一次最多處理的（去重後）報告 × 語言數
+TRANSLATE_BATCH_MAX = int(os.getenv("TRANSLATE_BATCH_MAX", "32"))
+
+# 本地科室推薦：專業報告失敗時的後備；DEPARTMENT_SHORTLIST > 0 時
+# prompt 只列出推薦得分最高的 N 個科室（外加綜合科室），縮短 professional 輸入
+RECOMMENDER = DepartmentRecommender()
+DEPARTMENT_SHORTLIST = int(os.getenv("DEPARTMENT_SHORTLIST", "0"))
+
+# 地圖頁的診所查詢：資料集載入一次建成空間 / 倒排索引，檔案更新後自動重載
+CLINIC_INDEX = ClinicIndexStore(
+    os.getenv("CLINIC_DATA", "public/clinic_data_i18n.json"),
+    check_interval=float(os.getenv("CLINIC_DATA_CHECK_INTERVAL", "2")),
+)
+CLINIC_SEARCH_MAX_LIMIT = int(os.getenv("CLINIC_SEARCH_MAX_LIMIT", "500"))
+
+# 伺服器端 session：超過 token 預算時把較早的 turns 壓縮成滾動臨床摘要
+SESSION_STORE = SessionStore(
+    os.getenv("SESSION_DB", ":memory:"), ttl=float(os.getenv("SESSION_TTL", "86400"))
+)
+SESSION_HISTORY_BUDGET = int(os.getenv("SESSION_HISTORY_BUDGET", "1200"))
+SESSION_KEEP_RECENT = int(os.getenv("SESSION_KEEP_RECENT", "4"))
+_COMPACTING: set = set()
+
+# 每階段輸入（system prompt + history）的 token 上限；超出時從最舊的對話開始裁剪。
+# STAGE_TOKEN_BUDGETS 以 "analysis=3000,professional=5000" 形式逐階段覆蓋。
+STAGE_TOKEN_BUDGET = int(os.getenv("STAGE_TOKEN_BUDGET", "6000"))
+STAGE_TOKEN_BUDGETS: Dict[str, int] = {
+    k.strip(): int(v)
+    for k, v in (p.split("=", 1) for p in os.getenv("STAGE_TOKEN_BUDGETS", "").split(",") if "=" in p)
+}
+
+# Prometheus 指標（GET /metrics）；TIMING_HEADERS=1 時回應附帶 Server-Timing 標頭
+TIMING_HEADERS = os.getenv("TIMING_HEADERS", "0") != "0"
+STAGE_SECONDS = REGISTRY.histogram(
+    "clinicai_stage_seconds",
+    "LLM stage call latency (outcome: llm / cache / prefetch / coalesced / error)",
+    ("stage", "lang", "outcome")
+)
+JSON_PARSE_FAILURES = REGISTRY.counter(
+    "clinicai_json_parse_failures_total", "Stage outputs that could not be parsed as JSON",
+    ("stage", "lang")
+)
+STAGE_FALLBACKS = REGISTRY.counter(
+    "clinicai_stage_fallbacks_total", "Stages that failed and fell back to a placeholder or error",
+    ("stage", "lang")
+)
+ANALYSIS_SKIPPED = REGISTRY.counter(
+    "clinicai_analysis_skipped_total", "Turns where the analysis stage was skipped (history > 7)",
+    ("lang",)
+)
+LOCAL_RECOMMENDATIONS = REGISTRY.counter(
+    "clinicai_local_recommendations_total",
+    "Reports whose recommended_specialties came from the local recommender", ("lang",)
+)
+SPECIALTY_CORRECTIONS = REGISTRY.counter(
+    "clinicai_specialty_corrections_total",
+    "LLM recommended_specialties labels fixed up against the department catalog (outcome: fuzzy / unknown)",
+    ("lang", "outcome")
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "clinicai_http_request_seconds", "HTTP request latency", ("endpoint", "method", "status")
+)
 
 # ------------------------------------------------------------------
 # 工具
@@ -43,18 +176,68 @@ LANG_MAP: Dict[str, str] = {
 
 def safe_json_load(text: str) -> dict:
     """
-    從 LLM 輸出中提取第一段 {...} JSON 字符串並解析。
+    從 LLM 輸出中提取第一段 {...} JSON 並解析（略過 ``` 圍欄、前後說明文字）。
     如解析失敗則丟出異常，供上層捕獲。
     """
-    cleaned = text.strip().lstrip("```").rstrip("```").strip()
-    match = re.search(r"\{.*\}", cleaned, re.S)
-    if not match:
-        raise ValueError(f"LLM did not return JSON: {text[:120]}...")
-    return json.loads(match.group(0))
+    return extract_json(text)
+
+
+def validate_specialties(items: Any, lang: str = "") -> List[Dict[str, Any]]:
+    """
+    把 LLM 給的 recommended_specialties 對回科室表的简体鍵（報告頁以此查四語名稱）：
+    別名 / 繁體 / 英文名精確對應，錯字走模糊匹配，對不上的丟棄；同一科室合併置信度，
+    有丟棄或合併時重新分配成總和 100。
+    """
+    merged: Dict[str, float] = {}
+    original: Dict[str, Any] = {}
+    changed = False
+    for item in items if isinstance(items, list) else []:
+        label = item.get("科目") if isinstance(item, dict) else None
+        if not isinstance(label, str):
+            changed = True
+            continue
+        key = DEPARTMENTS.lookup(label)
+        if key is None:
+            found = DEPARTMENTS.match(label)
+            SPECIALTY_CORRECTIONS.inc(metric_lang(lang), "fuzzy" if found else "unknown")
+            if found is None:
+                changed = True
+                continue
+            key = found[0]
+        try:
+            confidence = max(float(item.get("置信度", 0)), 0.0)
+        except (TypeError, ValueError):
+            confidence = 0.0
+        changed |= key in merged
+        merged[key] = merged.get(key, 0.0) + confidence
+        original.setdefault(key, item.get("置信度", 0))
+    total = sum(merged.values())
+    if not changed or total <= 0:
+        return [{"科目": k, "置信度": original[k]} for k in merged]
+    ranked = sorted(merged.items(), key=lambda kv: -kv[1])
+    confidences = [int(round(100 * v / total)) for _, v in ranked]
+    confidences[0] += 100 - sum(confidences)
+    return [{"科目": k, "置信度": c} for (k, _), c in zip(ranked, confidences)]
+
+
+def build_professional_prompt(lang: str, departments: str = DEPARTMENT_LIST) -> str:
+    """專業報告 prompt；departments 可換成縮短後的科室列表"""
+    lang_label = LANG_MAP.get(lang, "简体中文")
+    return (
+        f"You are a professional doctor, generate  medical of the user summaries based on chatlog Generate:\n"
+        f"1. medical_summary (professional)\n"
+        f"2. plain_summary (patient‑friendly)\n"
+        f"3. recommended_specialties (1‑3 from list, total confidence = 100)\n\n"
+        f"Department list:\n{departments}\n\n"
+        f"Respond **in {lang_label}**.\n\n"
+        f"Output JSON:\n{{\n  \"medical_summary\": \"...\",\n"
+        f"  \"plain_summary\": \"...\",\n"
+        f"  \"recommended_specialties\": [{{\"科目\":\"...\", \"置信度\": number}}]\n}}"
+    )
 
 
 def build_prompts(lang: str) -> Dict[str, str]:
-    """動態構造三個 prompt，根據語言插入指示"""
+    """構造各階段的 system prompt，根據語言插入指示（translate 的目標語言即 lang）"""
     lang_label = LANG_MAP.get(lang, "简体中文")
 
     analysis_prompt = (
@@ -72,143 +255,910 @@ def build_prompts(lang: str) -> Dict[str, str]:
         f"Output JSON:\n{{\n  \"plain_summary\": \"...\"\n}}"
     )
 
-    professional_prompt = (
-        f"You are a professional doctor, generate  medical of the user summaries based on chatlog Generate:\n"
-        f"1. medical_summary (professional)\n"
-        f"2. plain_summary (patient‑friendly)\n"
-        f"3. recommended_specialties (1‑3 from list, total confidence = 100)\n\n"
-        f"Department list:\n{DEPARTMENT_LIST}\n\n"
-        f"Respond **in {lang_label}**.\n\n"
-        f"Output JSON:\n{{\n  \"medical_summary\": \"...\",\n"
-        f"  \"plain_summary\": \"...\",\n"
-        f"  \"recommended_specialties\": [{{\"科目\":\"...\", \"置信度\": number}}]\n}}"
+    professional_prompt = build_professional_prompt(lang)
+
+    compaction_prompt = (
+        f"You are a clinical scribe. Merge the existing summary and the new conversation turns "
+        f"into one concise clinical summary of the patient's case so far: symptoms, onset, duration, "
+        f"severity, relevant negatives, history, medications and what has already been asked. "
+        f"Do not add diagnoses that were not discussed. Respond **in {lang_label}**.\n\n"
+        f"Output JSON:\n{{\n  \"clinical_summary\": \"...\"\n}}"
     )
 
-    return {"analysis": analysis_prompt, "plain": plain_prompt, "professional": professional_prompt}
+    translate_prompt = (
+        f"You are a medical translator. Translate the text to "
+        f"{LANG_MAP.get(lang, 'English')} in the same medical style.\n\n"
+        f"Output JSON:\n{{\n  \"medical_summary_translated\": \"...\",\n"
+        f"  \"plain_summary_translated\": \"...\"\n}}"
+    )
+
+    return {"analysis": analysis_prompt, "plain": plain_prompt, "professional": professional_prompt,
+            "compaction": compaction_prompt, "translate": translate_prompt}
+
+
+# 各語言的 prompt 在啟動時一次建好；未知語言沿用 build_prompts 的預設
+PROMPTS: Dict[str, Dict[str, str]] = {lang: build_prompts(lang) for lang in LANG_MAP}
+_FALLBACK_PROMPTS = build_prompts("")
+
+
+def get_prompts(lang: str) -> Dict[str, str]:
+    return PROMPTS.get(lang, _FALLBACK_PROMPTS)
 
 
 def chat_complete(messages: List[dict], **kwargs) -> Any:
-    return openai.ChatCompletion.create(
+    return LLM_DISPATCHER.call(
+        openai.ChatCompletion.create,
         model="deepseek-chat",
         messages=messages,
         stream=False,
+        request_timeout=LLM_REQUEST_TIMEOUT,
         **kwargs
     )
 
 
+async def achat_complete(messages: List[dict], **kwargs) -> Any:
+    """chat_complete 的非同步版本；連線池由呼叫端透過 openai.aiosession 提供"""
+    return await LLM_DISPATCHER.acall(
+        openai.ChatCompletion.acreate,
+        model="deepseek-chat",
+        messages=messages,
+        stream=False,
+        request_timeout=LLM_REQUEST_TIMEOUT,
+        **kwargs
+    )
+
+
+def chat_stream(messages: List[dict], **kwargs) -> Iterator[str]:
+    """以 stream=True 呼叫模型，逐段產出 content 增量；整個串流期間占用一個調度名額"""
+    resp = LLM_DISPATCHER.stream(
+        openai.ChatCompletion.create,
+        model="deepseek-chat",
+        messages=messages,
+        stream=True,
+        request_timeout=LLM_REQUEST_TIMEOUT,
+        **kwargs
+    )
+    for chunk in resp:
+        piece = chunk["choices"][0].get("delta", {}).get("content")
+        if piece:
+            yield piece
+
+
+# on_delta(field, text)：每當 stream_field 有新文字生成時回呼
+DeltaCallback = Callable[[str, str], None]
+
+
+def cache_key(stage: str, messages: List[dict]) -> Optional[str]:
+    """回傳快取鍵；該階段已設定不走快取時回傳 None"""
+    if stage in LLM_CACHE_EXCLUDE:
+        return None
+    return make_key("deepseek-chat", messages)
+
+
+def complete_text(messages: List[dict]) -> str:
+    return chat_complete(messages).choices[0].message.content
+
+
+async def acomplete_text(messages: List[dict]) -> str:
+    return (await achat_complete(messages)).choices[0].message.content
+
+
+# 目前請求的 token 記帳列表；由 start_token_accounting() 在每個請求開始時設定
+_TOKEN_USAGE: contextvars.ContextVar[Optional[List[dict]]] = contextvars.ContextVar(
+    "token_usage", default=None
+)
+# 目前請求的語言，作為指標的 lang 標籤
+_REQUEST_LANG: contextvars.ContextVar[str] = contextvars.ContextVar("request_lang", default="")
+# 前端「重新生成」（請求帶 "regenerate": true）：不查快取，新的輸出照常寫回、取代舊的
+_CACHE_BYPASS: contextvars.ContextVar[bool] = contextvars.ContextVar("cache_bypass", default=False)
+
+
+def start_token_accounting(lang: str = "", regenerate: bool = False) -> List[dict]:
+    usage: List[dict] = []
+    _TOKEN_USAGE.set(usage)
+    _REQUEST_LANG.set(lang)
+    _CACHE_BYPASS.set(regenerate)
+    return usage
+
+
+def cached_text(key: Optional[str]) -> Optional[str]:
+    """查 LLM 快取；沒有鍵或本請求要求重新生成時視為未命中"""
+    if not key or _CACHE_BYPASS.get():
+        return None
+    return LLM_CACHE.get(key)
+
+
+def report_token_usage(endpoint: str, usage: List[dict]) -> None:
+    if usage:
+        logging.info("token usage %s: %s", endpoint, json.dumps(usage, ensure_ascii=False))
+
+
+def metric_lang(lang: Optional[str] = None) -> str:
+    """lang 標籤只取已知語言，避免任意輸入撐爆指標基數"""
+    lang = _REQUEST_LANG.get() if lang is None else lang
+    return lang if lang in LANG_MAP else "other"
+
+
+def server_timing(elapsed: float) -> str:
+    """把目前請求各階段的耗時與總耗時轉成 Server-Timing 標頭值"""
+    parts = [
+        f'{u["stage"] or "llm"};dur={u["duration_ms"]};desc="{u["source"]}"'
+        for u in _TOKEN_USAGE.get() or []
+    ]
+    parts.append(f"total;dur={elapsed * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def apply_stage_budget(stage: str, messages: List[dict]) -> tuple[List[dict], int]:
+    return trim_to_budget(messages, STAGE_TOKEN_BUDGETS.get(stage, STAGE_TOKEN_BUDGET))
+
+
+def record_usage(
+        stage: str, messages: List[dict], completion: str, source: str, trimmed: int, started: float
+) -> None:
+    """記錄一次階段呼叫的耗時與 token 估算：prompt = system 訊息，history = 其餘訊息"""
+    elapsed = time.perf_counter() - started
+    STAGE_SECONDS.observe(elapsed, stage, metric_lang(), source)
+    usage = _TOKEN_USAGE.get()
+    if usage is None:
+        return
+    system = [m for m in messages if m.get("role") == "system"]
+    prompt_tokens = estimate_messages_tokens(system)
+    usage.append({
+        "stage": stage,
+        "prompt_tokens": prompt_tokens,
+        "history_tokens": estimate_messages_tokens(messages) - prompt_tokens,
+        "completion_tokens": estimate_tokens(completion),
+        "source": source,            # llm / cache / prefetch / coalesced
+        "trimmed_messages": trimmed,
+        "duration_ms": round(elapsed * 1000, 1),
+    })
+
+
+def record_failure(stage: str, started: float) -> None:
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage, metric_lang(), "error")
+
+
+def parse_stage_output(stage: str, text: str) -> dict:
+    """extract_json 並統計解析失敗次數"""
+    try:
+        return extract_json(text)
+    except ValueError:
+        JSON_PARSE_FAILURES.inc(stage, metric_lang())
+        raise
+
+
+def fetch_stage_text(messages: List[dict], stage: str = "") -> str:
+    """非串流地取得某階段的原始輸出（先查快取），確認可解析後才寫入快取"""
+    started = time.perf_counter()
+    messages, trimmed = apply_stage_budget(stage, messages)
+    key = cache_key(stage, messages)
+    cached = cached_text(key)
+    if cached is not None:
+        record_usage(stage, messages, cached, "cache", trimmed, started)
+        return cached
+    try:
+        text, shared = SINGLE_FLIGHT.do(
+            key or make_key("deepseek-chat", messages), complete_text, messages
+        )
+    except Exception:
+        record_failure(stage, started)
+        raise
+    record_usage(stage, messages, text, "coalesced" if shared else "llm", trimmed, started)
+    parse_stage_output(stage, text)
+    if key and not shared:
+        LLM_CACHE.set(key, text)
+    return text
+
+
+def run_stage(
+        messages: List[dict],
+        stream_field: Optional[str] = None,
+        on_delta: Optional[DeltaCallback] = None,
+        stage: str = "",
+        prefetched: Optional[str] = None
+) -> dict:
+    """
+    執行單個 LLM 階段並回傳解析後的 JSON。
+    提供 on_delta 時改用串流模式，邊收邊解析，並把 stream_field 的增量即時回呼出去。
+    命中快取或已有 prefetched 輸出時不發出請求；只有成功解析的輸出才寫入快取。
+    """
+    started = time.perf_counter()
+    if prefetched is not None and on_delta is None:
+        record_usage(stage, messages, prefetched, "prefetch", 0, started)
+        return parse_stage_output(stage, prefetched)
+    if on_delta is None:
+        return parse_stage_output(stage, fetch_stage_text(messages, stage))
+
+    messages, trimmed = apply_stage_budget(stage, messages)
+    key = cache_key(stage, messages) if prefetched is None else None
+    cached = cached_text(key) if key else prefetched
+    source = "cache" if prefetched is None else "prefetch"
+    flight = None
+    if cached is None:
+        # 相同請求已在途：等它的完整輸出，當作一次性的快取結果送出
+        flight_key = key or make_key("deepseek-chat", messages)
+        fut, leader = SINGLE_FLIGHT.claim(flight_key)
+        if leader:
+            flight = (flight_key, fut)
+            source = "llm"
+        else:
+            try:
+                cached = fut.result()
+            except Exception:
+                record_failure(stage, started)
+                raise
+            source = "coalesced"
+
+    parser = IncrementalJSONExtractor()
+    pieces: List[str] = []
+    sent = ""
+    try:
+        for piece in ([cached] if cached is not None else chat_stream(messages)):
+            pieces.append(piece)
+            parser.feed(piece)
+            if stream_field:
+                current = parser.partial(stream_field)
+                if len(current) > len(sent):
+                    on_delta(stream_field, current[len(sent):])
+                    sent = current
+            if parser.closed:
+                break
+    except BaseException as e:
+        if flight:
+            SINGLE_FLIGHT.finish(*flight, error=e)
+        if isinstance(e, Exception):
+            record_failure(stage, started)
+        raise
+    text = "".join(pieces)
+    if flight:
+        SINGLE_FLIGHT.finish(*flight, text)
+    record_usage(stage, messages, text, source, trimmed, started)
+    try:
+        out = parser.result()
+    except ValueError:
+        JSON_PARSE_FAILURES.inc(stage, metric_lang())
+        raise
+    if key and flight:
+        LLM_CACHE.set(key, text)
+    return out
+
+
+async def arun_stage(messages: List[dict], stage: str = "") -> dict:
+    started = time.perf_counter()
+    messages, trimmed = apply_stage_budget(stage, messages)
+    key = cache_key(stage, messages)
+    cached = cached_text(key)
+    if cached is not None:
+        record_usage(stage, messages, cached, "cache", trimmed, started)
+        return parse_stage_output(stage, cached)
+    try:
+        text, shared = await SINGLE_FLIGHT.ado(
+            key or make_key("deepseek-chat", messages), acomplete_text, messages
+        )
+    except Exception:
+        record_failure(stage, started)
+        raise
+    record_usage(stage, messages, text, "coalesced" if shared else "llm", trimmed, started)
+    out = parse_stage_output(stage, text)
+    if key and not shared:
+        LLM_CACHE.set(key, text)
+    return out
+
+
 # ------------------------------------------------------------------
 # 核心邏輯
 # ------------------------------------------------------------------
 
 
-def generate_plain_summary(history: List[dict], prompt: str) -> dict:
+class StageCall(NamedTuple):
+    """
+    流程中的一次 LLM 呼叫，由同步或非同步驅動器實際執行。
+    prefetch 為推測任務的 Future（結果是原始輸出文本）；成功時直接取用，失敗則照常呼叫。
+    """
+    name: str
+    messages: List[dict]
+    stream_field: Optional[str] = None
+    prefetch: Optional[Future] = None
+
+
+def _prefetched_text(call: StageCall) -> Optional[str]:
+    if call.prefetch is None:
+        return None
     try:
-        resp = chat_complete([{"role": "system", "content": prompt}] + history)
-        return safe_json_load(resp.choices[0].message.content)
+        return call.prefetch.result()
+    except Exception:
+        SPECULATIVE.record_failure()
+        return None
+
+
+async def _aprefetched_text(call: StageCall) -> Optional[str]:
+    if call.prefetch is None:
+        return None
+    try:
+        return await asyncio.wrap_future(call.prefetch)
+    except Exception:
+        SPECULATIVE.record_failure()
+        return None
+
+
+# conversation_flow 等流程以 generator 表示：yield StageCall 取得解析後的 JSON，
+# 呼叫失敗時驅動器把例外 throw 回 generator，最後以 return 交出結果。
+# yield 一個 StageCall 列表則表示並行執行，送回的是結果列表（失敗者為 Exception 物件）。
+Flow = Generator[StageCall | List[StageCall], Any, Dict[str, Any]]
+
+
+def _run_call(call: StageCall, on_delta: Optional[DeltaCallback] = None) -> dict:
+    return run_stage(call.messages, call.stream_field, on_delta, call.name, _prefetched_text(call))
+
+
+async def _arun_call(call: StageCall) -> dict:
+    text = await _aprefetched_text(call)
+    started = time.perf_counter()
+    if text is not None:
+        record_usage(call.name, call.messages, text, "prefetch", 0, started)
+        return parse_stage_output(call.name, text)
+    return await arun_stage(call.messages, call.name)
+
+
+def _run_parallel(calls: List[StageCall], on_delta: Optional[DeltaCallback]) -> List[Any]:
+    """第一個呼叫在目前執行緒執行（保留串流），其餘丟到 PARALLEL_POOL；例外以值的形式回傳"""
+    # 複製 contextvars，讓並行階段也記入目前請求的 token 帳
+    futures = [PARALLEL_POOL.submit(contextvars.copy_context().run, _run_call, c) for c in calls[1:]]
+    results: List[Any] = []
+    try:
+        results.append(_run_call(calls[0], on_delta))
     except Exception as e:
-        return {"plain_summary": "生成簡易總結失敗", "error": str(e)}
+        results.append(e)
+    for fut in futures:
+        try:
+            results.append(fut.result())
+        except Exception as e:
+            results.append(e)
+    return results
 
 
-def analysis_ai_decide_next_step(
+def drive_flow(flow: Flow, on_delta: Optional[DeltaCallback] = None) -> Dict[str, Any]:
+    """同步驅動：每個 StageCall 經 run_stage 執行；yield 列表時並行執行並回傳結果列表"""
+    try:
+        call = next(flow)
+        while True:
+            if isinstance(call, list):
+                call = flow.send(_run_parallel(call, on_delta))
+                continue
+            try:
+                out = _run_call(call, on_delta)
+            except Exception as e:
+                call = flow.throw(e)
+            else:
+                call = flow.send(out)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def adrive_flow(flow: Flow) -> Dict[str, Any]:
+    """非同步驅動：每個 StageCall 經 arun_stage 執行，不佔用執行緒"""
+    try:
+        call = next(flow)
+        while True:
+            if isinstance(call, list):
+                results = await asyncio.gather(*(_arun_call(c) for c in call), return_exceptions=True)
+                call = flow.send(list(results))
+                continue
+            try:
+                out = await _arun_call(call)
+            except Exception as e:
+                call = flow.throw(e)
+            else:
+                call = flow.send(out)
+    except StopIteration as stop:
+        return stop.value
+
+
+def fetch_in_background(lang: str, messages: List[dict], stage: str) -> str:
+    """在背景執行緒執行 fetch_stage_text；背景執行緒沒有請求上下文，指標標籤沿用發起者的 lang"""
+    _REQUEST_LANG.set(lang)
+    set_request_class("background", PRIORITY_LOW)
+    return fetch_stage_text(messages, stage)
+
+
+def history_digests(lang: str, history: List[dict]) -> List[str]:
+    """
+    逐條累積的對話摘要：第 i 個元素對應 history[:i + 1]。
+    只看 role / content，前端附帶的 id 等欄位不影響結果。
+    """
+    h = hashlib.sha256(lang.encode("utf-8"))
+    out: List[str] = []
+    for m in history:
+        h.update(json.dumps([m.get("role"), m.get("content")], ensure_ascii=False).encode("utf-8"))
+        out.append(h.hexdigest())
+    return out
+
+
+def _remember_confidence(digest: str, confidence: Any) -> None:
+    if not isinstance(confidence, (int, float)):
+        return
+    with _STATE_LOCK:
+        _CONFIDENCE_MEMO[digest] = confidence
+        _CONFIDENCE_MEMO.move_to_end(digest)
+        while len(_CONFIDENCE_MEMO) > 10000:
+            _CONFIDENCE_MEMO.popitem(last=False)
+
+
+def predict_plain_needed(digests: List[str]) -> bool:
+    """
+    預測本輪分析是否會跨過 CONFIDENCE_THRESHOLD。
+    predict 策略看上一輪（history 少掉最後一問一答）的置信度是否已達
+    PARALLEL_PLAIN_MIN_CONFIDENCE。
+    """
+    if PARALLEL_PLAIN_POLICY == "always":
+        return True
+    if PARALLEL_PLAIN_POLICY != "predict" or len(digests) < 3:
+        return False
+    with _STATE_LOCK:
+        prev = _CONFIDENCE_MEMO.get(digests[-3])
+    return prev is not None and prev >= PARALLEL_PLAIN_MIN_CONFIDENCE
+
+
+def professional_messages(lang: str, history: List[dict]) -> List[dict]:
+    """
+    專業報告的 messages。開啟 DEPARTMENT_SHORTLIST 時科室列表只保留本地推薦的前幾名；
+    列表只由 history 決定，推測式預生成與同意後的請求仍得到相同的快取鍵。
+    """
+    if DEPARTMENT_SHORTLIST > 0:
+        departments = RECOMMENDER.shortlist(consultation_text(history), DEPARTMENT_SHORTLIST)
+        prompt = build_professional_prompt(lang, "、".join(departments))
+    else:
+        prompt = get_prompts(lang)["professional"]
+    return [{"role": "system", "content": prompt}] + history
+
+
+def _count_parallel(name: str) -> None:
+    with _STATE_LOCK:
+        PARALLEL_PLAIN_STATS[name] += 1
+
+
+def conversation_flow(
         full_history: List[dict],
         lang: str = "zhCN",
         approval: bool | None = None,
-        refusal_times: int = 0
-) -> Dict[str, Any]:
+        refusal_times: int = 0,
+        turn_count: Optional[int] = None
+) -> Flow:
     """
     根据对话历史、审批状态与拒绝次数决定后续动作。
     - full_history: 聊天记录（用户+AI）
     - lang: 多语言支持
     - approval: None=未确认 / True=同意 / False=拒绝
     - refusal_times: 已累计的拒绝次数（由上层逻辑透传）
+    - turn_count: 实际对话条数；history 经过压缩时由 session 传入
     """
-    prompts = build_prompts(lang)
-    skip_analysis = len(full_history) > 7
+    prompts = get_prompts(lang)
+    skip_analysis = (len(full_history) if turn_count is None else turn_count) > 7
+    if skip_analysis:
+        ANALYSIS_SKIPPED.inc(metric_lang(lang))
+
+    # 推測任務：同意時取出預先生成的專業報告；拒絕或對話改變時丟棄
+    digests = history_digests(lang, full_history)
+    prefetch = None
+    if digests:
+        if approval is True:
+            prefetch = SPECULATIVE.take(digests[-1])
+        elif approval is False:
+            SPECULATIVE.discard(digests[-1])
+        else:
+            SPECULATIVE.discard_groups(digests)
     
 
-    # ——— 阶段 1：分析 ——— #
-    if not skip_analysis:
-        try:
-            stage1 = chat_complete(
-                [{"role": "system", "content": prompts["analysis"]}] + full_history
+    # 取出的推測任務只在專業報告階段用上；其他出口（分析失敗、過載、未同意等）一律放掉
+    try:
+        # ——— 阶段 1：分析 ——— #
+        plain_call = StageCall(
+            "plain",
+            [{"role": "system", "content": prompts["plain"]}] + full_history,
+            "plain_summary"
+        )
+        early_plain: Any = None
+        if not skip_analysis:
+            analysis_call = StageCall(
+                "analysis",
+                [{"role": "system", "content": prompts["analysis"]}] + full_history,
+                "next_question"
             )
-            s1 = safe_json_load(stage1.choices[0].message.content)
-        except Exception as e:
-            return {"error": f"分析階段錯誤：{e}"}
-    else:
-        # 跳过分析阶段，直接给一个足够高的置信度
-        s1 = {
-            "analysis_text": "",
-            "confidence_level": CONFIDENCE_THRESHOLD,
-            "next_question": ""
+            if approval is None and predict_plain_needed(digests):
+                # 預測本輪會跨過閾值：分析與簡易總結同時發出
+                _count_parallel("launched")
+                s1, early_plain = yield [analysis_call, plain_call]
+                if isinstance(s1, Exception):
+                    # 分析失敗：並行生成的簡易總結同樣用不上
+                    _count_parallel("wasted")
+                if isinstance(s1, Overloaded):
+                    raise s1
+                if isinstance(s1, Exception):
+                    STAGE_FALLBACKS.inc("analysis", metric_lang(lang))
+                    return {"error": f"分析階段錯誤：{s1}"}
+            else:
+                try:
+                    s1 = yield analysis_call
+                except Overloaded:
+                    raise
+                except Exception as e:
+                    STAGE_FALLBACKS.inc("analysis", metric_lang(lang))
+                    return {"error": f"分析階段錯誤：{e}"}
+            if digests:
+                _remember_confidence(digests[-1], s1.get("confidence_level"))
+        else:
+            # 跳过分析阶段，直接给一个足够高的置信度
+            s1 = {
+                "analysis_text": "",
+                "confidence_level": CONFIDENCE_THRESHOLD,
+                "next_question": ""
+            }
+
+        result: Dict[str, Any] = {
+            "hidden_analysis": s1.get("analysis_text", ""),
+            "confidence_level": s1.get("confidence_level", 0),
+            "next_question": s1.get("next_question", ""),
+            "done": False,
+            "plain_summary": "",
+            "medical_summary": "",
+            "recommended_specialties": [],
+            "needsApproval": False,
+            "refusal_times": refusal_times     # 回传当前拒绝次数
         }
 
-    result: Dict[str, Any] = {
-        "hidden_analysis": s1.get("analysis_text", ""),
-        "confidence_level": s1.get("confidence_level", 0),
-        "next_question": s1.get("next_question", ""),
-        "done": False,
-        "plain_summary": "",
-        "medical_summary": "",
-        "recommended_specialties": [],
-        "needsApproval": False,
-        "refusal_times": refusal_times     # 回传当前拒绝次数
+        # ——— 阶段 2：总结 ——— #
+        if result["confidence_level"] >= CONFIDENCE_THRESHOLD:
+            # ❶ 尚未确认 —— 生成简易总结，请求用户批准
+            if approval is None:
+                if early_plain is not None:
+                    _count_parallel("saved")
+                    ps = early_plain
+                else:
+                    try:
+                        ps = yield plain_call
+                    except Exception as e:
+                        ps = e
+                if isinstance(ps, Overloaded):
+                    raise ps
+                if isinstance(ps, Exception):
+                    STAGE_FALLBACKS.inc("plain", metric_lang(lang))
+                    ps = {"plain_summary": "生成簡易總結失敗", "error": str(ps)}
+                result.update({
+                    "plain_summary": ps.get("plain_summary", "生成简易总结失败"),
+                    "needsApproval": True
+                })
+                if SPECULATIVE_PROFESSIONAL and "error" not in ps and digests:
+                    # 前端同意时送回的 history = 目前 history + 這則簡易總結
+                    anticipated = full_history + [{"role": "assistant", "content": result["plain_summary"]}]
+                    SPECULATIVE.start(
+                        history_digests(lang, anticipated)[-1],
+                        fetch_in_background,
+                        lang,
+                        professional_messages(lang, anticipated),
+                        "professional",
+                        group=digests[-1]
+                    )
+
+            # ❷ 用户同意 —— 生成专业总结
+            elif approval is True:
+                try:
+                    call = StageCall(
+                        "professional",
+                        professional_messages(lang, full_history),
+                        "plain_summary",
+                        prefetch
+                    )
+                    prefetch = None     # 交給專業報告階段（不論成敗都算用上）
+                    pdata = yield call
+                except Overloaded:
+                    raise
+                except Exception:
+                    STAGE_FALLBACKS.inc("professional", metric_lang(lang))
+                    pdata = {"medical_summary": "生成失败", "plain_summary": "生成失败",
+                             "recommended_specialties": []}
+                pdata["recommended_specialties"] = validate_specialties(pdata.get("recommended_specialties"), lang)
+                if not pdata["recommended_specialties"]:
+                    # LLM 失敗或沒給出科室時改用本地推薦，報告頁仍可跳轉地圖
+                    LOCAL_RECOMMENDATIONS.inc(metric_lang(lang))
+                    pdata["recommended_specialties"] = RECOMMENDER.recommend(consultation_text(full_history))
+
+                result.update({
+                    "medical_summary": pdata.get("medical_summary", ""),
+                    "plain_summary": pdata.get("plain_summary", ""),
+                    "recommended_specialties": pdata.get("recommended_specialties", []),
+                    "done": True,
+                    "needsApproval": False,
+                    "next_question": ""
+                })
+
+            # ❸ 用户拒绝 —— 触发 5 + 5 重试逻辑
+            else:  # approval is False
+                refusal_times += 1
+                result["refusal_times"] = refusal_times
+
+                if refusal_times <= 10:
+                    # 前 10 次拒绝仍尝试再次确认
+                    result.update({
+                        "needsApproval": True,
+                        # 可以自定义提示语；此处重用原 next_question 或 prompts["approval"]
+                        "next_question": prompts.get("approval", "请再次确认您是否同意生成完整报告？")
+                    })
+                else:
+                    # 超过 10 次，视为彻底拒绝
+                    result["confidence_level"] = 0
+                    result["needsApproval"] = False
+
+        elif early_plain is not None:
+            # 預測失準：並行生成的簡易總結用不上
+            _count_parallel("wasted")
+        return result
+    finally:
+        if prefetch is not None:
+            SPECULATIVE.release(prefetch)
+
+
+def set_consultation_class(full_history: List[dict], approval: bool | None) -> None:
+    """已有 AI 回覆或正在確認的問診，呼叫 LLM 時優先於新問診"""
+    in_progress = approval is not None or any(m.get("role") == "assistant" for m in full_history)
+    set_request_class("conversation", PRIORITY_ACTIVE if in_progress else PRIORITY_NEW)
+
+
+def analysis_ai_decide_next_step(
+        full_history: List[dict],
+        lang: str = "zhCN",
+        approval: bool | None = None,
+        refusal_times: int = 0,
+        on_delta: Optional[DeltaCallback] = None,
+        turn_count: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    同步執行 conversation_flow。
+    - on_delta: 串流回呼；提供時各階段改用 stream 模式並即時推送文字
+    """
+    set_consultation_class(full_history, approval)
+    return drive_flow(
+        conversation_flow(full_history, lang, approval, refusal_times, turn_count), on_delta
+    )
+
+
+async def analysis_ai_decide_next_step_async(
+        full_history: List[dict],
+        lang: str = "zhCN",
+        approval: bool | None = None,
+        refusal_times: int = 0,
+        turn_count: Optional[int] = None
+) -> Dict[str, Any]:
+    """conversation_flow 的非同步版本，供 ASGI 入口（asgi.py）使用"""
+    set_consultation_class(full_history, approval)
+    return await adrive_flow(
+        conversation_flow(full_history, lang, approval, refusal_times, turn_count)
+    )
+
+
+# ------------------------------------------------------------------
+# Session 與歷史壓縮
+# ------------------------------------------------------------------
+
+
+def session_history(sess: Dict[str, Any]) -> List[dict]:
+    """送給模型的 history：滾動摘要 + 尚未壓縮的 turns"""
+    history = [dict(t) for t in sess["turns"][sess["summary_upto"]:]]
+    if sess["summary"]:
+        history.insert(0, {
+            "role": "system",
+            "content": f"Clinical summary of the earlier conversation:\n{sess['summary']}"
+        })
+    return history
+
+
+def compact_session(sid: str) -> bool:
+    """history 超過 SESSION_HISTORY_BUDGET 時，把最近 SESSION_KEEP_RECENT 條以外的 turns 併入摘要"""
+    with _STATE_LOCK:
+        if sid in _COMPACTING:
+            return False
+        _COMPACTING.add(sid)
+    try:
+        sess = SESSION_STORE.get(sid)
+        if sess is None or estimate_messages_tokens(session_history(sess)) <= SESSION_HISTORY_BUDGET:
+            return False
+        # 在發起請求的 context 副本中執行：語言 / 優先級只影響本任務；
+        # 壓縮的 token 用量不記入已回應的那個請求
+        _REQUEST_LANG.set(sess["lang"])
+        _TOKEN_USAGE.set(None)
+        set_request_class("background", PRIORITY_LOW)
+        upto = len(sess["turns"]) - SESSION_KEEP_RECENT
+        if upto <= sess["summary_upto"]:
+            return False
+        chunk = sess["turns"][sess["summary_upto"]:upto]
+        content = (
+            f"Existing summary:\n{sess['summary'] or '(none)'}\n\n"
+            f"New conversation turns:\n" + "\n".join(f"{t['role']}: {t['content']}" for t in chunk)
+        )
+        out = run_stage(
+            [{"role": "system", "content": get_prompts(sess["lang"])["compaction"]},
+             {"role": "user", "content": content}],
+            stage="compaction"
+        )
+        summary = out.get("clinical_summary", "")
+        if not summary:
+            return False
+        SESSION_STORE.update(sid, summary=summary, summary_upto=upto)
+        return True
+    except Exception as e:
+        logging.warning("session %s compaction failed: %s", sid, e)
+        return False
+    finally:
+        with _STATE_LOCK:
+            _COMPACTING.discard(sid)
+
+
+def session_turn(sid: str, data: Dict[str, Any]) -> tuple[int, Dict[str, Any]]:
+    """
+    處理 session 的一輪：追加使用者訊息（可省略，例如只回覆 approval），
+    以壓縮後的 history 執行 conversation_flow，再把助手回覆寫回 session。
+    """
+    sess = SESSION_STORE.get(sid)
+    if sess is None:
+        return 404, {"error": "session not found"}
+    lang = data.get("lang") or sess["lang"]
+    if lang != sess["lang"]:
+        SESSION_STORE.update(sid, lang=lang)
+    approval = data.get("approval")
+
+    message = (data.get("message") or "").strip()
+    if message:
+        SESSION_STORE.append(sid, "user", message)
+        sess["turns"].append({"role": "user", "content": message})
+
+    history = session_history(sess)
+    usage = start_token_accounting(lang, bool(data.get("regenerate")))
+    answer = analysis_ai_decide_next_step(
+        history, lang, approval, sess["refusal_times"], turn_count=len(sess["turns"])
+    )
+    report_token_usage("session_turn", usage)
+    if "error" in answer:
+        return 500, {"error": answer["error"]}
+
+    if answer["needsApproval"] and approval is None:
+        reply = answer["plain_summary"]
+    else:
+        reply = answer["next_question"] or answer["plain_summary"]
+    if reply:
+        SESSION_STORE.append(sid, "assistant", reply)
+    SESSION_STORE.update(sid, refusal_times=answer["refusal_times"])
+
+    # 等待確認時不壓縮，確保同意請求的 history 與推測任務一致
+    if not answer["needsApproval"]:
+        PARALLEL_POOL.submit(contextvars.copy_context().run, compact_session, sid)
+
+    answer.update({"session_id": sid, "history_tokens": estimate_messages_tokens(history)})
+    if data.get("debug"):
+        answer["token_usage"] = usage
+    return 200, answer
+
+
+def build_translate_messages(data: dict) -> List[dict]:
+    to_trans = (
+        f"medical_summary:\n{data.get('medical_summary','')}\n\n"
+        f"plain_summary:\n{data.get('plain_summary','')}"
+    )
+    target = data.get("targetLang", "en")
+    prompt = PROMPTS.get(LANG_ALIASES.get(target, target), PROMPTS["en"])["translate"]
+    return [{"role": "system", "content": prompt},
+            {"role": "user", "content": to_trans}]
+
+
+def format_translation(out: dict, data: dict) -> Dict[str, Any]:
+    return {
+        "medical_summary": out.get("medical_summary_translated", ""),
+        "plain_summary": out.get("plain_summary_translated", ""),
+        "recommended_specialties": data.get("recommended_specialties", [])
     }
 
-    # ——— 阶段 2：总结 ——— #
-    if result["confidence_level"] >= CONFIDENCE_THRESHOLD:
-        # ❶ 尚未确认 —— 生成简易总结，请求用户批准
-        if approval is None:
-            ps = generate_plain_summary(full_history, prompts["plain"])
-            result.update({
-                "plain_summary": ps.get("plain_summary", "生成简易总结失败"),
-                "needsApproval": True
-            })
 
-        # ❷ 用户同意 —— 生成专业总结
-        elif approval is True:
-            try:
-                prof = chat_complete(
-                    [{"role": "system", "content": prompts["professional"]}] + full_history
-                )
-                pdata = safe_json_load(prof.choices[0].message.content)
-            except Exception:
-                pdata = {"medical_summary": "生成失败", "plain_summary": "生成失败",
-                         "recommended_specialties": []}
-
-            result.update({
-                "medical_summary": pdata.get("medical_summary", ""),
-                "plain_summary": pdata.get("plain_summary", ""),
-                "recommended_specialties": pdata.get("recommended_specialties", []),
-                "done": True,
-                "needsApproval": False,
-                "next_question": ""
+def plan_translation_batch(data: dict) -> tuple[List[dict], List[str], Dict[str, dict]]:
+    """
+    批次翻譯：data 為單份報告（或 reports 列表）加上 targetLangs。
+    以（兩段摘要, 目標語言）的內容雜湊去重，相同內容只翻譯一次。
+    回傳 (reports, 請求的語言代碼, {雜湊: 單次翻譯的請求資料})；參數不合法時丟出 ValueError。
+    """
+    if not isinstance(data, dict):
+        raise ValueError("request body must be a JSON object")
+    reports = data.get("reports") or [data]
+    if not isinstance(reports, list) or not all(isinstance(r, dict) for r in reports):
+        raise ValueError("reports must be a list of objects")
+    langs = data.get("targetLangs")
+    if not isinstance(langs, list) or not langs or not all(isinstance(l, str) for l in langs):
+        raise ValueError("targetLangs must be a non-empty list of strings")
+    langs = list(dict.fromkeys(langs))
+    unknown = [l for l in langs if LANG_ALIASES.get(l, l) not in LANG_MAP]
+    if unknown:
+        raise ValueError(f"unsupported targetLangs: {', '.join(map(str, unknown))}")
+
+    jobs: Dict[str, dict] = {}
+    for report in reports:
+        for lang in langs:
+            jobs.setdefault(translation_hash(report, lang), {
+                "medical_summary": report.get("medical_summary", ""),
+                "plain_summary": report.get("plain_summary", ""),
+                "targetLang": LANG_ALIASES.get(lang, lang),
             })
+    if len(jobs) > TRANSLATE_BATCH_MAX:
+        raise ValueError(f"too many translations in one batch (max {TRANSLATE_BATCH_MAX})")
+    return reports, langs, jobs
 
-        # ❸ 用户拒绝 —— 触发 5 + 5 重试逻辑
-        else:  # approval is False
-            refusal_times += 1
-            result["refusal_times"] = refusal_times
 
-            if refusal_times <= 10:
-                # 前 10 次拒绝仍尝试再次确认
-                result.update({
-                    "needsApproval": True,
-                    # 可以自定义提示语；此处重用原 next_question 或 prompts["approval"]
-                    "next_question": prompts.get("approval", "请再次确认您是否同意生成完整报告？")
-                })
-            else:
-                # 超过 10 次，视为彻底拒绝
-                result["confidence_level"] = 0
-                result["needsApproval"] = False
+def translation_hash(report: dict, lang: str) -> str:
+    content = [report.get("medical_summary", ""), report.get("plain_summary", ""),
+               LANG_ALIASES.get(lang, lang)]
+    return hashlib.sha256(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def translate_job(job: dict) -> dict:
+    """批次中的單次翻譯（在複製出的 context 中執行，指標以目標語言為 lang）"""
+    _REQUEST_LANG.set(job["targetLang"])
+    return run_stage(build_translate_messages(job), stage="translate")
+
+
+async def atranslate_job(job: dict) -> dict:
+    _REQUEST_LANG.set(job["targetLang"])
+    return await arun_stage(build_translate_messages(job), "translate")
 
-    return result
+
+def assemble_translation_batch(
+        data: dict, reports: List[dict], langs: List[str], outputs: Dict[str, Any]
+) -> Dict[str, Any]:
+    """outputs 為 {雜湊: 解析後的翻譯 JSON 或 Exception}；全部因過載失敗時丟出 Overloaded"""
+    errors = [o for o in outputs.values() if isinstance(o, Exception)]
+    if errors and len(errors) == len(outputs) and all(isinstance(e, Overloaded) for e in errors):
+        raise errors[0]
+    results = []
+    for report in reports:
+        per_lang: Dict[str, Any] = {}
+        for lang in langs:
+            out = outputs[translation_hash(report, lang)]
+            if isinstance(out, Exception):
+                per_lang[lang] = {"error": str(out)}
+            else:
+                per_lang[lang] = format_translation(out, report)
+        results.append(per_lang)
+    if data.get("reports"):
+        return {"results": results}
+    return {"translations": results[0]}
 
 # ------------------------------------------------------------------
 # Flask 路由
 # ------------------------------------------------------------------
 
 
+@app.errorhandler(Overloaded)
+def handle_overloaded(e: Overloaded):
+    """調度器排不進去（佇列滿、等待逾時、斷路器開啟）時快速回 503"""
+    resp = jsonify({"error": str(e)})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(math.ceil(e.retry_after))
+    return resp
+
+
+@app.before_request
+def _start_request_timer():
+    g.started = time.perf_counter()
+    _TOKEN_USAGE.set(None)      # 執行緒會被重用，清掉上一個請求留下的記帳
+
+
+@app.after_request
+def _observe_request(response: Response) -> Response:
+    started = getattr(g, "started", None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        elapsed = time.perf_counter() - started
+        HTTP_SECONDS.observe(elapsed, endpoint, request.method, str(response.status_code))
+        if TIMING_HEADERS:
+            response.headers["Server-Timing"] = server_timing(elapsed)
+    return response
+
+
 @app.route("/api/conversation", methods=["POST"])
 def api_conversation():
     data = request.get_json() or {}
@@ -216,41 +1166,230 @@ def api_conversation():
     lang = data.get("lang", "zhCN")
     approval = data.get("approval")  # True / False / None
 
+    usage = start_token_accounting(lang, bool(data.get("regenerate")))
     answer = analysis_ai_decide_next_step(history, lang, approval)
+    report_token_usage("conversation", usage)
     if "error" in answer:
         return jsonify({"error": answer["error"]}), 500
+    if data.get("debug"):
+        answer["token_usage"] = usage
     return jsonify(answer)
 
 
-@app.route("/api/translate_report", methods=["POST"])
-def api_translate():
+def sse_event(event: str, payload: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.route("/api/conversation/stream", methods=["POST"])
+def api_conversation_stream():
+    """
+    /api/conversation 的 SSE 版本：
+    - event: delta  {"field": "next_question" | "plain_summary", "text": "..."}
+    - event: final  與 /api/conversation 相同的完整結果（含 confidence_level / needsApproval / done）
+    - event: error  {"error": "..."}
+    """
     data = request.get_json() or {}
-    target = data.get("targetLang", "en")
+    history = data.get("history", [])
+    lang = data.get("lang", "zhCN")
+    approval = data.get("approval")
 
-    to_trans = (
-        f"medical_summary:\n{data.get('medical_summary','')}\n\n"
-        f"plain_summary:\n{data.get('plain_summary','')}"
-    )
-    prompt = (
-        f"You are a medical translator. Translate the text to "
-        f"{LANG_MAP.get(target, 'English')} in the same medical style.\n\n"
-        f"Output JSON:\n{{\n  \"medical_summary_translated\": \"...\",\n"
-        f"  \"plain_summary_translated\": \"...\"\n}}"
+    events: "queue.Queue[tuple | None]" = queue.Queue()
+
+    def on_delta(field: str, text: str) -> None:
+        events.put(("delta", {"field": field, "text": text}))
+
+    def worker() -> None:
+        usage = start_token_accounting(lang, bool(data.get("regenerate")))
+        try:
+            answer = analysis_ai_decide_next_step(history, lang, approval, on_delta=on_delta)
+        except Overloaded as e:
+            answer = {"error": str(e), "retry_after": math.ceil(e.retry_after)}
+        except Exception as e:
+            answer = {"error": str(e)}
+        report_token_usage("conversation_stream", usage)
+        if data.get("debug") and "error" not in answer:
+            answer["token_usage"] = usage
+        if "error" in answer:
+            events.put(("error", {k: v for k, v in answer.items() if k in ("error", "retry_after")}))
+        else:
+            events.put(("final", answer))
+        events.put(None)
+
+    threading.Thread(target=worker, daemon=True).start()
+
+    def generate() -> Iterator[str]:
+        while True:
+            item = events.get()
+            if item is None:
+                break
+            yield sse_event(*item)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+
+@app.route("/api/translate_report", methods=["POST"])
+def api_translate():
+    data = request.get_json() or {}
+    usage = start_token_accounting(data.get("targetLang", "en"))
+    set_request_class("translate", PRIORITY_LOW)
     try:
-        resp = chat_complete(
-            [{"role": "system", "content": prompt},
-             {"role": "user", "content": to_trans}]
-        )
-        out = safe_json_load(resp.choices[0].message.content)
-        return jsonify({
-            "medical_summary": out.get("medical_summary_translated", ""),
-            "plain_summary": out.get("plain_summary_translated", ""),
-            "recommended_specialties": data.get("recommended_specialties", [])
-        })
+        out = run_stage(build_translate_messages(data), stage="translate")
+        return jsonify(format_translation(out, data))
+    except Overloaded:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    finally:
+        report_token_usage("translate", usage)
+
+
+@app.route("/api/translate_report/batch", methods=["POST"])
+def api_translate_batch():
+    """
+    一次把報告翻成多種語言：
+    {"medical_summary", "plain_summary", "recommended_specialties", "targetLangs": ["en", "zhTW"]}
+    → {"translations": {"en": {...}, "zhTW": {...}}}；
+    傳 "reports": [...] 時回傳 {"results": [{語言: 翻譯}, ...]}，與 reports 一一對應。
+    各翻譯並行執行，個別失敗時該語言為 {"error": "..."}。
+    """
+    data = request.get_json() or {}
+    try:
+        reports, langs, jobs = plan_translation_batch(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    usage = start_token_accounting()
+    set_request_class("translate", PRIORITY_LOW)
+    futures = {
+        h: PARALLEL_POOL.submit(contextvars.copy_context().run, translate_job, job)
+        for h, job in jobs.items()
+    }
+    outputs: Dict[str, Any] = {}
+    for h, fut in futures.items():
+        try:
+            outputs[h] = fut.result()
+        except Exception as e:
+            outputs[h] = e
+    report_token_usage("translate_batch", usage)
+    return jsonify(assemble_translation_batch(data, reports, langs, outputs))
+
+
+@app.route("/api/sessions", methods=["POST"])
+def api_session_create():
+    data = request.get_json() or {}
+    return jsonify({"session_id": SESSION_STORE.create(data.get("lang", "zhCN"))}), 201
+
+
+@app.route("/api/sessions/<sid>", methods=["GET"])
+def api_session_get(sid: str):
+    sess = SESSION_STORE.get(sid)
+    if sess is None:
+        return jsonify({"error": "session not found"}), 404
+    return jsonify(sess)
+
+
+@app.route("/api/sessions/<sid>/turn", methods=["POST"])
+def api_session_turn(sid: str):
+    status, payload = session_turn(sid, request.get_json() or {})
+    return jsonify(payload), status
+
+
+def _query_list(name: str) -> List[str]:
+    """?specialty=a,b 與 ?specialty=a&specialty=b 兩種寫法都接受"""
+    return [v.strip() for raw in request.args.getlist(name) for v in raw.split(",") if v.strip()]
+
+
+def parse_clinic_query() -> Dict[str, Any]:
+    args = request.args
+    try:
+        lat = float(args["lat"]) if args.get("lat") else None
+        lng = float(args["lng"]) if args.get("lng") else None
+        radius_km = float(args["radius_km"]) if args.get("radius_km") else None
+        limit = int(args.get("limit", "20"))
+        offset = int(args.get("offset", "0"))
+    except ValueError as e:
+        raise ValueError(f"invalid query parameter: {e}")
+    if (lat is None) != (lng is None):
+        raise ValueError("lat and lng must be given together")
+    if lat is not None and not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("lat / lng out of range")
+    if radius_km is not None and (lat is None or not radius_km >= 0):
+        raise ValueError("radius_km needs lat / lng and must be >= 0")
+    if not 0 <= limit <= CLINIC_SEARCH_MAX_LIMIT or offset < 0:
+        raise ValueError(f"limit must be 0..{CLINIC_SEARCH_MAX_LIMIT} and offset >= 0")
+    return {"lat": lat, "lng": lng, "radius_km": radius_km, "limit": limit, "offset": offset,
+            "specialties": _query_list("specialty"), "languages": _query_list("language")}
+
+
+@app.route("/api/clinics", methods=["GET"])
+def api_clinics():
+    """
+    診所查詢：?lat=&lng=&radius_km=&specialty=&language=&limit=&offset=
+    - 有 lat / lng 時依距離排序；有 radius_km 時只回傳半徑內的診所，否則為最近的診所
+    - specialty / language 可用任一語言的名稱，逗號分隔或重複參數；同一維度內為「任一」
+    → {"total", "offset", "limit", "version", "unknown": [無法辨識的名稱], "results": [診所 + distance_km]}
+    """
+    try:
+        query = parse_clinic_query()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    index = CLINIC_INDEX.current()
+    found = index.search(**query)
+    results = [
+        clinic if distance is None else {**clinic, "distance_km": round(distance, 3)}
+        for clinic, distance in found["results"]
+    ]
+    return jsonify({
+        "total": found["total"], "offset": query["offset"], "limit": query["limit"],
+        "version": index.version, "unknown": found["unknown"], "results": results,
+    })
+
+
+@app.route("/api/clinics/facets", methods=["GET"])
+def api_clinic_facets():
+    """篩選選項：所有科室與語言（規範鍵、原始名稱、四語名稱、診所數）"""
+    index = CLINIC_INDEX.current()
+    return jsonify({**index.facets(), "version": index.version})
+
+
+@app.route("/api/llm_cache/stats", methods=["GET"])
+def api_llm_cache_stats():
+    return jsonify(LLM_CACHE.stats())
+
+
+def _parallel_plain_stats() -> Dict[str, int]:
+    with _STATE_LOCK:
+        return dict(PARALLEL_PLAIN_STATS)
+
+
+REGISTRY.register_stats("clinicai_llm_cache", "LLM reply cache counters", "name", LLM_CACHE.stats)
+REGISTRY.register_stats("clinicai_speculative", "Speculative job counters", "name", SPECULATIVE.stats)
+REGISTRY.register_stats("clinicai_llm_dispatcher", "LLM dispatcher counters and gauges", "name",
+                        LLM_DISPATCHER.stats)
+REGISTRY.register_stats("clinicai_single_flight", "Coalesced identical in-flight LLM calls", "name",
+                        SINGLE_FLIGHT.stats)
+REGISTRY.register_stats("clinicai_parallel_plain", "Parallel plain-summary counters", "name",
+                        _parallel_plain_stats)
+REGISTRY.register_stats("clinicai_clinic_index", "Clinic search index size and reloads", "name",
+                        CLINIC_INDEX.stats)
+
+
+@app.route("/metrics", methods=["GET"])
+def api_metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/pipeline/stats", methods=["GET"])
+def api_pipeline_stats():
+    return jsonify({
+        "speculative": SPECULATIVE.stats(),
+        "parallel_plain": _parallel_plain_stats(),
+        "dispatcher": LLM_DISPATCHER.stats(),
+        "single_flight": SINGLE_FLIGHT.stats(),
+    })
 
 
 # ------------------------------------------------------------------
@@ -167,7 +167,8 @@ export default function Chatbot() {
 
   const sendToBackend = async (
     history: Message[],
-    approval: boolean | null = null
+    approval: boolean | null = null,
+    regenerate = false
   ): Promise<BackendResponse | null> => {
     setIsLoading(true);
     try {
@@ -175,7 +176,7 @@ export default function Chatbot() {
       const resp = await fetch(`${backend}/api/conversation`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ history, approval, lang, debug: debugMode }),
+        body: JSON.stringify({ history, approval, lang, debug: debugMode, regenerate }),
       });
       if (!resp.ok) throw new Error("Network response was not ok");
       return (await resp.json()) as BackendResponse;
@@ -228,7 +229,8 @@ export default function Chatbot() {
     const history = messages.slice(0, lastAI);
     setMessages(history);
 
-    const data = await sendToBackend(history);
+    // regenerate：后端不查缓存，否则相同的 history 总是拿回同一个问题
+    const data = await sendToBackend(history, null, true);
     if (!data) return;
 
     setConfidence(data.confidence_level ?? 0);
@@ -51,7 +51,6 @@ interface Doctor {
   specialty: string;
   languages: string[];
   languages_i18n?: Record<string, string>[];
-  _langMap?: Record<string, Record<string, string>>;
 }
 
 interface Clinic {
@@ -61,9 +60,25 @@ interface Clinic {
   phone: string;
   latitude: number;
   longitude: number;
+  distance_km?: number;
   doctors: Doctor[];
 }
 
+interface Facet {
+  key: string;
+  name: string;
+  i18n: Record<string, string>;
+  clinics: number;
+}
+
+interface ClinicFacets {
+  specialties: Facet[];
+  languages: Facet[];
+}
+
+/* 半径内最多显示的诊所数（后端按距离排序） */
+const CLINIC_PAGE_SIZE = 500;
+
 /* ────── 主组件 ────── */
 function MapInner() {
   /* 延迟加载 Leaflet / React-Leaflet 以绕过 SSR */
@@ -105,7 +120,7 @@ function MapInner() {
   });
 
   /* ─────────── State ─────────── */
-  const [allClinics, setAllClinics] = useState<Clinic[]>([]);
+  const [filtered, setFiltered] = useState<Clinic[]>([]);
   const [allSpecs, setAllSpecs] = useState<string[]>([]);
   const [allLangs, setAllLangs] = useState<string[]>([]);
   const [globalSpecMap] = useState<Record<
@@ -218,66 +233,22 @@ function MapInner() {
     },
   }[lang];
 
-  /* ─────────── 数据加载 ─────────── */
+  /* ─────────── 筛选选项（后端 /api/clinics/facets） ─────────── */
+  const backend = process.env.NEXT_PUBLIC_BACKEND_URL || "";
   useEffect(() => {
-    fetch("/clinic_data_i18n.json")
+    fetch(`${backend}/api/clinics/facets`)
       .then(res => res.json())
-      .then((data: Clinic[]) => {
-        const clinics: Clinic[] = [];
-        const specSet = new Set<string>();
+      .then((data: ClinicFacets) => {
         const langDict: Record<string, Record<string, string>> = {};
-
-        data.forEach(cRaw => {
-          /* 坐标校验 */
-          const lat = parseFloat(
-            String((cRaw as any).latitude)
-          );
-          const lon = parseFloat(
-            String((cRaw as any).longitude)
-          );
-          if (!Number.isFinite(lat) || !Number.isFinite(lon)) {
-            console.warn(
-              "忽略坐标无效诊所:",
-              cRaw.name
-            );
-            return;
-          }
-
-          const c: Clinic = {
-            ...cRaw,
-            latitude: lat,
-            longitude: lon,
-          };
-
-          /* 收集科室 / 语言 */
-          c.doctors.forEach(d => {
-            specSet.add(d.specialty);
-            if (
-              Array.isArray(d.languages) &&
-              Array.isArray(d.languages_i18n)
-            ) {
-              d._langMap = {};
-              d.languages.forEach((orig, i) => {
-                const mapping =
-                  d.languages_i18n?.[i];
-                if (mapping) {
-                  d._langMap![orig] = mapping;
-                  langDict[orig] = mapping;
-                }
-              });
-            }
-          });
-
-          clinics.push(c);
+        data.languages.forEach(f => {
+          langDict[f.name] = f.i18n;
         });
-
-        setAllClinics(clinics);
-        setAllSpecs([...specSet].sort());
+        setAllSpecs(data.specialties.map(f => f.name).sort());
         setAllLangs(Object.keys(langDict).sort());
         setGlobalLangMap(langDict);
       })
       .catch(console.error);
-  }, []);
+  }, [backend]);
 
   /* ─────────── Geolocation ─────────── */
   useEffect(() => {
@@ -318,66 +289,32 @@ function MapInner() {
     });
   }, [selectedLangs, globalLangMap, lang]);
 
-  /* ─────────── 距离计算 ─────────── */
-  const getDist = (
-    la1: number,
-    lo1: number,
-    la2: number,
-    lo2: number
-  ) => {
-    const R = 6371;
-    const dLat =
-      ((la2 - la1) * Math.PI) / 180;
-    const dLng =
-      ((lo2 - lo1) * Math.PI) / 180;
-    const a =
-      Math.sin(dLat / 2) ** 2 +
-      Math.cos((la1 * Math.PI) / 180) *
-        Math.cos((la2 * Math.PI) / 180) *
-        Math.sin(dLng / 2) ** 2;
-    return (
-      R *
-      2 *
-      Math.atan2(
-        Math.sqrt(a),
-        Math.sqrt(1 - a)
-      )
-    );
-  };
-
-  /* ─────────── 过滤诊所 ─────────── */
-  const filtered = useMemo(() => {
-    return allClinics.filter(c => {
-      if (
-        selectedSpecs.length &&
-        !c.doctors.some(d =>
-          selectedSpecs.includes(d.specialty)
-        )
-      )
-        return false;
-      if (
-        selectedLangKeys.length &&
-        !c.doctors.some(d =>
-          d.languages.some(l =>
-            selectedLangKeys.includes(l)
-          )
-        )
-      )
-        return false;
-      if (
-        userLocation &&
-        getDist(
-          userLocation[0],
-          userLocation[1],
-          c.latitude,
-          c.longitude
-        ) > radius
-      )
-        return false;
-      return true;
+  /* ─────────── 查询诊所（后端按距离与科室 / 语言筛选） ─────────── */
+  useEffect(() => {
+    const params = new URLSearchParams({
+      lat: String(userLocation[0]),
+      lng: String(userLocation[1]),
+      radius_km: String(radius),
+      limit: String(CLINIC_PAGE_SIZE),
     });
+    if (selectedSpecs.length)
+      params.set("specialty", selectedSpecs.join(","));
+    if (selectedLangKeys.length)
+      params.set("language", selectedLangKeys.join(","));
+    const ctrl = new AbortController();
+    fetch(`${backend}/api/clinics?${params}`, {
+      signal: ctrl.signal,
+    })
+      .then(res => res.json())
+      .then((data: { results: Clinic[] }) =>
+        setFiltered(data.results)
+      )
+      .catch(e => {
+        if (e.name !== "AbortError") console.error(e);
+      });
+    return () => ctrl.abort();
   }, [
-    allClinics,
+    backend,
     selectedSpecs,
     selectedLangKeys,
     userLocation,
@@ -8,12 +8,17 @@ import styles from "./Report.module.css";
 /* 引入科室四语映射文件（与本文件同目录） */
 import specI18n from "./department_i18n.json";
 
+/* 报告页可切换的语言；第一次翻译时一次性批量请求全部语言 */
+const REPORT_LANGS = ["en", "zh_CN", "zh_TW", "ms"];
+
 export default function ReportPage() {
   const router = useRouter();
   const [reportData, setReportData] = useState<any>(null);
   const [activeTab, setActiveTab] = useState(0);
   const [targetLang, setTargetLang] = useState("en");          // default language
   const [selectedDepartments, setSelectedDepartments] = useState<Set<string>>(new Set());
+  const [translations, setTranslations] = useState<Record<string, any>>({});  // 语言 → 译文缓存
+  const [sourceReport, setSourceReport] = useState<any>(null);  // 未翻译的原始报告，批量翻译总以它为原文
 
   const lang = languages[targetLang];                          // UI 文本
 
@@ -23,6 +28,8 @@ export default function ReportPage() {
     if (stored) {
       const data = JSON.parse(stored);
       setReportData(data);
+      // 翻译后写回的 finalReport 带着原文（source），刷新页面后仍从原文翻译
+      setSourceReport(data.source || data);
       // 初始化选中所有部门（原始 key 为 data.recommendedSpecialties[].科目）
       const initial = new Set((data.recommendedSpecialties || []).map((s: any) => s.科目));
       setSelectedDepartments(initial);
@@ -30,18 +37,37 @@ export default function ReportPage() {
   }, []);
 
   /* ----------------  翻译按钮 ---------------- */
+  const applyTranslation = (data: any) => {
+    const updated = {
+      ...reportData,
+      medicalSummary:         data.medical_summary,
+      plainSummary:           data.plain_summary,
+      recommendedSpecialties: data.recommended_specialties,
+      source:                 sourceReport
+    };
+    setReportData(updated);
+    sessionStorage.setItem("finalReport", JSON.stringify(updated));
+
+    // 更新选中列表
+    const newSet = new Set((data.recommended_specialties || []).map((s: any) => s.科目));
+    setSelectedDepartments(newSet);
+  };
+
   const handleTranslate = async () => {
-    if (!reportData) return;
+    if (!reportData || !sourceReport) return;
+    // 已批量翻译过：直接切换，无需再次请求
+    if (translations[targetLang]) return applyTranslation(translations[targetLang]);
     try {
       const backend = process.env.NEXT_PUBLIC_BACKEND_URL || "";
-      const resp = await fetch(`${backend}/api/translate_report`, {
+      const resp = await fetch(`${backend}/api/translate_report/batch`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
-          medical_summary:         reportData.medicalSummary,
-          plain_summary:           reportData.plainSummary,
-          recommended_specialties: reportData.recommendedSpecialties,
-          targetLang
+          medical_summary:         sourceReport.medicalSummary,
+          plain_summary:           sourceReport.plainSummary,
+          recommended_specialties: sourceReport.recommendedSpecialties,
+          // 之前部分失败时只补请求还没有译文的语言
+          targetLangs:             REPORT_LANGS.filter(l => !translations[l])
         })
       });
       if (!resp.ok) throw new Error("翻译接口返回错误");
@@ -49,18 +75,14 @@ export default function ReportPage() {
       const data = await resp.json();
       if (data.error) return alert("翻译失败: " + data.error);
 
-      const updated = {
-        ...reportData,
-        medicalSummary:         data.medical_summary,
-        plainSummary:           data.plain_summary,
-        recommendedSpecialties: data.recommended_specialties
-      };
-      setReportData(updated);
-      sessionStorage.setItem("finalReport", JSON.stringify(updated));
-
-      // 更新选中列表
-      const newSet = new Set((data.recommended_specialties || []).map((s: any) => s.科目));
-      setSelectedDepartments(newSet);
+      const current = data.translations?.[targetLang];
+      if (!current || current.error) return alert("翻译失败: " + (current?.error || targetLang));
+      // 只缓存成功的语言（并入已有缓存），失败的下次再请求
+      const ok = Object.fromEntries(
+        Object.entries(data.translations || {}).filter(([, t]: [string, any]) => !t.error)
+      );
+      setTranslations(prev => ({ ...prev, ...ok }));
+      applyTranslation(current);
     } catch (err: any) {
       alert("翻译失败: " + err.message);
     }
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ClinicAI 的 ASGI 入口。
+
+/api/conversation、/api/translate_report（含 /batch）在事件迴圈上以非同步方式處理，
+LLM 請求經由共用的 aiohttp 連線池（keep-alive）送往 DeepSeek，等待上游時
+不佔用執行緒；其餘路由（如 /api/conversation/stream）交回 Flask app。
+
+生產環境啟動：
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers <CPU 核數>
+
+環境變數：
+    ASYNC_MAX_CONCURRENCY  每個 worker 同時進行中的 LLM 請求上限（預設 256）
+    LLM_POOL_SIZE          每個 worker 到上游的最大連線數（預設 100）
+    LLM_KEEPALIVE_SECONDS  閒置連線保留秒數（預設 60）
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import aiohttp
+import openai
+from asgiref.wsgi import WsgiToAsgi
+
+from dispatcher import PRIORITY_LOW, Overloaded, set_request_class
+
+from app import (
+    HTTP_SECONDS,
+    TIMING_HEADERS,
+    analysis_ai_decide_next_step_async,
+    app as flask_app,
+    arun_stage,
+    assemble_translation_batch,
+    atranslate_job,
+    build_translate_messages,
+    format_translation,
+    plan_translation_batch,
+    report_token_usage,
+    server_timing,
+    start_token_accounting,
+)
+
+ASYNC_MAX_CONCURRENCY = int(os.getenv("ASYNC_MAX_CONCURRENCY", "256"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "100"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+
+logger = logging.getLogger(__name__)
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-headers", b"Content-Type"),
+    (b"access-control-allow-methods", b"POST, OPTIONS"),
+]
+
+_wsgi = WsgiToAsgi(flask_app)
+_session: Optional[aiohttp.ClientSession] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+
+async def _startup() -> None:
+    global _session, _slots
+    connector = aiohttp.TCPConnector(limit=LLM_POOL_SIZE, keepalive_timeout=LLM_KEEPALIVE_SECONDS)
+    _session = aiohttp.ClientSession(connector=connector)
+    _slots = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+
+
+async def _shutdown() -> None:
+    if _session is not None:
+        await _session.close()
+
+
+# ------------------------------------------------------------------
+# 路由
+# ------------------------------------------------------------------
+
+
+async def conversation(data: Dict[str, Any]) -> tuple[int, Dict[str, Any]]:
+    lang = data.get("lang", "zhCN")
+    usage = start_token_accounting(lang, bool(data.get("regenerate")))
+    answer = await analysis_ai_decide_next_step_async(
+        data.get("history", []), lang, data.get("approval")
+    )
+    report_token_usage("conversation", usage)
+    if "error" in answer:
+        return 500, {"error": answer["error"]}
+    if data.get("debug"):
+        answer["token_usage"] = usage
+    return 200, answer
+
+
+async def translate_report(data: Dict[str, Any]) -> tuple[int, Dict[str, Any]]:
+    usage = start_token_accounting(data.get("targetLang", "en"))
+    set_request_class("translate", PRIORITY_LOW)
+    try:
+        out = await arun_stage(build_translate_messages(data), "translate")
+        return 200, format_translation(out, data)
+    except Overloaded:
+        raise
+    except Exception as e:
+        return 500, {"error": str(e)}
+    finally:
+        report_token_usage("translate", usage)
+
+
+async def translate_batch(data: Dict[str, Any]) -> tuple[int, Dict[str, Any]]:
+    try:
+        reports, langs, jobs = plan_translation_batch(data)
+    except ValueError as e:
+        return 400, {"error": str(e)}
+    usage = start_token_accounting()
+    set_request_class("translate", PRIORITY_LOW)
+    # gather 為每個任務建立各自的 context 副本，atranslate_job 設定的 lang 互不影響
+    results = await asyncio.gather(*(atranslate_job(job) for job in jobs.values()), return_exceptions=True)
+    report_token_usage("translate_batch", usage)
+    return 200, assemble_translation_batch(data, reports, langs, dict(zip(jobs, results)))
+
+
+ROUTES: Dict[str, Callable[[Dict[str, Any]], Awaitable[tuple[int, Dict[str, Any]]]]] = {
+    "/api/conversation": conversation,
+    "/api/translate_report": translate_report,
+    "/api/translate_report/batch": translate_batch,
+}
+
+
+# ------------------------------------------------------------------
+# ASGI
+# ------------------------------------------------------------------
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _send_json(send, status: int, payload: Any, headers: Optional[list] = None) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())] + CORS_HEADERS + (headers or []),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await _startup()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await _shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send) -> None:
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+
+    handler = ROUTES.get(scope.get("path", "")) if scope["type"] == "http" else None
+    if handler is None:
+        return await _wsgi(scope, receive, send)
+
+    if scope["method"] == "OPTIONS":
+        await send({"type": "http.response.start", "status": 204, "headers": CORS_HEADERS})
+        await send({"type": "http.response.body", "body": b""})
+        return
+    if scope["method"] != "POST":
+        return await _send_json(send, 405, {"error": "Method Not Allowed"})
+
+    try:
+        data = json.loads(await _read_body(receive) or b"{}") or {}
+    except ValueError:
+        return await _send_json(send, 400, {"error": "Invalid JSON body"})
+
+    if _session is None:
+        await _startup()
+    openai.aiosession.set(_session)
+    started = time.perf_counter()
+    headers = []
+    async with _slots:
+        try:
+            status, payload = await handler(data)
+        except Overloaded as e:
+            # 調度器排不進去：快速回 503，讓前端稍後重試
+            status, payload = 503, {"error": str(e)}
+            headers.append((b"retry-after", str(math.ceil(e.retry_after)).encode()))
+    elapsed = time.perf_counter() - started
+    HTTP_SECONDS.observe(elapsed, scope["path"], "POST", str(status))
+    if TIMING_HEADERS:
+        headers.append((b"server-timing", server_timing(elapsed).encode()))
+    await _send_json(send, status, payload, headers)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+離線批次分診：把 JSONL 檔中的對話逐條送進 analysis_ai_decide_next_step。
+
+輸入每行一個對話：
+    {"id": "c-001", "history": [{"role": "user", "content": "..."}], "lang": "zhCN",
+     "approval": null, "refusal_times": 0}
+也可以直接是 history 列表；沒有 id 時以行號為 id。
+
+結果逐條追加寫入輸出 JSONL（{"id", "result" | "error", "elapsed", "stages"}）。
+輸出檔同時就是檢查點：重新執行時略過已有結果的 id，中斷後可以接著跑；
+失敗的記錄不算完成，重跑時會重試（成功後輸出檔中同一 id 會有兩行，以沒有 error 的為準）。
+結束時回報吞吐量與各階段延遲（p50 / p95）。
+
+    python batch_triage.py conversations.jsonl -o triage_out.jsonl --workers 8 --rate 5
+
+預設關閉推測式專業報告（批次模式下用不到）；--no-cache 關閉 LLM 回覆快取，
+適合比較 prompt 修改前後的輸出。
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+
+class RateLimiter:
+    """每秒最多放行 rate 個請求（rate <= 0 表示不限速）"""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def read_items(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """逐行讀取輸入（不整檔載入）；回傳 (id, item)"""
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                print(f"line {lineno}: invalid JSON ({e}), skipped", file=sys.stderr)
+                continue
+            if isinstance(item, list):
+                item = {"history": item}
+            elif not isinstance(item, dict):
+                print(f"line {lineno}: expected an object or a history list, skipped", file=sys.stderr)
+                continue
+            yield str(item.get("id", lineno)), item
+
+
+def load_done(path: str) -> Set[str]:
+    """
+    讀取已完成的 id；最後一行若寫到一半（程式中斷）就截掉，避免續寫時黏在同一行。
+    帶 error 的記錄（上游過載、暫時性錯誤等）不算完成，重新執行時會再試一次
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                if "error" not in record:
+                    done.add(str(record["id"]))
+            except (ValueError, KeyError, TypeError):
+                continue
+    return done
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def triage_one(app: Any, item_id: str, item: Dict[str, Any], limiter: RateLimiter) -> Dict[str, Any]:
+    limiter.acquire()
+    lang = item.get("lang", "zhCN")
+    usage = app.start_token_accounting(lang)
+    started = time.perf_counter()
+    try:
+        result = app.analysis_ai_decide_next_step(
+            item.get("history", []), lang, item.get("approval"), item.get("refusal_times", 0)
+        )
+        record: Dict[str, Any] = {"id": item_id}
+        if "error" in result:
+            record["error"] = result["error"]
+        else:
+            record["result"] = result
+    except Exception as e:
+        record = {"id": item_id, "error": str(e)}
+    record["elapsed"] = round(time.perf_counter() - started, 3)
+    record["stages"] = usage
+    return record
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("input", help="對話 JSONL")
+    ap.add_argument("-o", "--output", help="結果 JSONL（兼作檢查點），預設為 <input>.triage.jsonl")
+    ap.add_argument("--workers", type=int, default=8, help="並行處理的對話數")
+    ap.add_argument("--rate", type=float, default=0.0, help="每秒最多開始的對話數（0 = 不限）")
+    ap.add_argument("--limit", type=int, default=0, help="本次最多處理幾條（0 = 全部）")
+    ap.add_argument("--no-cache", action="store_true", help="關閉 LLM 回覆快取")
+    ap.add_argument("--restart", action="store_true", help="忽略既有輸出，從頭開始")
+    ap.add_argument("--progress-every", type=int, default=50)
+    args = ap.parse_args()
+
+    # app 在匯入時讀取環境變數，必須先設定
+    os.environ.setdefault("SPECULATIVE_PROFESSIONAL", "0")
+    if args.no_cache:
+        # 所有階段都不產生快取鍵：既不查也不寫，快取統計保持乾淨（容量設 0 會把每次寫入記成淘汰）
+        os.environ["LLM_CACHE_EXCLUDE"] = "analysis,plain,professional,translate"
+        os.environ.pop("LLM_CACHE_DB", None)
+    import app
+
+    output = args.output or os.path.splitext(args.input)[0] + ".triage.jsonl"
+    if args.restart and os.path.exists(output):
+        os.remove(output)
+    done = load_done(output)
+    if done:
+        print(f"resuming: {len(done)} conversations already in {output}")
+
+    limiter = RateLimiter(args.rate)
+    stage_latency: Dict[str, List[float]] = defaultdict(list)
+    elapsed: List[float] = []
+    errors = 0
+    processed = 0
+    started = time.perf_counter()
+
+    def pending_items() -> Iterator[Tuple[str, Dict[str, Any]]]:
+        n = 0
+        for item_id, item in read_items(args.input):
+            if item_id in done:
+                continue
+            if args.limit and n >= args.limit:
+                return
+            done.add(item_id)       # 同一檔內重複的 id 只處理一次
+            n += 1
+            yield item_id, item
+
+    with open(output, "a", encoding="utf-8") as out, ThreadPoolExecutor(args.workers) as pool:
+        def write(record: Dict[str, Any]) -> None:
+            nonlocal errors, processed
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            processed += 1
+            errors += "error" in record
+            elapsed.append(record["elapsed"])
+            for stage in record["stages"]:
+                stage_latency[stage["stage"]].append(stage["duration_ms"] / 1000)
+            if args.progress_every and processed % args.progress_every == 0:
+                rate = processed / (time.perf_counter() - started)
+                print(f"{processed} done, {errors} errors, {rate:.2f} conversations/s", flush=True)
+
+        # 只保留有限個在途任務，輸入再大記憶體也不會增長
+        inflight: Set[Future] = set()
+        for item_id, item in pending_items():
+            if len(inflight) >= args.workers * 2:
+                finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    write(fut.result())
+            inflight.add(pool.submit(triage_one, app, item_id, item, limiter))
+        for fut in inflight:
+            write(fut.result())
+
+    wall = time.perf_counter() - started
+    print(f"\n{processed} conversations in {wall:.1f}s ({processed / wall if wall else 0:.2f}/s), "
+          f"{errors} errors -> {output}")
+    if elapsed:
+        print(f"per conversation  p50 {percentile(elapsed, .5):.2f}s  p95 {percentile(elapsed, .95):.2f}s")
+    print(f"\n{'stage':<14}{'calls':>7}{'p50':>8}{'p95':>8}")
+    for stage, values in sorted(stage_latency.items()):
+        print(f"{stage:<14}{len(values):>7}{percentile(values, .5):>8.2f}{percentile(values, .95):>8.2f}")
+    dispatcher = app.LLM_DISPATCHER.stats()
+    print(f"\nupstream retries {dispatcher['retries']}, failures {dispatcher['failures']}, "
+          f"saved by coalescing {app.SINGLE_FLIGHT.stats()['saved_calls']}")
+
+
+if __name__ == "__main__":
+    main()
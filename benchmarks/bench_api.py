@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API 端到端壓測：在本地假上游（mock_llm.py）前啟動 app，模擬多輪問診。
+
+每個問診：送出症狀 → 依 next_question 回答，直到 needsApproval →
+按 --approve-ratio 同意（否則先拒絕一次再同意）→ 拿到報告後按 --translate-ratio
+呼叫 /api/translate_report。以 --concurrency 個並發問診執行 --consultations 次，
+回報吞吐量、各端點 p50/p95/p99 延遲，以及每次問診平均的上游 LLM 呼叫數。
+
+完全離線：python benchmarks/bench_api.py --mode asgi --consultations 200 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm import add_mock_arguments, mock_from_args, start_mock  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SYMPTOMS = ["头痛三天", "咳嗽一周", "胃痛", "发烧 38 度", "膝盖疼", "喉咙痛", "皮肤起红疹", "失眠"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode: str, port: int, upstream: str, extra_env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    """以子行程啟動 API：flask = werkzeug 多執行緒，asgi = uvicorn + asgi.py"""
+    env = dict(os.environ, DEEPSEEK_API_BASE=upstream, DEEPSEEK_API_KEY="bench", **(extra_env or {}))
+    if mode == "flask":
+        cmd = [sys.executable, "-c",
+               f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "asgi:application",
+               "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_ready(base: str, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{base}/api/llm_cache/stats") as resp:
+                    await resp.read()
+                    return
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"server at {base} did not start")
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+class Runner:
+    def __init__(self, base: str, args: argparse.Namespace) -> None:
+        self.base = base
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.completed = 0
+
+    async def post(self, session: aiohttp.ClientSession, endpoint: str, payload: dict) -> Optional[dict]:
+        t0 = time.perf_counter()
+        try:
+            async with session.post(f"{self.base}{endpoint}", json=payload) as resp:
+                data = await resp.json(content_type=None)
+                if resp.status != 200:
+                    self.errors[endpoint] += 1
+                    return None
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            self.errors[endpoint] += 1
+            return None
+        self.latencies[endpoint].append(time.perf_counter() - t0)
+        return data
+
+    async def consultation(self, session: aiohttp.ClientSession, i: int) -> None:
+        lang = self.args.lang
+        history = [{"role": "user", "content": f"{self.rng.choice(SYMPTOMS)}（#{i}）"}]
+        for _ in range(self.args.max_turns):
+            data = await self.post(session, "/api/conversation", {"history": history, "lang": lang})
+            if data is None:
+                return
+            if data.get("needsApproval"):
+                history = history + [{"role": "assistant", "content": data.get("plain_summary", "")}]
+                if self.rng.random() >= self.args.approve_ratio:
+                    data = await self.post(session, "/api/conversation",
+                                           {"history": history, "lang": lang, "approval": False})
+                    if data is None:
+                        return
+                data = await self.post(session, "/api/conversation",
+                                       {"history": history, "lang": lang, "approval": True})
+                if data is None:
+                    return
+                if data.get("done") and self.rng.random() < self.args.translate_ratio:
+                    await self.post(session, "/api/translate_report", {
+                        "medical_summary": data.get("medical_summary", ""),
+                        "plain_summary": data.get("plain_summary", ""),
+                        "recommended_specialties": data.get("recommended_specialties", []),
+                        "targetLang": "en",
+                    })
+                self.completed += 1
+                return
+            history = history + [{"role": "assistant", "content": data.get("next_question", "")},
+                                 {"role": "user", "content": self.rng.choice(["是的", "没有", "大概两天"])}]
+
+    async def run(self) -> float:
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(self.args.consultations):
+            queue.put_nowait(i)
+        timeout = aiohttp.ClientTimeout(total=self.args.request_timeout)
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0), timeout=timeout) as session:
+            async def worker() -> None:
+                while not queue.empty():
+                    await self.consultation(session, queue.get_nowait())
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+            return time.perf_counter() - t0
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--mode", choices=["flask", "asgi"], default="asgi")
+    ap.add_argument("--base-url", help="壓測既有的 API（不啟動子行程）；此時假上游需自行指向")
+    ap.add_argument("--consultations", type=int, default=100)
+    ap.add_argument("--concurrency", type=int, default=20)
+    ap.add_argument("--max-turns", type=int, default=8)
+    ap.add_argument("--approve-ratio", type=float, default=0.8)
+    ap.add_argument("--translate-ratio", type=float, default=0.5)
+    ap.add_argument("--lang", default="zhCN")
+    ap.add_argument("--request-timeout", type=float, default=120.0)
+    ap.add_argument("--mock-port", type=int, default=0)
+    add_mock_arguments(ap)
+    args = ap.parse_args()
+
+    mock = mock_from_args(args)
+    mock_port = args.mock_port or free_port()
+    mock_runner = await start_mock(mock, port=mock_port)
+    proc = None
+    try:
+        if args.base_url:
+            base = args.base_url.rstrip("/")
+        else:
+            port = free_port()
+            base = f"http://127.0.0.1:{port}"
+            # 每次壓測都是新內容，關閉回覆快取避免干擾上游呼叫數
+            proc = start_server(args.mode, port, f"http://127.0.0.1:{mock_port}", {"LLM_CACHE_SIZE": "0"})
+        await wait_ready(base)
+
+        runner = Runner(base, args)
+        wall = await runner.run()
+        await asyncio.sleep(0.5)    # 等背景推測任務落地再統計上游呼叫
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+        await mock_runner.cleanup()
+
+    total = sum(len(v) for v in runner.latencies.values())
+    print(f"mode={args.mode} consultations={args.consultations} concurrency={args.concurrency} "
+          f"latency={args.latency}:{args.latency_median}s tokens/s={args.tokens_per_sec}")
+    print(f"wall {wall:.1f}s  completed {runner.completed}  "
+          f"{runner.completed / wall:.2f} consultations/s  {total / wall:.1f} req/s")
+    print(f"\n{'endpoint':<26}{'n':>6}{'err':>6}{'p50':>8}{'p95':>8}{'p99':>8}")
+    for endpoint in sorted(set(runner.latencies) | set(runner.errors)):
+        lat = runner.latencies[endpoint]
+        print(f"{endpoint:<26}{len(lat):>6}{runner.errors[endpoint]:>6}"
+              f"{percentile(lat, .5):>8.2f}{percentile(lat, .95):>8.2f}{percentile(lat, .99):>8.2f}")
+    calls = mock.stats["requests"]
+    print(f"\nupstream LLM calls {calls}  ({calls / max(1, args.consultations):.2f} per consultation)")
+    for key in sorted(k for k in mock.stats if k != "requests"):
+        print(f"  {key:<24}{mock.stats[key]:>6}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
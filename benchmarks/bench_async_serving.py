@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+同步（Flask / werkzeug 多執行緒）與非同步（uvicorn + asgi.py）入口的壓測對照。
+
+腳本會啟動本地假上游（mock_llm.py，固定延遲、瞬間輸出），
+分別以兩種方式在單一 worker 上啟動 API，再以 N 個並發會話打 /api/conversation，
+回報吞吐量、延遲分位數與「單核可維持的並發會話數」（吞吐量 × 單次上游延遲）。
+
+用法：python benchmarks/bench_async_serving.py --concurrency 50 200 --latency 1.0
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_api import free_port, start_server, wait_ready  # noqa: E402
+from mock_llm import MockLLM, start_mock  # noqa: E402
+
+
+async def _load(url: str, concurrency: int, rounds: int) -> dict:
+    latencies, errors = [], 0
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=120)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def one_session(i: int) -> None:
+            nonlocal errors
+            history = [{"role": "user", "content": f"头痛 #{i}"}]
+            for _ in range(rounds):
+                t0 = time.perf_counter()
+                try:
+                    async with session.post(url, json={"history": history}) as resp:
+                        await resp.read()
+                        if resp.status != 200:
+                            errors += 1
+                            continue
+                except aiohttp.ClientError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one_session(i) for i in range(concurrency)))
+        wall = time.perf_counter() - t0
+
+    latencies.sort()
+    pct = (lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else float("nan"))
+    return {"ok": len(latencies), "errors": errors, "wall": wall,
+            "rps": len(latencies) / wall, "p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99),
+            "mean": statistics.fmean(latencies) if latencies else float("nan")}
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[50, 200])
+    ap.add_argument("--latency", type=float, default=1.0, help="假上游每次回覆的延遲（秒）")
+    ap.add_argument("--rounds", type=int, default=3, help="每個會話連續發送的輪數")
+    ap.add_argument("--modes", nargs="+", default=["flask", "asgi"], choices=["flask", "asgi"])
+    args = ap.parse_args()
+
+    up_port = free_port()
+    mock = MockLLM(latency="fixed", latency_median=args.latency, tokens_per_sec=0, confidence_step=0)
+    runner = await start_mock(mock, port=up_port)
+    upstream = f"http://127.0.0.1:{up_port}"
+
+    print(f"{'mode':<7}{'conc':>6}{'ok':>7}{'err':>6}{'rps':>9}{'p50':>8}{'p95':>8}{'p99':>8}{'sessions/core':>15}")
+    try:
+        for mode in args.modes:
+            port = free_port()
+            proc = start_server(mode, port, upstream, {"LLM_CACHE_SIZE": "0"})
+            url = f"http://127.0.0.1:{port}/api/conversation"
+            try:
+                await wait_ready(f"http://127.0.0.1:{port}")
+                for conc in args.concurrency:
+                    r = await _load(url, conc, args.rounds)
+                    print(f"{mode:<7}{conc:>6}{r['ok']:>7}{r['errors']:>6}{r['rps']:>9.1f}"
+                          f"{r['p50']:>8.2f}{r['p95']:>8.2f}{r['p99']:>8.2f}"
+                          f"{r['rps'] * args.latency:>15.0f}")
+            finally:
+                proc.terminate()
+                proc.wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
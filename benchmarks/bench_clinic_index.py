@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+clinic_index.ClinicIndex 的正確性與延遲：
+- 生成 --clinics 間分佈在香港範圍內的合成診所（科室 / 語言取自 i18n_catalog.py 的對照表）
+- 每種查詢與逐一計算 haversine 的暴力解比對（地圖頁原本在前端的做法），結果必須相同
+- 報告每種查詢的平均 / p99 延遲；另含遠離資料範圍的查詢點（新加坡、雅加達）與空索引
+
+用法：python benchmarks/bench_clinic_index.py [--clinics 10000] [--queries 500]
+"""
+
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clinic_index import ClinicIndex  # noqa: E402
+from i18n_catalog import DEPARTMENT_I18N, LANGUAGE_I18N  # noqa: E402
+
+DEPARTMENTS = list(DEPARTMENT_I18N.values())
+LANGUAGES = list(LANGUAGE_I18N.values())
+
+
+def synthetic_clinics(n, seed=0):
+    rng = random.Random(seed)
+    # 大部分集中在幾個市區，其餘散佈全港
+    centres = [(22.282, 114.158), (22.319, 114.169), (22.381, 114.188), (22.446, 114.035), (22.293, 114.2)]
+    clinics = []
+    for i in range(n):
+        if rng.random() < 0.8:
+            clat, clng = rng.choice(centres)
+            lat, lng = rng.gauss(clat, 0.02), rng.gauss(clng, 0.02)
+        else:
+            lat, lng = rng.uniform(22.15, 22.55), rng.uniform(113.85, 114.35)
+        doctors = []
+        for _ in range(rng.randint(1, 6)):
+            # 前幾個科室 / 語言較常見
+            spec = DEPARTMENTS[min(int(rng.expovariate(0.15)), len(DEPARTMENTS) - 1)]
+            langs = rng.sample(LANGUAGES[:3], rng.randint(1, 2)) + (
+                [rng.choice(LANGUAGES[3:])] if rng.random() < 0.1 else [])
+            doctors.append({"name": f"醫生 {i}", "specialty": spec["zh_TW"], "specialty_i18n": spec,
+                            "languages": [l["zh_TW"] for l in langs], "languages_i18n": langs})
+        clinics.append({"clinic_id": i, "name": f"診所 {i}", "latitude": f"{lat:.8f}",
+                        "longitude": f"{lng:.8f}", "doctors": doctors})
+    return clinics
+
+
+def haversine(la1, lo1, la2, lo2):
+    dlat, dlng = math.radians(la2 - la1), math.radians(lo2 - lo1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(la1)) * math.cos(math.radians(la2)) * math.sin(dlng / 2) ** 2
+    return 6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def brute_force(clinics, lat, lng, radius_km, specialties, languages, limit, offset):
+    hits = []
+    for c in clinics:
+        if specialties and not any(d["specialty"] in specialties for d in c["doctors"]):
+            continue
+        if languages and not any(l in languages for d in c["doctors"] for l in d["languages"]):
+            continue
+        dist = haversine(lat, lng, float(c["latitude"]), float(c["longitude"]))
+        if radius_km is None or dist <= radius_km:
+            hits.append((dist, c["clinic_id"]))
+    hits.sort()
+    return len(hits), hits[offset:offset + limit]
+
+
+def same(expected, got):
+    """距離容許 1 mm 的誤差；距離相同的診所順序可以不同"""
+    total, hits = expected
+    if total != got["total"] or len(hits) != len(got["results"]):
+        return False
+    return all(abs(d - g[1]) < 1e-6 for (d, _), g in zip(hits, got["results"])) and \
+        {i for _, i in hits} == {c["clinic_id"] for c, _ in got["results"]}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--clinics", type=int, default=10000)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--check", type=int, default=100, help="與暴力解比對的查詢數")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    clinics = synthetic_clinics(args.clinics, args.seed)
+    started = time.perf_counter()
+    index = ClinicIndex(clinics)
+    print(f"{len(index)} clinics, {len(index.grid)} cells, built in {time.perf_counter() - started:.2f}s\n")
+
+    rng = random.Random(args.seed + 1)
+    rare = DEPARTMENTS[-1]["zh_TW"]
+    kinds = {
+        "nearest 20": lambda: dict(limit=20),
+        "nearest 20, page 5": lambda: dict(limit=20, offset=80),
+        "within 2 km": lambda: dict(radius_km=2.0, limit=50),
+        "within 5 km": lambda: dict(radius_km=5.0, limit=50),
+        "within 5 km + spec + lang": lambda: dict(
+            radius_km=5.0, limit=50, specialties=[rng.choice(DEPARTMENTS[:5])["zh_TW"]],
+            languages=[LANGUAGES[1]["zh_TW"]]),
+        "nearest 20 + rare spec": lambda: dict(limit=20, specialties=[rare]),
+        "nearest 20 from Singapore": lambda: dict(limit=20, lat=1.35, lng=103.82),
+        "nearest 20 from Jakarta": lambda: dict(limit=20, lat=-6.2, lng=106.85),
+        "all clinics by distance": lambda: dict(limit=len(clinics)),
+    }
+    print(f"{'query':<28}{'mean us':>10}{'p99 us':>10}{'results':>9}{'mismatches':>12}")
+    failed = False
+    for name, make in kinds.items():
+        timings, mismatches, sizes = [], 0, []
+        for n in range(args.queries):
+            q = make()
+            lat, lng = q.pop("lat", None), q.pop("lng", None)
+            if lat is None:
+                lat, lng = rng.uniform(22.2, 22.5), rng.uniform(113.9, 114.3)
+            t0 = time.perf_counter()
+            got = index.search(lat=lat, lng=lng, **q)
+            timings.append((time.perf_counter() - t0) * 1e6)
+            sizes.append(len(got["results"]))
+            if n < args.check:
+                expected = brute_force(clinics, lat, lng, q.get("radius_km"), q.get("specialties"),
+                                       q.get("languages"), q["limit"], q.get("offset", 0))
+                mismatches += not same(expected, got)
+        timings.sort()
+        failed |= bool(mismatches)
+        print(f"{name:<28}{statistics.mean(timings):>10.0f}{timings[int(len(timings) * 0.99) - 1]:>10.0f}"
+              f"{statistics.mean(sizes):>9.1f}{mismatches:>12}")
+
+    # 沒有載入資料時（資料檔不存在）的索引：查詢必須立即回傳空結果
+    empty = ClinicIndex([])
+    t0 = time.perf_counter()
+    got = [empty.search(lat=22.3, lng=114.1, **q) for q in (dict(limit=20), dict(radius_km=5.0, limit=20))]
+    elapsed = (time.perf_counter() - t0) * 1e6 / len(got)
+    mismatches = sum(g["total"] != 0 or g["results"] != [] for g in got)
+    failed |= bool(mismatches)
+    print(f"{'empty index':<28}{elapsed:>10.0f}{elapsed:>10.0f}{0:>9.1f}{mismatches:>12}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
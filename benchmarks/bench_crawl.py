@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+在本地 finddoc 假站點上比較逐個抓取與並發抓取：
+- 兩種模式的輸出必須完全相同
+- 報告耗時、請求數、重試數，以及站點觀察到的最大同時在途請求數（不應超過 --max-in-flight）
+
+用法：python benchmarks/bench_crawl.py --clinics 300 --workers 8 --latency 0.05 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import crawl  # noqa: E402
+from finddoc_fixture import add_fixture_arguments, fixture_from_args, start_fixture  # noqa: E402
+
+
+def serve_in_background(fixture, port):
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(start_fixture(fixture, port=port))
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+
+
+def run_crawl(base_url, clinics, workers, doctor_workers, rps, max_in_flight, retries, fixture):
+    fixture.stats.clear()
+    fetcher = crawl.Fetcher(rps=rps, max_in_flight=max_in_flight, retries=retries, backoff=0.05)
+    started = time.perf_counter()
+    out = sorted(crawl.crawl(range(clinics), fetcher, workers, doctor_workers, base_url),
+                 key=lambda c: c["clinic_id"])
+    elapsed = time.perf_counter() - started
+    with urllib.request.urlopen(base_url + "/_stats") as r:
+        seen = json.load(r)
+    return out, elapsed, fetcher.stats, seen
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--port", type=int, default=8002)
+    ap.add_argument("--clinics", type=int, default=300, help="抓取的診所 id 數")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--doctor-workers", type=int, default=8)
+    ap.add_argument("--rps", type=float, default=0.0)
+    ap.add_argument("--max-in-flight", type=int, default=8)
+    ap.add_argument("--retries", type=int, default=5)
+    ap.add_argument("--skip-sequential", action="store_true")
+    add_fixture_arguments(ap)
+    args = ap.parse_args()
+
+    fixture = fixture_from_args(args)
+    serve_in_background(fixture, args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    modes = [("concurrent", args.workers, args.doctor_workers, args.rps, args.max_in_flight)]
+    if not args.skip_sequential:
+        modes.insert(0, ("sequential", 1, 1, 0.0, 1))
+    outputs = []
+    print(f"{'mode':<12}{'clinics':>8}{'doctors':>9}{'seconds':>9}{'requests':>10}"
+          f"{'retries':>9}{'failures':>10}{'max in flight':>15}")
+    for name, workers, doctor_workers, rps, max_in_flight in modes:
+        out, elapsed, stats, seen = run_crawl(
+            base_url, args.clinics, workers, doctor_workers, rps, max_in_flight, args.retries, fixture
+        )
+        outputs.append(out)
+        print(f"{name:<12}{len(out):>8}{sum(len(c['doctors']) for c in out):>9}{elapsed:>9.2f}"
+              f"{stats['requests']:>10}{stats['retries']:>9}{stats['failures']:>10}{seen.get('max_in_flight', 0):>15}")
+    if len(outputs) == 2:
+        print("\noutputs identical:", outputs[0] == outputs[1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比較 crawl_extract.py 的各個解析後端：
+- 等價性：每個頁面都同時跑診所頁與醫生頁解析，結果必須與 soup（完整樹）完全相同
+- 速度：每頁平均 CPU 時間與相對 soup 的倍數
+
+語料：--pages DIR 下所有 .html（保存的 finddoc 頁面，遞迴搜尋），
+加上 finddoc_fixture 生成的頁面與一組刁鑽的邊界案例（實體、註解、巢狀、script 中的假標記等）。
+
+用法：python benchmarks/bench_extract.py [--pages saved_pages/] [--generated 200] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from crawl_extract import BACKENDS  # noqa: E402
+from finddoc_fixture import FinddocFixture  # noqa: E402
+
+PAGE_URL = "https://www.finddoc.com/practices/the-london-medical-clinic-1"
+
+EDGE_CASES = [
+    # 實體、註解、<br>、多餘空白
+    '<div class="clinic-details__name"> Dr &amp; Co <!-- x --> 診所 </div>'
+    '<p class="clinic-address">九龍<br>彌敦道&nbsp;1 號</p>',
+    # class 有多個值、電話 class 是子字串、地圖連結沒有座標、第二個地圖連結不應被使用
+    '<a class="btn btn-et-phone-link" href="tel:1">1234 <span>5678</span></a>'
+    '<a href="https://www.google.com/maps/place/x">map</a><a href="https://google.com/maps?query=1.5,2.5">m</a>',
+    # 沒有連結的醫生、連結外的 h3、巢狀 span、相對 / 絕對 href、空 href
+    '<div class="doctor-list__item"><h3>No link</h3></div>'
+    '<div class="doctor-list__item x"><h3>Outside</h3><a href="../doctors/a"><h3> A <span>B</span></h3>'
+    '<p class="doctor-list__specialty other">內科</p></a></div>'
+    '<div class="doctor-list__item"><a href="https://example.com/d/b"><p class="doctor-list__specialty">眼科</p></a>'
+    '<a href="/second"><h3>not this link</h3></a></div>'
+    '<div class="doctor-list__item"><a href>empty</a></div>',
+    # 巢狀醫生條目、script / style 中的假標記
+    '<script>var s = \'<div class="doctor-list__item"><a href="/fake"><h3>x</h3></a></div>\';</script>'
+    '<style>.clinic-address{}</style>'
+    '<div class="doctor-list__item"><a href="/outer"><h3>Outer</h3></a>'
+    '<div class="doctor-list__item"><a href="/inner"><h3>Inner</h3></a></div></div>',
+    # 未閉合 / 錯配的標籤
+    '<div class="clinic-details__name">Name <b>bold</div><p class="clinic-address">addr</i></p>'
+    '<div class="doctor-list__item"><a href="/u"><h3>Unclosed<p class="doctor-list__specialty">外科</a></div>',
+    # 醫生頁：第一個區塊不是語言、語言在後、巢狀 li、其他 ul 中的 li 不算
+    '<div class="doctor-detail-info-list"><h3 class="doctor-detail-info-list__title">學歷</h3>'
+    '<ul class="doctor-detail-info-list__list"><li>港大</li></ul></div>'
+    '<div class="doctor-detail-info-list"><ul class="other"><li>不算</li></ul>'
+    '<h3 class="doctor-detail-info-list__title">語<b>言</b></h3>'
+    '<ul class="doctor-detail-info-list__list"><li> 廣東話、 英語 </li><li>普通話<ul><li>潮州話</li></ul></li></ul>'
+    '</div><div class="doctor-detail-info-list"><h3 class="doctor-detail-info-list__title">語言</h3>'
+    '<ul class="doctor-detail-info-list__list"><li>法語</li></ul></div>',
+    # 沒有語言區塊
+    '<div class="doctor-detail-info-list"><h3>語言</h3><ul class="doctor-detail-info-list__list"><li>x</li></ul></div>',
+    "",
+]
+
+
+def load_corpus(pages_dir, generated):
+    corpus = []
+    if pages_dir:
+        for root, _, files in os.walk(pages_dir):
+            for name in sorted(files):
+                if name.endswith(".html"):
+                    with open(os.path.join(root, name), encoding="utf-8", errors="replace") as f:
+                        corpus.append((os.path.join(root, name), f.read()))
+    fixture = FinddocFixture()
+    clinic_id = 0
+    while sum(1 for n, _ in corpus if n.startswith("clinic-")) < generated // 2:
+        page = fixture.clinic_html(clinic_id)
+        if page:
+            corpus.append((f"clinic-{clinic_id}", page))
+        clinic_id += 1
+    corpus += [(f"doctor-{n}", fixture.doctor_html(n)) for n in range(generated // 2)]
+    corpus += [(f"edge-{i}", page) for i, page in enumerate(EDGE_CASES)]
+    return corpus
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--pages", help="保存的 finddoc 頁面目錄")
+    ap.add_argument("--generated", type=int, default=200, help="生成的頁面數（診所、醫生各半）")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    corpus = load_corpus(args.pages, args.generated)
+    print(f"{len(corpus)} pages, {sum(len(p) for _, p in corpus) / 1024:.0f} KiB")
+
+    reference = {name: (BACKENDS["soup"].clinic(page, PAGE_URL), BACKENDS["soup"].doctor(page))
+                 for name, page in corpus}
+    timings = {}
+    for backend, extractor in BACKENDS.items():
+        mismatches = 0
+        for name, page in corpus:
+            got = (extractor.clinic(page, PAGE_URL), extractor.doctor(page))
+            if got != reference[name]:
+                mismatches += 1
+                if mismatches <= 3:
+                    print(f"  {backend} differs on {name}:\n    soup: {reference[name]}\n    {backend}: {got}")
+        started = time.process_time()
+        for _ in range(args.repeat):
+            for _, page in corpus:
+                extractor.clinic(page, PAGE_URL)
+                extractor.doctor(page)
+        timings[backend] = ((time.process_time() - started) / (args.repeat * len(corpus)), mismatches)
+
+    print(f"\n{'backend':<10}{'ms/page':>9}{'speedup':>9}{'mismatches':>12}")
+    for backend, (seconds, mismatches) in timings.items():
+        print(f"{backend:<10}{seconds * 1e3:>9.2f}{timings['soup'][0] / seconds:>8.1f}x{mismatches:>12}")
+    if any(m for _, m in timings.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
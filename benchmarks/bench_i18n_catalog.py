@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+i18n_catalog 的查詢吞吐量與模糊匹配準確率：
+- 精確查詢：表中每個名稱（四種語言與別名）加上大小寫 / 空白 / 標點變體，
+  與逐條掃描全部名稱的做法比較
+- 模糊查詢：對名稱隨機刪 / 換 / 插 / 調換一個字元生成近似錯字，
+  與對全部名稱呼叫 difflib.get_close_matches（同樣的分數與門檻）比較準確率與速度
+
+用法：python benchmarks/bench_i18n_catalog.py [--typos 2000] [--repeat 5]
+"""
+
+import argparse
+import difflib
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from i18n_catalog import DEPARTMENTS, LANGUAGES, normalize  # noqa: E402
+
+
+def labels_of(catalog):
+    """[(名稱, 規範鍵)]：表中四種語言的名稱與別名"""
+    pairs = {}
+    for key, entry in catalog.table.items():
+        for label in (key, *entry.values()):
+            pairs.setdefault(label, key)
+    for label in catalog._exact:
+        pairs.setdefault(label, catalog._exact[label])
+    return list(pairs.items())
+
+
+def variants(label):
+    return [label, label.upper(), label.lower(), f"  {label} ", label.replace(" ", "  "), label.replace("&", "and")]
+
+
+def typo(label, rng):
+    chars = list(label)
+    i = rng.randrange(len(chars))
+    op = rng.choice("dsit" if len(chars) > 1 else "si")
+    pool = string.ascii_lowercase if label.isascii() else "科內内外病醫医學学症"
+    if op == "d":
+        del chars[i]
+    elif op == "s":
+        chars[i] = rng.choice(pool)
+    elif op == "i":
+        chars.insert(i, rng.choice(pool))
+    elif i + 1 < len(chars):
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    return "".join(chars)
+
+
+def linear_scan(catalog):
+    """沒有索引時的做法：逐條比對每個名稱（含別名）"""
+    names = list(catalog._exact.items())
+
+    def lookup(label):
+        wanted = normalize(label)
+        for name, key in names:
+            if name == wanted:
+                return key
+        return None
+    return lookup
+
+
+def difflib_matcher(catalog):
+    names = list(catalog._exact)
+
+    def match(label):
+        found = difflib.get_close_matches(normalize(label), names, n=1, cutoff=catalog.cutoff)
+        return catalog._exact[found[0]] if found else None
+    return match
+
+
+def rate(fn, inputs, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for x in inputs:
+            fn(x)
+    return repeat * len(inputs) / (time.perf_counter() - started)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--typos", type=int, default=2000, help="每張表生成的錯字數")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+
+    print(f"{'table':<12}{'lookup':<14}{'labels':>8}{'lookups/s':>12}{'correct':>9}")
+    for name, catalog in (("department", DEPARTMENTS), ("language", LANGUAGES)):
+        pairs = [(v, key) for label, key in labels_of(catalog) for v in variants(label)]
+        inputs = [label for label, _ in pairs]
+        for method, fn in (("index", catalog.lookup), ("linear scan", linear_scan(catalog))):
+            correct = sum(fn(label) == key for label, key in pairs)
+            print(f"{name:<12}{method:<14}{len(pairs):>8}{rate(fn, inputs, args.repeat):>12.0f}"
+                  f"{correct / len(pairs):>9.1%}")
+
+    print(f"\n{'table':<12}{'fuzzy':<14}{'typos':>8}{'lookups/s':>12}{'correct':>9}{'wrong':>8}{'none':>8}")
+    for name, catalog in (("department", DEPARTMENTS), ("language", LANGUAGES)):
+        source = [(label, key) for label, key in labels_of(catalog) if len(normalize(label)) >= 4]
+        pairs = []
+        while len(pairs) < args.typos:
+            label, key = rng.choice(source)
+            wrong = typo(label, rng)
+            if catalog.lookup(wrong) is None:
+                pairs.append((wrong, key))
+        inputs = [label for label, _ in pairs]
+
+        def index_match(label, catalog=catalog):
+            found = catalog.match(label)
+            return found[0] if found else None
+
+        for method, fn in (("bigram+ratio", index_match), ("difflib", difflib_matcher(catalog))):
+            got = [fn(label) for label in inputs]
+            correct = sum(g == key for g, (_, key) in zip(got, pairs))
+            none = got.count(None)
+            repeat = max(1, args.repeat // 5) if method == "difflib" else args.repeat
+            print(f"{name:<12}{method:<14}{len(pairs):>8}{rate(fn, inputs, repeat):>12.0f}"
+                  f"{correct / len(pairs):>9.1%}{(len(pairs) - correct - none) / len(pairs):>8.1%}"
+                  f"{none / len(pairs):>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
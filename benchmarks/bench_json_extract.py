@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比較舊版 safe_json_load（正則 + json.loads）與 IncrementalJSONExtractor：
+- 正確率：語料包含正常輸出、帶圍欄 / 前後說明文字、尾部含 '}' 的說明、截斷輸出，
+  以及說明文字中的 {...}、缺逗號、空物件等應判定為失敗（或應略過）的輸入
+- 速度：整段解析，以及按 8 字元切塊模擬串流時「第一個欄位可用」所需的字元數
+
+用法：python benchmarks/bench_json_extract.py [--repeat 2000]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_json import IncrementalJSONExtractor, extract_json  # noqa: E402
+
+ANALYSIS = {"analysis_text": "患者头痛三天，伴有低热。", "confidence_level": 62,
+            "next_question": "您最近是否有咳嗽或流鼻涕？"}
+PLAIN = {"plain_summary": "您可能是病毒性感冒引起的头痛，建议多休息、多喝水。"}
+PROFESSIONAL = {"medical_summary": "Headache x3d with low-grade fever, r/o URTI.",
+                "plain_summary": "You probably have a cold.",
+                "recommended_specialties": [{"科目": "内科", "置信度": 70},
+                                            {"科目": "耳鼻喉科", "置信度": 30}]}
+
+
+def _dump(obj, indent=2):
+    return json.dumps(obj, ensure_ascii=False, indent=indent)
+
+
+# (名稱, 輸出文本, 期望結果；None 表示應判定為失敗)
+CORPUS = [
+    ("plain", _dump(ANALYSIS), ANALYSIS),
+    ("compact", _dump(PLAIN, None), PLAIN),
+    ("fenced", "```json\n" + _dump(PROFESSIONAL) + "\n```", PROFESSIONAL),
+    ("leading-prose", "好的，以下是分析结果：\n" + _dump(ANALYSIS), ANALYSIS),
+    ("trailing-brace", _dump(PLAIN) + "\n\n如有疑问请告诉我 {随时}。", PLAIN),
+    ("fenced-trailing", "```json\n" + _dump(ANALYSIS) + "\n```\n注：置信度仅供参考}", ANALYSIS),
+    ("raw-newline", '{"plain_summary": "第一行\n第二行"}', {"plain_summary": "第一行\n第二行"}),
+    ("escaped", _dump({"next_question": "您说的\"刺痛\"是指{哪里}？"}),
+     {"next_question": "您说的\"刺痛\"是指{哪里}？"}),
+    ("truncated", _dump(PROFESSIONAL)[:-30], None),
+    ("no-json", "抱歉，我无法回答这个问题。", None),
+    ("prose-braces", "I cannot answer {sorry}", None),
+    ("missing-comma", '{"a":"x" "b":2}', None),
+    ("empty-object", "{}", None),
+    ("prose-then-json", "格式如下 {见下文}：\n" + _dump(PLAIN), PLAIN),
+]
+
+
+def legacy_safe_json_load(text: str) -> dict:
+    """baseline 版本的 safe_json_load，原樣保留作對照"""
+    cleaned = text.strip().lstrip("```").rstrip("```").strip()
+    match = re.search(r"\{.*\}", cleaned, re.S)
+    if not match:
+        raise ValueError(f"LLM did not return JSON: {text[:120]}...")
+    return json.loads(match.group(0))
+
+
+def _check(fn, text, expected):
+    try:
+        out = fn(text)
+    except Exception:
+        return expected is None
+    return out == expected
+
+
+def _time(fn, text, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        try:
+            fn(text)
+        except Exception:
+            pass
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def _first_field_offset(text, chunk=8):
+    """按 chunk 字元切塊餵入，回傳第一個欄位閉合時已收到的字元數"""
+    parser = IncrementalJSONExtractor()
+    for i in range(0, len(text), chunk):
+        if parser.feed(text[i:i + chunk]):
+            return min(i + chunk, len(text))
+    return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args()
+
+    print(f"{'case':<18}{'legacy':>8}{'new':>8}{'legacy µs':>12}{'new µs':>10}{'1st field @':>14}")
+    ok_legacy = ok_new = 0
+    for name, text, expected in CORPUS:
+        a = _check(legacy_safe_json_load, text, expected)
+        b = _check(extract_json, text, expected)
+        ok_legacy += a
+        ok_new += b
+        first = _first_field_offset(text)
+        print(f"{name:<18}{'ok' if a else 'FAIL':>8}{'ok' if b else 'FAIL':>8}"
+              f"{_time(legacy_safe_json_load, text, args.repeat):>12.1f}"
+              f"{_time(extract_json, text, args.repeat):>10.1f}"
+              f"{(f'{first}/{len(text)}' if first else '-'):>14}")
+    print(f"\ncorrect: legacy {ok_legacy}/{len(CORPUS)}, incremental {ok_new}/{len(CORPUS)}")
+
+
+if __name__ == "__main__":
+    main()
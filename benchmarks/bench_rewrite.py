@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比較 public/rewrite.py 的一次載入模式與流式模式：
+- 生成 --clinics 間合成診所（crawl.py 的輸出格式：每行一間的 JSON 陣列），含少量對照表沒有的科室 / 語言
+- 每種模式在獨立子行程中執行，報告耗時與峰值記憶體（含 worker 子行程）
+- 逐條比對各模式的輸出，內容必須相同
+
+用法：python benchmarks/bench_rewrite.py [--clinics 100000] [--workers 1,4] [--keep DIR]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "public"))
+
+import rewrite  # noqa: E402
+
+# 在子行程中執行 rewrite.main，結束時輸出自身與子行程的峰值 RSS（KB）
+RUNNER = (
+    "import resource, sys; sys.path.insert(0, {public!r}); import rewrite; "
+    "sys.argv = ['rewrite.py'] + {argv!r}; rewrite.main(); "
+    "print('MAXRSS', max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "
+    "resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss))"
+)
+
+
+def write_synthetic(path, n, seed=0):
+    rng = random.Random(seed)
+    specialties = [v["zh_TW"] for v in rewrite.DEPARTMENT_I18N.values()] + ["運動醫學", "足病診療"]
+    languages = [v["zh_TW"] for v in rewrite.LANGUAGE_I18N.values()] + ["韓語"]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i in range(n):
+            doctors = [{
+                "name": f"醫生 {i}-{j}",
+                "specialty": rng.choice(specialties),
+                "languages": rng.sample(languages, rng.randint(1, 3)),
+            } for j in range(rng.randint(1, 6))]
+            clinic = {"clinic_id": i, "name": f"診所 {i}", "address": f"香港九龍彌敦道 {i} 號",
+                      "phone": f"2{i:07d}", "latitude": f"{22.2 + rng.random() * 0.3:.8f}",
+                      "longitude": f"{113.9 + rng.random() * 0.4:.8f}", "doctors": doctors}
+            f.write(("," if i else "") + "\n" + json.dumps(clinic, ensure_ascii=False, separators=(",", ":")))
+        f.write("\n]\n")
+
+
+def run(argv):
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", RUNNER.format(public=os.path.join(ROOT, "public"), argv=argv)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    maxrss = int(out.rsplit("MAXRSS", 1)[1])
+    return time.perf_counter() - started, maxrss / 1024
+
+
+def same_records(a, b):
+    with open(a, encoding="utf-8") as fa, open(b, encoding="utf-8") as fb:
+        for x, y in zip(rewrite.iter_records(fa), rewrite.iter_records(fb)):
+            x = json.loads(x) if isinstance(x, str) else x
+            y = json.loads(y) if isinstance(y, str) else y
+            if x != y:
+                return False
+    return True
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--clinics", type=int, default=100000)
+    ap.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="流式模式的進程數，逗號分隔")
+    ap.add_argument("--chunk-size", type=int, default=rewrite.CHUNK_SIZE)
+    ap.add_argument("--skip-legacy", action="store_true", help="不跑一次載入模式（資料很大時）")
+    ap.add_argument("--keep", help="保留輸入 / 輸出檔案的目錄")
+    args = ap.parse_args()
+
+    workdir = args.keep or tempfile.mkdtemp(prefix="bench_rewrite_")
+    os.makedirs(workdir, exist_ok=True)
+    src = os.path.join(workdir, "clinic_data.json")
+    started = time.perf_counter()
+    write_synthetic(src, args.clinics)
+    print(f"{args.clinics} clinics, {os.path.getsize(src) / 2**20:.1f} MiB input "
+          f"(generated in {time.perf_counter() - started:.1f}s)\n")
+
+    modes = [] if args.skip_legacy else [("load all", ["-i", src, "-o", os.path.join(workdir, "legacy.json")])]
+    for w in sorted({int(w) for w in args.workers.split(",") if w.strip()}):
+        modes.append((f"stream, {w} worker{'s' if w > 1 else ''}",
+                      ["-i", src, "-o", os.path.join(workdir, f"stream{w}.json"), "--stream",
+                       "--workers", str(w), "--chunk-size", str(args.chunk_size)]))
+
+    print(f"{'mode':<22}{'seconds':>9}{'clinics/s':>11}{'peak MiB':>10}{'output MiB':>12}")
+    outputs = []
+    for name, argv in modes:
+        seconds, peak = run(argv)
+        out = argv[argv.index("-o") + 1]
+        outputs.append(out)
+        print(f"{name:<22}{seconds:>9.2f}{args.clinics / seconds:>11.0f}{peak:>10.0f}"
+              f"{os.path.getsize(out) / 2**20:>12.1f}")
+    if len(outputs) > 1:
+        print("\noutputs identical:", all(same_records(outputs[0], o) for o in outputs[1:]))
+    if not args.keep:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
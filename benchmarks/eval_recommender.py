@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+離線評估本地科室推薦（recommender.py）與 LLM 專業報告 recommended_specialties 的一致程度。
+
+輸入為 batch_triage.py 的對話 JSONL，配合 --triage 指定其輸出（以 id 對應）；
+或不加 --triage，每行自帶 LLM 結果：
+    {"id": ..., "history": [...], "recommended_specialties": [{"科目": ..., "置信度": ...}]}
+
+指標：
+- top-1 一致：本地第一名 == LLM 第一名
+- LLM 第一名落在本地前 3 名
+- shortlist 召回：LLM 推薦的科室有多少被 DEPARTMENT_SHORTLIST=N 的列表保留（決定 N 的依據）
+- 每次推薦的延遲
+
+用法：python benchmarks/eval_recommender.py conversations.jsonl --triage triage_out.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_triage import percentile, read_items  # noqa: E402
+from recommender import DepartmentRecommender, consultation_text, normalize  # noqa: E402
+
+I18N_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         "app", "report", "department_i18n.json")
+
+
+def load_aliases() -> Dict[str, str]:
+    """LLM 可能用 zhTW / en / id 的科室名作答；全部對應回简体鍵"""
+    with open(I18N_PATH, encoding="utf-8") as f:
+        table = json.load(f)
+    aliases: Dict[str, str] = {}
+    for key, names in table.items():
+        canonical = normalize(names.get("zh_CN", key))
+        for name in [key, *names.values()]:
+            aliases[normalize(name).strip()] = canonical
+    return aliases
+
+
+def llm_departments(specialties: List[dict], aliases: Dict[str, str]) -> List[str]:
+    """依置信度排序後的科室鍵；無法對應的名稱原樣保留（會計入 unknown）"""
+    ranked = sorted((s for s in specialties if isinstance(s, dict)), key=lambda s: -float(s.get("置信度") or 0))
+    out = []
+    for s in ranked:
+        name = normalize(str(s.get("科目", ""))).strip()
+        out.append(aliases.get(name, name))
+    return out
+
+
+def load_labels(path: str) -> Dict[str, List[dict]]:
+    labels = {}
+    for item_id, record in read_items(path):
+        specialties = (record.get("result") or {}).get("recommended_specialties")
+        if specialties:
+            labels[item_id] = specialties
+    return labels
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("input", help="對話 JSONL")
+    ap.add_argument("--triage", help="batch_triage.py 的輸出 JSONL（LLM 結果）")
+    ap.add_argument("--shortlist", default="3,5,8", help="評估的 DEPARTMENT_SHORTLIST 值")
+    args = ap.parse_args()
+
+    recommender = DepartmentRecommender()
+    aliases = load_aliases()
+    known = set(aliases.values())
+    labels = load_labels(args.triage) if args.triage else {}
+    sizes = [int(n) for n in args.shortlist.split(",") if n.strip()]
+
+    n = top1 = top3 = unknown = 0
+    recall = {size: [0, 0] for size in sizes}     # size → [保留的 LLM 科室數, LLM 科室總數]
+    list_len = {size: 0 for size in sizes}
+    latency: List[float] = []
+
+    for item_id, item in read_items(args.input):
+        specialties = labels.get(item_id) if args.triage else item.get("recommended_specialties")
+        if not specialties:
+            continue
+        expected = llm_departments(specialties, aliases)
+        unknown += sum(d not in known for d in expected)
+        text = consultation_text(item.get("history", []))
+
+        started = time.perf_counter()
+        local = [r["科目"] for r in recommender.recommend(text)]
+        latency.append(time.perf_counter() - started)
+
+        n += 1
+        top1 += local[0] == expected[0]
+        top3 += expected[0] in local
+        for size in sizes:
+            shortlist = recommender.shortlist(text, size)
+            recall[size][0] += sum(d in shortlist for d in expected)
+            recall[size][1] += len(expected)
+            list_len[size] += len(shortlist)
+
+    if not n:
+        sys.exit("no conversations with LLM recommended_specialties")
+    print(f"{n} conversations, {unknown} LLM department names not in department_i18n.json")
+    print(f"top-1 agreement          {top1 / n:6.1%}")
+    print(f"LLM top-1 in local top-3 {top3 / n:6.1%}")
+    print(f"latency per call         p50 {percentile(latency, .5) * 1e3:.3f} ms  "
+          f"p95 {percentile(latency, .95) * 1e3:.3f} ms")
+    print(f"\n{'shortlist':<10}{'recall':>8}{'avg depts':>11}")
+    for size in sizes:
+        kept, total = recall[size]
+        print(f"{size:<10}{kept / total:>8.1%}{list_len[size] / n:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
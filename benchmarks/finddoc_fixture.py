@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+離線的 finddoc 假站點，供 crawl.py 的並發抓取測試與壓測使用。
+
+- GET /practices/the-london-medical-clinic-<id>：診所頁；GET /doctors/<slug>：醫生頁
+- --pages DIR 時優先回放保存的頁面（DIR/practices/the-london-medical-clinic-12.html、
+  DIR/doctors/<slug>.html）；沒有保存的頁面時依 id 確定性地生成，結構與真實頁面相同，
+  約 --density 比例的 id 存在（其餘 404），醫生從共用的醫生池抽取（同一醫生會出現在多間診所）
+- 回應帶 ETag / Last-Modified，條件請求命中時回 304（--no-validators 關閉）
+- 延遲 --latency（uniform 0.5x–1.5x），故障注入 --error-rate（503）、--rate-limit-rate（429 + Retry-After）
+- GET /_stats 回傳請求數、狀態碼分佈與觀察到的最大同時在途請求數
+
+單獨啟動：python benchmarks/finddoc_fixture.py --port 8002
+然後：python crawl.py --base-url http://127.0.0.1:8002 --end 500
+"""
+
+import argparse
+import asyncio
+import hashlib
+import html
+import os
+import random
+import sys
+from collections import Counter
+from typing import List, Optional
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from i18n_catalog import DEPARTMENT_I18N, LANGUAGE_I18N  # noqa: E402
+
+SPECIALTIES = [v["zh_TW"] for v in DEPARTMENT_I18N.values()] + ["運動醫學"]   # 最後一個沒有對應
+LANGUAGES = [v["zh_TW"] for v in LANGUAGE_I18N.values()]
+LAST_MODIFIED = "Mon, 02 Jun 2025 08:00:00 GMT"
+
+
+class FinddocFixture:
+    def __init__(
+            self,
+            pages_dir: Optional[str] = None,
+            density: float = 0.15,
+            doctor_pool: int = 2000,
+            max_doctors: int = 6,
+            filler: int = 150,
+            latency: float = 0.05,
+            error_rate: float = 0.0,
+            rate_limit_rate: float = 0.0,
+            validators: bool = True,
+            seed: int = 0
+    ) -> None:
+        self.pages_dir = pages_dir
+        self.density = density
+        self.doctor_pool = doctor_pool
+        self.max_doctors = max_doctors
+        self.filler = filler
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.validators = validators
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.stats: Counter = Counter()
+        self.in_flight = 0
+
+    # -------------------------------------------------------------- #
+
+    def _saved(self, path: str) -> Optional[str]:
+        if not self.pages_dir:
+            return None
+        file = os.path.join(self.pages_dir, path.strip("/") + ".html")
+        if not os.path.isfile(file):
+            return None
+        with open(file, encoding="utf-8") as f:
+            return f.read()
+
+    def _page(self, title: str, body: str) -> str:
+        """真實頁面的大部分內容是導覽、頁尾與腳本；用 filler 模擬相近的頁面大小"""
+        nav = "".join(f'<li class="nav__item"><a href="/search?page={i}">分類 {i}</a></li>'
+                      for i in range(self.filler))
+        footer = "".join(f"<p class=\"footer__text\">條款與細則第 {i} 條。</p>" for i in range(self.filler // 3))
+        return (
+            f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+            f"<script>window.__STATE__ = {{\"page\": \"{html.escape(title)}\"}};</script></head>"
+            f"<body><header><ul class=\"nav\">{nav}</ul></header><main>{body}</main>"
+            f"<footer>{footer}</footer></body></html>"
+        )
+
+    def clinic_doctors(self, clinic_id: int) -> List[int]:
+        rng = random.Random(self.seed * 1_000_003 + clinic_id)
+        if rng.random() >= self.density:
+            return []
+        return rng.sample(range(self.doctor_pool), rng.randint(1, self.max_doctors))
+
+    def clinic_html(self, clinic_id: int) -> Optional[str]:
+        doctors = self.clinic_doctors(clinic_id)
+        if not doctors:
+            return None
+        rng = random.Random(clinic_id)
+        lat, lng = 22.2 + rng.random() * 0.3, 113.9 + rng.random() * 0.4
+        items = "".join(
+            f'<div class="doctor-list__item"><a href="/doctors/dr-{n}">'
+            f'<img src="/img/{n}.jpg"><h3>醫生 {n}</h3>'
+            f'<p class="doctor-list__specialty">{SPECIALTIES[n % len(SPECIALTIES)]}</p></a></div>'
+            for n in doctors
+        )
+        body = (
+            f'<section class="clinic-details"><div class="clinic-details__name">診所 {clinic_id}</div>'
+            f'<p class="clinic-address">香港九龍彌敦道 {clinic_id} 號</p>'
+            f'<a class="btn et-phone" href="tel:2{clinic_id:07d}">2{clinic_id:07d}</a>'
+            f'<a href="https://www.google.com/maps/search/?api=1&query={lat:.6f},{lng:.6f}">地圖</a></section>'
+            f'<section class="doctor-list">{items}</section>'
+        )
+        return self._page(f"診所 {clinic_id}", body)
+
+    def doctor_html(self, n: int) -> Optional[str]:
+        if not 0 <= n < self.doctor_pool:
+            return None
+        rng = random.Random(n)
+        langs = "、".join(rng.sample(LANGUAGES, rng.randint(1, 3)))
+        body = (
+            f'<h1 class="doctor-name">醫生 {n}</h1>'
+            f'<div class="doctor-detail-info-list"><h3 class="doctor-detail-info-list__title">學歷</h3>'
+            f'<ul class="doctor-detail-info-list__list"><li>香港大學內外全科醫學士</li></ul></div>'
+            f'<div class="doctor-detail-info-list"><h3 class="doctor-detail-info-list__title">語言</h3>'
+            f'<ul class="doctor-detail-info-list__list"><li>{langs}</li></ul></div>'
+        )
+        return self._page(f"醫生 {n}", body)
+
+    # -------------------------------------------------------------- #
+
+    async def handle_page(self, request: web.Request) -> web.Response:
+        kind = request.match_info["kind"]
+        self.stats[f"requests.{kind}"] += 1
+        self.stats["requests"] += 1
+        self.in_flight += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.latency)
+            roll = self.rng.random()
+            if roll < self.error_rate:
+                return self._respond(web.Response(status=503, text="busy"))
+            if roll < self.error_rate + self.rate_limit_rate:
+                return self._respond(web.Response(status=429, text="slow down", headers={"Retry-After": "0.2"}))
+
+            page = self._saved(request.path)
+            if page is None:
+                try:
+                    key = int(request.match_info["slug"].rsplit("-", 1)[-1])
+                except ValueError:
+                    key = -1
+                page = self.clinic_html(key) if kind == "practices" else self.doctor_html(key)
+            if page is None:
+                return self._respond(web.Response(status=404, text="not found"))
+            if not self.validators:
+                return self._respond(web.Response(text=page, content_type="text/html"))
+            headers = {"ETag": '"%s"' % hashlib.sha1(page.encode("utf-8")).hexdigest(),
+                       "Last-Modified": LAST_MODIFIED}
+            if request.headers.get("If-None-Match") == headers["ETag"]:
+                return self._respond(web.Response(status=304, headers=headers))
+            return self._respond(web.Response(text=page, content_type="text/html", headers=headers))
+        finally:
+            self.in_flight -= 1
+
+    def _respond(self, resp: web.Response) -> web.Response:
+        self.stats[f"status.{resp.status}"] += 1
+        return resp
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.stats))
+
+    def application(self) -> web.Application:
+        wapp = web.Application()
+        wapp.router.add_get("/{kind:practices|doctors}/{slug}", self.handle_page)
+        wapp.router.add_get("/_stats", self.handle_stats)
+        return wapp
+
+
+async def start_fixture(fixture: FinddocFixture, host: str = "127.0.0.1", port: int = 8002) -> web.AppRunner:
+    runner = web.AppRunner(fixture.application())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def add_fixture_arguments(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--pages", help="保存的 finddoc 頁面目錄")
+    ap.add_argument("--density", type=float, default=0.15, help="存在的診所 id 比例")
+    ap.add_argument("--doctor-pool", type=int, default=2000, help="醫生總數（診所間共用）")
+    ap.add_argument("--filler", type=int, default=150, help="每頁的導覽連結數，控制頁面大小")
+    ap.add_argument("--latency", type=float, default=0.05, help="每個請求的平均延遲（秒）")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rate-limit-rate", type=float, default=0.0)
+    ap.add_argument("--no-validators", action="store_true", help="不回傳 ETag / Last-Modified")
+    ap.add_argument("--seed", type=int, default=0, help="改變 seed 即改變存在的診所與其醫生")
+
+
+def fixture_from_args(args: argparse.Namespace) -> FinddocFixture:
+    return FinddocFixture(
+        pages_dir=args.pages, density=args.density, doctor_pool=args.doctor_pool, filler=args.filler,
+        latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        validators=not args.no_validators, seed=args.seed,
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8002)
+    add_fixture_arguments(ap)
+    args = ap.parse_args()
+    web.run_app(fixture_from_args(args).application(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+離線的 DeepSeek / OpenAI 相容假上游（POST /chat/completions），供壓測與本地開發使用。
+
+- 依 system prompt 判斷階段（analysis / plain / professional / translate / compaction），
+  回放錄製的輸出（--recordings JSONL，每行 {"stage": ..., "content": ...}），沒有錄製時用內建樣本
+- analysis 的置信度隨使用者輪數上升，多輪問診最終會走到確認 / 出報告
+- 延遲 = 首 token 延遲（fixed / uniform / lognormal 分佈）+ 輸出 token 數 / --tokens-per-sec
+- 支援 stream=True（SSE 逐段輸出）
+- 故障注入：--error-rate（500）、--rate-limit-rate（429 + Retry-After）、--hang-rate（長時間不回應）
+- GET /_stats 回傳各階段請求數與注入的故障數
+
+單獨啟動：python benchmarks/mock_llm.py --port 8001 --latency-median 0.8
+然後：DEEPSEEK_API_BASE=http://127.0.0.1:8001 python app.py
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tokens import estimate_tokens  # noqa: E402
+
+STAGE_MARKERS = [
+    ("analysis", "medical analysis AI"),
+    ("plain", "medical summarization AI"),
+    ("professional", "professional doctor"),
+    ("translate", "medical translator"),
+    ("compaction", "clinical scribe"),
+]
+
+DEFAULT_RECORDINGS: Dict[str, List[str]] = {
+    "plain": [json.dumps({"plain_summary": "您的症状可能与普通感冒有关，建议多休息、多喝水，如持续不适请就医。"},
+                         ensure_ascii=False)],
+    "professional": ["```json\n" + json.dumps({
+        "medical_summary": "主诉头痛 3 天伴低热，无颈项强直，考虑上呼吸道感染。",
+        "plain_summary": "您可能是感冒引起的头痛。",
+        "recommended_specialties": [{"科目": "内科", "置信度": 70}, {"科目": "耳鼻喉科", "置信度": 30}],
+    }, ensure_ascii=False, indent=2) + "\n```"],
+    "translate": [json.dumps({"medical_summary_translated": "Headache for 3 days with low-grade fever.",
+                              "plain_summary_translated": "You probably have a cold."})],
+    "compaction": [json.dumps({"clinical_summary": "头痛 3 天，低热，无呕吐。"}, ensure_ascii=False)],
+}
+
+ANALYSIS_QUESTIONS = ["疼痛持续多久了？", "是否伴有发热？", "有没有恶心或呕吐？", "最近是否有受凉？"]
+
+
+class MockLLM:
+    def __init__(
+            self,
+            latency: str = "lognormal",
+            latency_median: float = 0.8,
+            latency_sigma: float = 0.4,
+            tokens_per_sec: float = 50.0,
+            error_rate: float = 0.0,
+            rate_limit_rate: float = 0.0,
+            hang_rate: float = 0.0,
+            hang_seconds: float = 120.0,
+            recordings: Optional[str] = None,
+            confidence_step: int = 25,
+            seed: Optional[int] = None
+    ) -> None:
+        self.latency = latency
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.confidence_step = confidence_step
+        self.rng = random.Random(seed)
+        self.stats: Counter = Counter()
+
+        loaded: Dict[str, List[str]] = {}
+        if recordings:
+            with open(recordings, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        rec = json.loads(line)
+                        loaded.setdefault(rec["stage"], []).append(rec["content"])
+        self._cycles = {
+            stage: itertools.cycle(loaded.get(stage) or DEFAULT_RECORDINGS.get(stage, ["{}"]))
+            for stage, _ in STAGE_MARKERS
+        }
+        self._has_analysis_recordings = "analysis" in loaded
+
+    # -------------------------------------------------------------- #
+
+    def first_token_delay(self) -> float:
+        if self.latency == "fixed":
+            return self.latency_median
+        if self.latency == "uniform":
+            return self.rng.uniform(0, 2 * self.latency_median)
+        return self.rng.lognormvariate(0, self.latency_sigma) * self.latency_median
+
+    @staticmethod
+    def detect_stage(messages: List[dict]) -> str:
+        system = messages[0].get("content", "") if messages else ""
+        for stage, marker in STAGE_MARKERS:
+            if marker in system:
+                return stage
+        return "unknown"
+
+    def completion(self, stage: str, messages: List[dict]) -> str:
+        if stage == "analysis" and not self._has_analysis_recordings:
+            turns = sum(1 for m in messages if m.get("role") == "user")
+            return json.dumps({
+                "analysis_text": f"mock analysis after {turns} user turns",
+                "confidence_level": min(95, 20 + self.confidence_step * turns),
+                "next_question": ANALYSIS_QUESTIONS[turns % len(ANALYSIS_QUESTIONS)],
+            }, ensure_ascii=False)
+        return next(self._cycles.get(stage, self._cycles["plain"]))
+
+    # -------------------------------------------------------------- #
+
+    async def handle_completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        messages = body.get("messages", [])
+        stage = self.detect_stage(messages)
+        self.stats[f"requests.{stage}"] += 1
+        self.stats["requests"] += 1
+
+        roll = self.rng.random()
+        if roll < self.error_rate:
+            self.stats["injected.error"] += 1
+            return web.json_response({"error": {"message": "mock upstream error"}}, status=500)
+        roll -= self.error_rate
+        if roll < self.rate_limit_rate:
+            self.stats["injected.rate_limit"] += 1
+            return web.json_response({"error": {"message": "rate limited"}}, status=429,
+                                     headers={"Retry-After": "1"})
+        roll -= self.rate_limit_rate
+        if roll < self.hang_rate:
+            self.stats["injected.hang"] += 1
+            await asyncio.sleep(self.hang_seconds)
+
+        content = self.completion(stage, messages)
+        per_token = 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+        await asyncio.sleep(self.first_token_delay())
+
+        if not body.get("stream"):
+            await asyncio.sleep(estimate_tokens(content) * per_token)
+            return web.json_response({
+                "id": "mock", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "deepseek-chat"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+            })
+
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        step = 4
+        for i in range(0, len(content), step):
+            piece = content[i:i + step]
+            chunk = {"id": "mock", "object": "chat.completion.chunk",
+                     "model": body.get("model", "deepseek-chat"),
+                     "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            await resp.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await asyncio.sleep(estimate_tokens(piece) * per_token)
+        await resp.write(b"data: [DONE]\n\n")
+        await resp.write_eof()
+        return resp
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.stats))
+
+    def application(self) -> web.Application:
+        wapp = web.Application()
+        wapp.router.add_post("/chat/completions", self.handle_completions)
+        wapp.router.add_get("/_stats", self.handle_stats)
+        return wapp
+
+
+async def start_mock(mock: MockLLM, host: str = "127.0.0.1", port: int = 8001) -> web.AppRunner:
+    runner = web.AppRunner(mock.application())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def add_mock_arguments(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="lognormal",
+                    help="首 token 延遲分佈")
+    ap.add_argument("--latency-median", type=float, default=0.8, help="首 token 延遲中位數（秒）")
+    ap.add_argument("--latency-sigma", type=float, default=0.4, help="lognormal 分佈的 sigma")
+    ap.add_argument("--tokens-per-sec", type=float, default=50.0, help="輸出速度；0 表示瞬間輸出")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rate-limit-rate", type=float, default=0.0)
+    ap.add_argument("--hang-rate", type=float, default=0.0)
+    ap.add_argument("--recordings", help="錄製輸出 JSONL：每行 {\"stage\": ..., \"content\": ...}")
+    ap.add_argument("--seed", type=int)
+
+
+def mock_from_args(args: argparse.Namespace) -> MockLLM:
+    return MockLLM(
+        latency=args.latency, latency_median=args.latency_median, latency_sigma=args.latency_sigma,
+        tokens_per_sec=args.tokens_per_sec, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, hang_rate=args.hang_rate,
+        recordings=args.recordings, seed=args.seed,
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8001)
+    add_mock_arguments(ap)
+    args = ap.parse_args()
+    web.run_app(mock_from_args(args).application(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+診所查詢索引：資料集只在載入時建一次索引，查詢不再掃描全部診所。
+
+- 空間索引：經緯度網格（預設 0.01°，約 1 km），每格保存診所的單位球向量；
+  「半徑 R 內」只檢查與外接框相交的格子，「最近 N 間」由中心格一圈圈向外擴展，
+  下一圈的最近可能距離已超過第 N 近的距離時停止
+- 倒排索引：科室 / 語言的規範鍵 → 診所集合；篩選條件為「有醫生屬於任一所選科室」
+  且「有醫生會說任一所選語言」，與地圖頁原本的前端篩選一致
+- 標籤反查：醫生資料中的 specialty_i18n / languages_i18n 四語名稱（及原始名稱）
+  都能作為查詢條件，大小寫、空白與標點不敏感；對不上時再查 i18n_catalog 的別名與模糊匹配，
+  規範鍵為简体名稱
+- ClinicIndexStore 依檔案 mtime / 大小熱重載：由發現變更的那個請求建好新索引後整個替換，
+  其他請求在此期間繼續使用舊的快照；新檔案解析失敗時保留舊索引
+"""
+
+import heapq
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from i18n_catalog import DEPARTMENTS, LANGUAGES, Catalog, normalize
+
+EARTH_RADIUS_KM = 6371.0
+_KM_PER_DEG = math.pi * EARTH_RADIUS_KM / 180
+
+# 候選診所（經倒排索引篩選後）不多於此數時直接逐一計算距離，不走網格
+BRUTE_FORCE_MAX = 256
+# 地圖頁平移 / 縮放時篩選條件不變，快取最近用過的篩選結果
+CANDIDATE_CACHE_SIZE = 256
+
+
+def _unit_vector(lat: float, lng: float) -> Tuple[float, float, float]:
+    phi, lam = math.radians(lat), math.radians(lng)
+    return math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi)
+
+
+def _dot_to_km(dot: float) -> float:
+    return math.acos(max(-1.0, min(1.0, dot))) * EARTH_RADIUS_KM
+
+
+def _km_to_dot(km: float) -> float:
+    """球面距離 ≤ km 等價於單位向量內積 ≥ cos(km / R)"""
+    return math.cos(min(km / EARTH_RADIUS_KM, math.pi))
+
+
+def _coordinate(value: Any) -> Optional[float]:
+    try:
+        out = float(value)
+    except (TypeError, ValueError):
+        return None
+    return out if math.isfinite(out) else None
+
+
+class _Facet:
+    """一個維度（科室或語言）的倒排索引與標籤反查；資料中沒有的寫法再查 catalog（別名、錯字）"""
+
+    def __init__(self, catalog: Optional[Catalog] = None) -> None:
+        self.catalog = catalog
+        self.clinics: Dict[str, Any] = {}     # 建索引時為 set，完成後凍結為 frozenset
+        self.names: Dict[str, str] = {}
+        self.i18n: Dict[str, Dict[str, str]] = {}
+        self.labels: Dict[str, str] = {}
+
+    def add(self, idx: int, name: Any, i18n: Any) -> None:
+        if not name:
+            return
+        i18n = i18n if isinstance(i18n, dict) else {}
+        key = i18n.get("zh_CN") or str(name)
+        self.clinics.setdefault(key, set()).add(idx)
+        self.names.setdefault(key, str(name))
+        if i18n:
+            self.i18n.setdefault(key, dict(i18n))
+        for label in (name, key, *i18n.values()):
+            self.labels.setdefault(normalize(label), key)
+
+    def resolve(self, labels: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """回傳 (規範鍵, 無法辨識的標籤)"""
+        keys, unknown = [], []
+        for label in labels:
+            key = self.labels.get(normalize(label))
+            if key is None and self.catalog is not None:
+                key = self.catalog.resolve(label)
+                key = key if key in self.clinics else None
+            if key is None:
+                unknown.append(label)
+            elif key not in keys:
+                keys.append(key)
+        return keys, unknown
+
+    def union(self, keys: List[str]) -> FrozenSet[int]:
+        if len(keys) == 1:
+            return self.clinics.get(keys[0], frozenset())
+        return frozenset().union(*(self.clinics.get(key, ()) for key in keys))
+
+    def freeze(self) -> None:
+        self.clinics = {key: frozenset(members) for key, members in self.clinics.items()}
+
+    def listing(self) -> List[Dict[str, Any]]:
+        return [
+            {"key": key, "name": self.names[key], "i18n": self.i18n.get(key, {}), "clinics": len(members)}
+            for key, members in sorted(self.clinics.items(), key=lambda kv: (-len(kv[1]), kv[0]))
+        ]
+
+
+class ClinicIndex:
+    """不可變的索引快照；重載時整個替換"""
+
+    def __init__(self, clinics: List[Dict[str, Any]], cell_deg: float = 0.01, version: float = 0.0) -> None:
+        self.cell_deg = cell_deg
+        self.version = version
+        self.clinics: List[Dict[str, Any]] = []
+        self.vectors: List[Tuple[float, float, float]] = []
+        self.grid: Dict[Tuple[int, int], List[int]] = {}
+        self.specialties = _Facet(DEPARTMENTS)
+        self.languages = _Facet(LANGUAGES)
+        self.skipped = 0
+
+        for raw in sorted(clinics, key=lambda c: _coordinate(c.get("clinic_id")) or 0.0):
+            lat, lng = _coordinate(raw.get("latitude")), _coordinate(raw.get("longitude"))
+            if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                self.skipped += 1
+                continue
+            idx = len(self.clinics)
+            self.clinics.append({**raw, "latitude": lat, "longitude": lng})
+            self.vectors.append(_unit_vector(lat, lng))
+            self.grid.setdefault(self._cell(lat, lng), []).append(idx)
+            for doctor in raw.get("doctors") or ():
+                self.specialties.add(idx, doctor.get("specialty"), doctor.get("specialty_i18n"))
+                languages_i18n = doctor.get("languages_i18n") or ()
+                for i, language in enumerate(doctor.get("languages") or ()):
+                    self.languages.add(idx, language, languages_i18n[i] if i < len(languages_i18n) else None)
+
+        # 每格的向量連續存放，逐點比較時不必再經由 idx 取向量
+        self._packed = {cell: [self.vectors[idx] for idx in members] for cell, members in self.grid.items()}
+        self.specialties.freeze()
+        self.languages.freeze()
+        self._candidate_cache: "OrderedDict[Tuple[Tuple[str, ...], Tuple[str, ...]], Any]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        rows = [cell[0] for cell in self.grid] or [0]
+        cols = [cell[1] for cell in self.grid] or [0]
+        self._bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def __len__(self) -> int:
+        return len(self.clinics)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    # -------------------------------------------------------------- #
+
+    def candidates(self, specialties: Iterable[str] = (), languages: Iterable[str] = ()
+                   ) -> Tuple[Optional[FrozenSet[int]], List[str]]:
+        """倒排索引篩選；沒有條件時回傳 None（代表全部）。第二項為無法辨識的標籤"""
+        specialties, languages = list(specialties), list(languages)
+        spec_keys, unknown = self.specialties.resolve(specialties)
+        lang_keys, missing = self.languages.resolve(languages)
+        unknown += missing
+        if not spec_keys and not lang_keys and not unknown:
+            return None, unknown
+        key = (tuple(sorted(spec_keys)), tuple(sorted(lang_keys)))
+        if not spec_keys and specialties or not lang_keys and languages:
+            return frozenset(), unknown     # 某個維度有條件但全部無法辨識
+        with self._cache_lock:
+            out = self._candidate_cache.get(key)
+            if out is not None:
+                self._candidate_cache.move_to_end(key)
+                return out, unknown
+        out = None
+        for facet, keys in ((self.specialties, spec_keys), (self.languages, lang_keys)):
+            if keys:
+                members = facet.union(keys)
+                out = members if out is None else out & members
+        with self._cache_lock:
+            self._candidate_cache[key] = out
+            if len(self._candidate_cache) > CANDIDATE_CACHE_SIZE:
+                self._candidate_cache.popitem(last=False)
+        return out, unknown
+
+    def _box(self, lat: float, lng: float, radius_km: float) -> Tuple[int, int, int, int]:
+        """半徑 radius_km 的外接框所涵蓋的格子範圍 (r0, r1, c0, c1)，限制在有資料的範圍內"""
+        dlat = radius_km / _KM_PER_DEG
+        coslat = math.cos(math.radians(min(abs(lat) + dlat, 89.9)))
+        dlng = min(radius_km / (_KM_PER_DEG * coslat), 180.0)
+        r0, c0 = self._cell(max(lat - dlat, -90.0), lng - dlng)
+        r1, c1 = self._cell(min(lat + dlat, 90.0), lng + dlng)
+        top, bottom, left, right = self._bounds
+        return max(r0, top), min(r1, bottom), max(c0, left), min(c1, right)
+
+    def _count_within(self, lat: float, lng: float, radius_km: float, allowed: Optional[FrozenSet[int]]) -> int:
+        """
+        半徑內的診所數，逐格判斷：
+        - 四角都在半徑內 → 整格在圓內（格內一點到查詢點的最遠距離必在角上），直接計數
+        - 格內離查詢點最近的一點也在半徑外 → 整格略過
+        - 其餘跨越圓周的格子才逐點計算內積
+        角點的內積 = cosφq·cosφ·cos(λ - λq) + sinφq·sinφ，先按列、按行算好各項
+        """
+        qx, qy, qz = _unit_vector(lat, lng)
+        threshold = _km_to_dot(radius_km)
+        if allowed is not None and len(allowed) <= BRUTE_FORCE_MAX:
+            vectors = self.vectors
+            total = 0
+            for idx in allowed:
+                x, y, z = vectors[idx]
+                if x * qx + y * qy + z * qz >= threshold:
+                    total += 1
+            return total
+
+        r0, r1, c0, c1 = self._box(lat, lng, radius_km)
+        if r0 > r1 or c0 > c1:
+            return 0
+        step, grid, packed = self.cell_deg, self.grid, self._packed
+        phi = math.radians(lat)
+        sin_q, cos_q = math.sin(phi), math.cos(phi)
+        edges = [(cos_q * math.cos(e), sin_q * math.sin(e))
+                 for e in (math.radians(r * step) for r in range(r0, r1 + 2))]
+        cols = [math.cos(math.radians(c * step - lng)) for c in range(c0, c1 + 2)]
+        # 格子最近點由經緯度夾取而得，誤差是二階小量；判斷整格在圓外時留 1% 格寬的餘量
+        outside = _km_to_dot(radius_km + 0.01 * step * _KM_PER_DEG)
+        lat_row, lng_col = math.floor(lat / step) - r0, math.floor(lng / step) - c0
+        near_row = (cos_q * cos_q, sin_q * sin_q)
+
+        if (r1 - r0 + 1) * (c1 - c0 + 1) > len(grid):
+            cells = [(r, c) for r, c in grid if r0 <= r <= r1 and c0 <= c <= c1]
+        else:
+            cells = [cell for cell in ((r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1))
+                     if cell in grid]
+        total = 0
+        for r, c in cells:
+            i, j = r - r0, c - c0
+            (a0, b0), (a1, b1) = edges[i], edges[i + 1]
+            far = min(cols[j], cols[j + 1])
+            if a0 * far + b0 >= threshold and a1 * far + b1 >= threshold:
+                members = grid[(r, c)]
+                total += len(members) if allowed is None else len(allowed.intersection(members))
+                continue
+            a, b = near_row if i == lat_row else edges[i + 1] if i < lat_row else edges[i]
+            near = 1.0 if j == lng_col else max(cols[j], cols[j + 1])
+            if a * near + b < outside:
+                continue
+            if allowed is None:
+                total += sum(1 for x, y, z in packed[(r, c)] if x * qx + y * qy + z * qz >= threshold)
+            else:
+                total += sum(1 for idx, (x, y, z) in zip(grid[(r, c)], packed[(r, c)])
+                             if x * qx + y * qy + z * qz >= threshold and idx in allowed)
+        return total
+
+    def _nearest(self, lat: float, lng: float, k: int, allowed: Optional[FrozenSet[int]],
+                 radius_km: Optional[float] = None) -> List[Tuple[float, int]]:
+        """最近的 k 間 (-內積, idx)，依距離排序；給 radius_km 時只考慮半徑內的診所"""
+        qx, qy, qz = _unit_vector(lat, lng)
+        threshold = -1.0 if radius_km is None else _km_to_dot(radius_km)
+        vectors = self.vectors
+        pool = range(len(vectors)) if allowed is None else allowed
+        if not pool:
+            return []
+        row, col = self._cell(lat, lng)
+        top, bottom, left, right = self._bounds
+        # 逐一計算的情況：候選很少；要的數量不少於候選數（圈必須擴展到最外層）；
+        # 查詢點在資料範圍外（圈要先擴展很多層才碰到資料，且遠距離時格數估算的下界不可靠）
+        if len(pool) <= BRUTE_FORCE_MAX or k >= len(pool) or not (top <= row <= bottom and left <= col <= right):
+            scored = []
+            for idx in pool:
+                x, y, z = vectors[idx]
+                dot = x * qx + y * qy + z * qz
+                if dot >= threshold:
+                    scored.append((-dot, idx))
+            return heapq.nsmallest(k, scored)
+
+        # 第 ring 圈的格子與查詢點至少相隔 ring - 1 格；經度方向以最高緯度處最窄的格寬估算
+        max_lat = max(abs(top), abs(bottom + 1), abs(row), abs(row + 1)) * self.cell_deg
+        cell_km = self.cell_deg * _KM_PER_DEG * math.cos(math.radians(min(max_lat, 89.9)))
+        max_ring = max(abs(row - top), abs(row - bottom), abs(col - left), abs(col - right))
+        heap: List[Tuple[float, int]] = []    # (內積, idx) 的最小堆，保留最近的 k 個
+        grid = self.grid
+        for ring in range(max_ring + 1):
+            gap = (ring - 1) * cell_km
+            if radius_km is not None and gap > radius_km:
+                break
+            if len(heap) >= k and _dot_to_km(heap[0][0]) < gap:
+                break
+            if ring == 0:
+                cells: Iterable[Tuple[int, int]] = ((row, col),)
+            else:
+                # 每圈只列出落在資料範圍內的格子，圈再大也不超過範圍的周長
+                c0, c1 = max(col - ring, left), min(col + ring, right)
+                r0, r1 = max(row - ring + 1, top), min(row + ring - 1, bottom)
+                cells = [(r, c) for r in (row - ring, row + ring) if top <= r <= bottom
+                         for c in range(c0, c1 + 1)]
+                cells += [(r, c) for c in (col - ring, col + ring) if left <= c <= right
+                          for r in range(r0, r1 + 1)]
+            for cell in cells:
+                for idx in grid.get(cell, ()):
+                    if allowed is not None and idx not in allowed:
+                        continue
+                    x, y, z = vectors[idx]
+                    dot = x * qx + y * qy + z * qz
+                    if dot < threshold:
+                        continue
+                    if len(heap) < k:
+                        heapq.heappush(heap, (dot, idx))
+                    elif dot > heap[0][0]:
+                        heapq.heapreplace(heap, (dot, idx))
+        return sorted((-dot, idx) for dot, idx in heap)
+
+    def search(
+            self,
+            lat: Optional[float] = None,
+            lng: Optional[float] = None,
+            radius_km: Optional[float] = None,
+            specialties: Iterable[str] = (),
+            languages: Iterable[str] = (),
+            limit: int = 20,
+            offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        有座標時依距離排序：給 radius_km 為半徑內查詢，否則為最近 offset + limit 間；
+        沒有座標時依 clinic_id 排序。回傳 {"total", "results": [(診所, 距離 km 或 None)], "unknown"}
+        """
+        allowed, unknown = self.candidates(specialties, languages)
+        if lat is None or lng is None:
+            order = range(len(self.clinics)) if allowed is None else sorted(allowed)
+            page = list(order)[offset:offset + limit]
+            return {"total": len(order), "results": [(self.clinics[i], None) for i in page], "unknown": unknown}
+
+        if radius_km is not None:
+            total = self._count_within(lat, lng, radius_km, allowed)
+        else:
+            total = len(self.clinics) if allowed is None else len(allowed)
+        hits = self._nearest(lat, lng, offset + limit, allowed, radius_km) if limit else []
+        return {
+            "total": total,
+            "results": [(self.clinics[idx], _dot_to_km(-neg)) for neg, idx in hits[offset:]],
+            "unknown": unknown,
+        }
+
+    def facets(self) -> Dict[str, Any]:
+        return {
+            "total": len(self.clinics),
+            "specialties": self.specialties.listing(),
+            "languages": self.languages.listing(),
+        }
+
+
+class ClinicIndexStore:
+    """從 JSON 檔載入索引，檔案變更後自動重載（最多每 check_interval 秒檢查一次 mtime）"""
+
+    def __init__(self, path: str, check_interval: float = 2.0, cell_deg: float = 0.01) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self.cell_deg = cell_deg
+        self._index = ClinicIndex([], cell_deg)
+        self._signature: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+        self._reload_lock = threading.Lock()
+        self._counters = {"reloads": 0, "reload_failures": 0, "load_seconds": 0.0}
+        self.current()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self, signature: Tuple[int, int]) -> None:
+        started = time.perf_counter()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                clinics = json.load(f)
+            if not isinstance(clinics, list):
+                raise ValueError("expected a JSON array of clinics")
+            index = ClinicIndex(clinics, self.cell_deg, version=signature[0] / 1e9)
+        except (OSError, ValueError) as e:
+            self._counters["reload_failures"] += 1
+            logging.warning("clinic data %s not loaded: %s", self.path, e)
+            return
+        finally:
+            # 無論成功與否都記下簽名：同一個壞檔案不會每次請求都重新解析
+            self._signature = signature
+        self._index = index
+        self._counters["reloads"] += 1
+        self._counters["load_seconds"] = time.perf_counter() - started
+        logging.info("clinic index loaded: %d clinics from %s (%d skipped) in %.3fs",
+                     len(index), self.path, index.skipped, self._counters["load_seconds"])
+
+    def current(self) -> ClinicIndex:
+        """
+        回傳目前的索引快照。到了檢查時間且檔案已變更時重載；
+        第一次載入時其他請求等待，之後的重載由一個請求執行，其餘請求繼續使用舊快照
+        """
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._index
+        first = self._signature is None
+        if not self._reload_lock.acquire(blocking=first):
+            return self._index
+        try:
+            if time.monotonic() >= self._next_check:
+                signature = self._stat()
+                if signature is not None and signature != self._signature:
+                    self._load(signature)
+                self._next_check = time.monotonic() + self.check_interval
+        finally:
+            self._reload_lock.release()
+        return self._index
+
+    def stats(self) -> Dict[str, Any]:
+        index = self._index
+        out: Dict[str, Any] = dict(self._counters)
+        out["clinics"] = len(index)
+        out["skipped"] = index.skipped
+        out["cells"] = len(index.grid)
+        return out
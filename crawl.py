@@ -1,11 +1,23 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import hashlib
 import json
-import re
 import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from crawl_extract import BACKENDS, get_extractor
+from crawl_state import DEAD_STATUS, CrawlState
+from i18n_catalog import DEPARTMENTS, LANGUAGES
 
 # --- 配置请求头，模拟浏览器 ---
 HEADERS = {
@@ -15,194 +27,361 @@ HEADERS = {
     )
 }
 
-# --- 多语言映射字典（来自您提供的 DEPARTMENT_I18N 和 LANGUAGE_I18N） ---
-DEPARTMENT_I18N = {
-    "外科":                   {"zh_CN":"外科",             "zh_TW":"外科",             "en":"Surgery",                                       "id":"Bedah"},
-    "小儿外科":               {"zh_CN":"小儿外科",         "zh_TW":"小兒外科",         "en":"Pediatric Surgery",                            "id":"Bedah Anak"},
-    "普通科":                 {"zh_CN":"普通科",           "zh_TW":"普通科",           "en":"General Practice",                             "id":"Praktik Umum"},
-    "肠胃肝脏科":             {"zh_CN":"肠胃肝脏科",       "zh_TW":"腸胃肝臟科",       "en":"Gastroenterology & Hepatology",                 "id":"Gastroenterologi & Hepatologi"},
-    "精神科":                 {"zh_CN":"精神科",           "zh_TW":"精神科",           "en":"Psychiatry",                                    "id":"Psikiatri"},
-    "临床心理学":             {"zh_CN":"临床心理学",       "zh_TW":"臨床心理學",       "en":"Clinical Psychology",                          "id":"Psikologi Klinis"},
-    "内科":                   {"zh_CN":"内科",             "zh_TW":"內科",             "en":"Internal Medicine",                            "id":"Penyakit Dalam"},
-    "耳鼻喉科":               {"zh_CN":"耳鼻喉科",         "zh_TW":"耳鼻喉科",         "en":"Otolaryngology",                                "id":"Telinga Hidung Tenggorokan"},
-    "家庭医学":               {"zh_CN":"家庭医学",         "zh_TW":"家庭醫學",         "en":"Family Medicine",                              "id":"Kedokteran Keluarga"},
-    "放射科":                 {"zh_CN":"放射科",           "zh_TW":"放射科",           "en":"Radiology",                                     "id":"Radiologi"},
-    "麻醉科":                 {"zh_CN":"麻醉科",           "zh_TW":"麻醉科",           "en":"Anesthesiology",                                "id":"Anestesiologi"},
-    "病理学":                 {"zh_CN":"病理学",           "zh_TW":"病理學",           "en":"Pathology",                                     "id":"Patologi"},
-    "眼科":                   {"zh_CN":"眼科",             "zh_TW":"眼科",             "en":"Ophthalmology",                                 "id":"Oftalmologi"},
-    "整形外科":               {"zh_CN":"整形外科",         "zh_TW":"整形外科",         "en":"Plastic Surgery",                               "id":"Bedah Plastik"},
-    "骨科":                   {"zh_CN":"骨科",             "zh_TW":"骨科",             "en":"Orthopedics",                                   "id":"Ortopedi"},
-    "泌尿外科":               {"zh_CN":"泌尿外科",         "zh_TW":"泌尿外科",         "en":"Urology",                                       "id":"Urologi"},
-    "临床肿瘤科":             {"zh_CN":"临床肿瘤科",       "zh_TW":"臨床腫瘤科",       "en":"Clinical Oncology",                             "id":"Onkologi Klinis"},
-    "血液及血液肿瘤科":       {"zh_CN":"血液及血液肿瘤科", "zh_TW":"血液及血液腫瘤科", "en":"Hematology & Hemato-oncology",                  "id":"Hematologi & Hemato-onkologi"},
-    "妇产科":                 {"zh_CN":"妇产科",           "zh_TW":"婦產科",           "en":"Obstetrics & Gynecology",                       "id":"Obstetri & Ginekologi"},
-    "内分泌及糖尿科":         {"zh_CN":"内分泌及糖尿科",   "zh_TW":"內分泌及糖尿科",   "en":"Endocrinology & Diabetology",                   "id":"Endokrinologi & Diabetologi"},
-    "风湿病科":               {"zh_CN":"风湿病科",         "zh_TW":"風濕病科",         "en":"Rheumatology",                                  "id":"Reumatologi"},
-    "神经外科":               {"zh_CN":"神经外科",         "zh_TW":"神經外科",         "en":"Neurosurgery",                                  "id":"Bedah Saraf"},
-    "核子医学科":             {"zh_CN":"核子医学科",       "zh_TW":"核子醫學科",       "en":"Nuclear Medicine",                              "id":"Kedokteran Nuklir"},
-    "临床微生物及感染学":     {"zh_CN":"临床微生物及感染学","zh_TW":"臨床微生物及感染學","en":"Clinical Microbiology & Infectious Diseases",    "id":"Mikrobiologi Klinis & Penyakit Infeksi"},
-    "急症科":                 {"zh_CN":"急症科",           "zh_TW":"急症科",           "en":"Emergency Medicine",                            "id":"Kedokteran Darurat"},
-    "儿科":                   {"zh_CN":"儿科",             "zh_TW":"兒科",             "en":"Pediatrics",                                    "id":"Pediatri"},
-    "复康科":                 {"zh_CN":"复康科",           "zh_TW":"復康科",           "en":"Rehabilitation",                                 "id":"Rehabilitasi"},
-    "脑神经科":               {"zh_CN":"脑神经科",         "zh_TW":"腦神經科",         "en":"Neurology",                                     "id":"Neurologi"},
-    "心脏科":                 {"zh_CN":"心脏科",           "zh_TW":"心臟科",           "en":"Cardiology",                                    "id":"Kardiologi"},
-    "肾病科":                 {"zh_CN":"肾病科",           "zh_TW":"腎病科",           "en":"Nephrology",                                    "id":"Nefrologi"},
-    "呼吸系统科":             {"zh_CN":"呼吸系统科",       "zh_TW":"呼吸系統科",       "en":"Pulmonology",                                   "id":"Pulmonologi"},
-    "牙科":                   {"zh_CN":"牙科",             "zh_TW":"牙科",             "en":"Dentistry",                                     "id":"Kedokteran Gigi"},
-    "物理治疗":               {"zh_CN":"物理治疗",         "zh_TW":"物理治療",         "en":"Physiotherapy",                                 "id":"Fisioterapi"},
-    "免疫及过敏病科":         {"zh_CN":"免疫及过敏病科",   "zh_TW":"免疫及過敏病科",   "en":"Immunology & Allergy",                          "id":"Imunologi & Alergi"},
-    "疼痛医学":               {"zh_CN":"疼痛医学",         "zh_TW":"疼痛醫學",         "en":"Pain Medicine",                                 "id":"Ilmu Nyeri"},
-    "皮肤及性病科":           {"zh_CN":"皮肤及性病科",     "zh_TW":"皮膚及性病科",     "en":"Dermatology & Venereology",                     "id":"Dermatologi & Venereologi"},
-    "老人科":                 {"zh_CN":"老人科",           "zh_TW":"老人科",           "en":"Geriatrics",                                    "id":"Geriatri"},
-    "社会医学":               {"zh_CN":"社会医学",         "zh_TW":"社會醫學",         "en":"Social Medicine",                               "id":"Kedokteran Sosial"},
-    "中医":                   {"zh_CN":"中医",             "zh_TW":"中醫",             "en":"Traditional Chinese Medicine",                  "id":"Pengobatan Tradisional Tiongkok"},
-    "儿童免疫、过敏及传染病科":{"zh_CN":"儿童免疫、过敏及传染病科","zh_TW":"兒童免疫、過敏及傳染病科","en":"Pediatric Immunology, Allergy & Infectious Diseases","id":"Imunologi Anak, Alergi & Penyakit Infeksi"},
-    "营养学":                 {"zh_CN":"营养学",           "zh_TW":"營養學",           "en":"Nutrition",                                     "id":"Gizi"},
-    "心胸肺外科":             {"zh_CN":"心胸肺外科",       "zh_TW":"心胸肺外科",       "en":"Thoracic Surgery",                              "id":"Bedah Toraks"},
-    "内科肿瘤科":             {"zh_CN":"内科肿瘤科",       "zh_TW":"內科腫瘤科",       "en":"Medical Oncology",                              "id":"Onkologi Medis"},
-    "妇科肿瘤科":             {"zh_CN":"妇科肿瘤科",       "zh_TW":"婦科腫瘤科",       "en":"Gynecologic Oncology",                          "id":"Onkologi Ginekologi"},
-    "解剖病理学":             {"zh_CN":"解剖病理学",       "zh_TW":"解剖病理學",       "en":"Anatomical Pathology",                          "id":"Patologi Anatomi"},
-    "感染及传染病科":         {"zh_CN":"感染及传染病科",   "zh_TW":"感染及傳染病科",   "en":"Infectious Diseases",                           "id":"Penyakit Infeksi"},
-    "法医病理学":             {"zh_CN":"法医病理学",       "zh_TW":"法醫病理學",       "en":"Forensic Pathology",                            "id":"Patologi Forensik"},
-    "生殖医学科":             {"zh_CN":"生殖医学科",       "zh_TW":"生殖醫學科",       "en":"Reproductive Medicine",                         "id":"Kedokteran Reproduksi"},
-    "职业医学":               {"zh_CN":"职业医学",         "zh_TW":"職業醫學",         "en":"Occupational Medicine",                        "id":"Kedokteran Kerja"},
-    "牙周治疗科":             {"zh_CN":"牙周治疗科",       "zh_TW":"牙周治療科",       "en":"Periodontics",                                  "id":"Periodontia"},
-    "修复齿科专科":           {"zh_CN":"修复齿科专科",     "zh_TW":"修復齒科專科",     "en":"Prosthodontics",                                "id":"Prostodonsia"},
-    "口腔颌面外科":           {"zh_CN":"口腔颌面外科",     "zh_TW":"口腔顎面外科",     "en":"Oral & Maxillofacial Surgery",                  "id":"Bedah Mulut & Maksilofasial"},
-}
 
-# 语言映射保持不变
-LANGUAGE_I18N = {
-    "上海话":     {"zh_CN":"上海话",    "zh_TW":"上海話",    "en":"Shanghainese",    "id":"Bahasa Shanghai"},
-    "印尼语":     {"zh_CN":"印尼语",    "zh_TW":"印尼語",    "en":"Indonesian",      "id":"Bahasa Indonesia"},
-    "台湾话":     {"zh_CN":"台湾话",    "zh_TW":"台灣話",    "en":"Taiwanese",       "id":"Bahasa Taiwan"},
-    "客家话":     {"zh_CN":"客家话",    "zh_TW":"客家話",    "en":"Hakka",           "id":"Bahasa Hakka"},
-    "广东话":     {"zh_CN":"广东话",    "zh_TW":"廣東話",    "en":"Cantonese",       "id":"Bahasa Kanton"},
-    "德语":       {"zh_CN":"德语",      "zh_TW":"德語",      "en":"German",          "id":"Bahasa Jerman"},
-    "日语":       {"zh_CN":"日语",      "zh_TW":"日語",      "en":"Japanese",        "id":"Bahasa Jepang"},
-    "普通话":     {"zh_CN":"普通话",    "zh_TW":"普通話",    "en":"Mandarin",        "id":"Bahasa Mandarin"},
-    "法语":       {"zh_CN":"法语",      "zh_TW":"法語",      "en":"French",          "id":"Bahasa Prancis"},
-    "泰语":       {"zh_CN":"泰语",      "zh_TW":"泰語",      "en":"Thai",            "id":"Bahasa Thailand"},
-    "潮州话":     {"zh_CN":"潮州话",    "zh_TW":"潮州話",    "en":"Teochew",         "id":"Bahasa Teochew"},
-    "福州话":     {"zh_CN":"福州话",    "zh_TW":"福州話",    "en":"Fuzhounese",      "id":"Bahasa Fuzhou"},
-    "福建话":     {"zh_CN":"福建话",    "zh_TW":"福建話",    "en":"Hokkien",         "id":"Bahasa Hokkien"},
-    "福建话(厦门)": {"zh_CN":"福建话(厦门)","zh_TW":"福建話(廈門)","en":"Xiamen Hokkien",  "id":"Hokkien Xiamen"},
-    "福建话(闽南)": {"zh_CN":"福建话(闽南)","zh_TW":"福建話(閩南)","en":"Minnan Hokkien",  "id":"Hokkien Minnan"},
-    "英语":       {"zh_CN":"英语",      "zh_TW":"英語",      "en":"English",         "id":"Bahasa Inggris"},
-}
+class HostLimiter:
+    """按 host 限制同时在途的请求数与每秒请求数（rps <= 0 表示不限速）"""
 
-# 将 zh_TW 映射为查找用的字典
-DEPT_MAP_TW = {v["zh_TW"]: v for v in DEPARTMENT_I18N.values()}
-LANG_MAP_TW = {v["zh_TW"]: v for v in LANGUAGE_I18N.values()}
+    def __init__(self, rps=0.0, max_in_flight=8):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._hosts = {}            # host -> [Semaphore, 下一个可用时间点]
 
+    @contextmanager
+    def slot(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = [threading.BoundedSemaphore(self.max_in_flight), time.monotonic()]
+        state[0].acquire()
+        try:
+            if self.interval:
+                with self._lock:
+                    now = time.monotonic()
+                    start = max(now, state[1])
+                    state[1] = start + self.interval
+                if start > now:
+                    time.sleep(start - now)
+            yield
+        finally:
+            state[0].release()
 
-def get_doctor_languages(doctor_url):
-    """抓取医生详情页，解析支持语言列表"""
-    print(f"  Fetching doctor page: {doctor_url}")
-    r = requests.get(doctor_url, headers=HEADERS)
+
+class Fetcher:
+    """
+    共享 keep-alive 连接池的抓取器：按 host 限速限并发，
+    连接错误、超时、429 与 5xx 以指数退避重试（429/503 优先遵守 Retry-After）。
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, rps=5.0, max_in_flight=8, retries=3, backoff=0.5, backoff_max=30.0, timeout=15.0):
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.limiter = HostLimiter(rps, max_in_flight)
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _delay(self, attempt, response):
+        if response is not None:
+            try:
+                return min(float(response.headers.get("Retry-After", "")), self.backoff_max)
+            except ValueError:
+                pass
+        return min(self.backoff * 2 ** attempt, self.backoff_max) * random.uniform(0.5, 1.0)
+
+    def get(self, url, headers=None):
+        """返回最后一次的 Response；重试后仍连不上则返回 None"""
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                with self.limiter.slot(host):
+                    self._count("requests")
+                    response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                print(f"  Warning: {url}: {e}")
+            if response is not None and response.status_code not in self.RETRY_STATUS:
+                return response
+            if attempt == self.retries:
+                break
+            self._count("retries")
+            time.sleep(self._delay(attempt, response))
+        self._count("failures")
+        return response
+
+
+BASE_URL = os.getenv("FINDDOC_BASE_URL", "https://www.finddoc.com")
+FETCHER = Fetcher()
+# 页面解析后端：scan（默认）/ strainer / soup，见 crawl_extract.py
+EXTRACTOR = get_extractor(os.getenv("CRAWL_PARSER", "scan"))
+
+
+def clinic_url(clinic_id, base_url=None):
+    return f"{base_url or BASE_URL}/practices/the-london-medical-clinic-{clinic_id}"
+
+
+def parse_doctor_languages(html):
+    """从医生详情页解析支持语言列表"""
+    return EXTRACTOR.doctor(html)
+
+
+def parse_clinic_page(html, page_url):
+    """解析诊所页：返回 (诊所基本信息, [(医生页 URL, 姓名, 专科)])"""
+    return EXTRACTOR.clinic(html, page_url)
+
+
+def fetch_page(url, parse, fetcher=None, state=None):
+    """
+    抓取并解析页面，返回 (状态码, 解析结果)；连不上时状态码为 None。
+    有 state 时发送条件请求：304 或内容哈希未变就沿用上次的解析结果，不再解析 HTML。
+    """
+    previous = state.get(url) if state else None
+    r = (fetcher or FETCHER).get(url, headers=state.conditional_headers(previous) if state else None)
+    if r is None:
+        return None, None
+    if r.status_code == 304 and previous:
+        state.touch(url)
+        state.count("not_modified")
+        return 200, previous["parsed"]
     if r.status_code != 200:
-        print(f"  Error: Failed to fetch doctor page ({r.status_code})")
+        if state and r.status_code in DEAD_STATUS:
+            state.record(url, r.status_code)
+        return r.status_code, None
+
+    digest = hashlib.sha256(r.content).hexdigest()
+    if previous and previous["content_hash"] == digest and previous["parsed"] is not None:
+        parsed = previous["parsed"]
+        if state:
+            state.count("unchanged")
+    else:
+        parsed = parse(r.text)
+        if state:
+            state.count("parsed")
+    if state:
+        state.record(url, 200, r.headers.get("ETag"), r.headers.get("Last-Modified"), digest, parsed)
+    return 200, parsed
+
+
+def get_doctor_languages(doctor_url, fetcher=None, state=None):
+    """抓取医生详情页，解析支持语言列表"""
+    status, languages = fetch_page(doctor_url, parse_doctor_languages, fetcher, state)
+    if status != 200:
+        print(f"  Error: Failed to fetch doctor page {doctor_url} ({status or 'no response'})")
         return []
-    soup = BeautifulSoup(r.text, "html.parser")
-    languages = []
-    for info in soup.find_all("div", class_="doctor-detail-info-list"):
-        title = info.find("h3", class_="doctor-detail-info-list__title")
-        if title and "語言" in title.get_text():
-            for li in info.select("ul.doctor-detail-info-list__list li"):
-                for lang in li.get_text(strip=True).split("、"):
-                    if lang.strip():
-                        languages.append(lang.strip())
-            break
     return languages
 
 
-def get_clinic_data(clinic_id):
-    """抓取单个诊所及其医生信息，并做多语言映射"""
-    clinic_url = f"https://www.finddoc.com/practices/the-london-medical-clinic-{clinic_id}"
-    print(f"Fetching clinic page: {clinic_url}")
-    r = requests.get(clinic_url, headers=HEADERS)
-    if r.status_code != 200:
-        print(f"Error: Failed to fetch clinic page ({r.status_code})")
-        return None
+class DoctorCache:
+    """
+    一轮抓取内按医生页 URL 去重：同一医生出现在多间诊所时只抓取、解析一次，
+    并发的请求等待同一个结果。抓取失败不缓存，之后的诊所会再试。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.stats = {"fetched": 0, "hits": 0}
 
-    soup = BeautifulSoup(r.text, "html.parser")
-    # 诊所基本信息
-    clinic_name = soup.find("div", class_="clinic-details__name")
-    clinic_name = clinic_name.get_text(strip=True) if clinic_name else "N/A"
-
-    address_tag = soup.find("p", class_="clinic-address")
-    address = address_tag.get_text(strip=True) if address_tag else "N/A"
-
-    phone_tag = soup.find("a", class_=lambda x: x and "et-phone" in x)
-    phone = phone_tag.get_text(strip=True) if phone_tag else "N/A"
-
-    # 经纬度
-    lat, lng = "N/A", "N/A"
-    map_link = soup.find("a", href=re.compile(r"google\.com/maps"))
-    if map_link:
-        m = re.search(r"query=([\d\.]+),([\d\.]+)", map_link["href"])
-        if m:
-            lat, lng = m.group(1), m.group(2)
-
-    # 医生列表
-    doctors = []
-    for item in soup.select("div.doctor-list__item"):
-        link = item.find("a", href=True)
-        if not link:
-            continue
-        doctor_url = "https://www.finddoc.com" + link["href"]
-
-        name_tag = link.find("h3")
-        doctor_name = name_tag.get_text(strip=True) if name_tag else "N/A"
-
-        spec_tag = link.find("p", class_="doctor-list__specialty")
-        specialty = spec_tag.get_text(strip=True) if spec_tag else "N/A"
-
-        # 抓语言
-        languages = get_doctor_languages(doctor_url)
-
-        # 多语言映射
-        specialty_i18n = DEPT_MAP_TW.get(
-            specialty,
-            {"zh_CN": specialty, "zh_TW": specialty, "en": specialty, "id": specialty}
-        )
-        languages_i18n = [
-            LANG_MAP_TW.get(
-                lang,
-                {"zh_CN": lang, "zh_TW": lang, "en": lang, "id": lang}
-            )
-            for lang in languages
-        ]
-
-        doctors.append({
-            "name": doctor_name,
-            "specialty": specialty,
-            "languages": languages,
-            "specialty_i18n": specialty_i18n,
-            "languages_i18n": languages_i18n
-        })
+    def languages(self, doctor_url, fetcher=None, state=None):
+        with self._lock:
+            fut = self._entries.get(doctor_url)
+            leader = fut is None
+            if leader:
+                fut = self._entries[doctor_url] = Future()
+                self.stats["fetched"] += 1
+            else:
+                self.stats["hits"] += 1
+        if not leader:
+            return fut.result()
 
+        languages = None
+        try:
+            status, languages = fetch_page(doctor_url, parse_doctor_languages, fetcher, state)
+        finally:
+            if languages is None:
+                with self._lock:
+                    del self._entries[doctor_url]
+            fut.set_result(languages or [])
+        if status != 200:
+            print(f"  Error: Failed to fetch doctor page {doctor_url} ({status or 'no response'})")
+        return languages or []
+
+
+def build_doctor(name, specialty, languages):
+    """医生记录及多语言映射（精确匹配对照表中任一语言的名称，忽略大小写与空白；对不上的保留原文）"""
+    specialty_i18n = DEPARTMENTS.i18n(specialty)
+    languages_i18n = [LANGUAGES.i18n(lang) for lang in languages]
     return {
+        "name": name,
+        "specialty": specialty,
+        "languages": languages,
+        "specialty_i18n": specialty_i18n,
+        "languages_i18n": languages_i18n
+    }
+
+
+def get_clinic_data(clinic_id, fetcher=None, doctor_pool=None, base_url=None, state=None, doctors=None):
+    """
+    抓取单个诊所及其医生信息，并做多语言映射。
+    传入 doctor_pool（线程池）时医生页并行抓取，否则逐个抓取；
+    传入 state 时完成后写入检查点，诊所页消失则从检查点删除；
+    传入 doctors（DoctorCache）时医生页在整轮抓取内只抓一次。
+    """
+    url = clinic_url(clinic_id, base_url)
+    status, parsed = fetch_page(url, lambda html: parse_clinic_page(html, url), fetcher, state)
+    if status != 200:
+        if status in DEAD_STATUS:
+            if state:
+                state.drop_clinic(clinic_id)
+        else:
+            print(f"Error: Failed to fetch clinic page {url} ({status or 'no response'})")
+        return None
+
+    info, listing = parsed
+    urls = [doctor_url for doctor_url, _, _ in listing]
+    fetch_languages = doctors.languages if doctors is not None else get_doctor_languages
+    if doctor_pool is not None:
+        languages = list(doctor_pool.map(lambda u: fetch_languages(u, fetcher, state), urls))
+    else:
+        languages = [fetch_languages(u, fetcher, state) for u in urls]
+
+    data = {
         "clinic_id": clinic_id,
-        "name": clinic_name,
-        "address": address,
-        "phone": phone,
-        "latitude": lat,
-        "longitude": lng,
-        "doctors": doctors
+        **info,
+        "doctors": [build_doctor(name, specialty, langs) for (_, name, specialty), langs in zip(listing, languages)]
     }
+    if state:
+        state.save_clinic(clinic_id, data)
+    return data
+
+
+def _result(fut):
+    """单个诊所出错只记录，不中断整个抓取"""
+    try:
+        return fut.result()
+    except Exception as e:
+        print(f"Error: clinic task failed: {e!r}")
+        return None
+
+
+def crawl(clinic_ids, fetcher=None, workers=8, doctor_workers=8, base_url=None, state=None, doctors=None):
+    """
+    并发抓取多个诊所，按完成顺序逐个产出结果（不存在的诊所略过）。
+    有 state 时跳过本轮已完成的诊所与近期确认不存在的 id。
+    诊所页与医生页用两个线程池，避免诊所任务占满线程后等待自己提交的医生任务。
+    """
+    doctors = doctors if doctors is not None else DoctorCache()
+    with ThreadPoolExecutor(workers, thread_name_prefix="clinic") as clinic_pool, \
+            ThreadPoolExecutor(doctor_workers, thread_name_prefix="doctor") as doctor_pool:
+        # 只保留有限个在途任务，id 范围再大也不会一次全部提交
+        inflight = set()
+        for clinic_id in clinic_ids:
+            if state and state.should_skip(clinic_id, clinic_url(clinic_id, base_url)):
+                continue
+            if len(inflight) >= workers * 2:
+                finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    data = _result(fut)
+                    if data:
+                        yield data
+            inflight.add(clinic_pool.submit(
+                get_clinic_data, clinic_id, fetcher, doctor_pool, base_url, state, doctors
+            ))
+        for fut in as_completed(inflight):
+            data = _result(fut)
+            if data:
+                yield data
+
+
+def iter_jsonl_sorted(path):
+    """
+    按 clinic_id 顺序读出 JSONL 里的诊所；同一 id 出现多次时取最后一行。
+    内存里只保留 (id, 文件偏移量)，再逐条 seek 读取。写到一半的最后一行会被略过。
+    """
+    offsets = {}
+    with open(path, "rb") as f:
+        pos = 0
+        for line in f:
+            try:
+                offsets[json.loads(line)["clinic_id"]] = pos
+            except (ValueError, KeyError, TypeError):
+                pass
+            pos += len(line)
+        for clinic_id in sorted(offsets):
+            f.seek(offsets[clinic_id])
+            yield json.loads(f.readline())
+
+
+def write_compact_json(clinics, path):
+    """逐条写成紧凑的 JSON 数组（每行一间诊所），先写临时文件再替换；返回条数"""
+    tmp = path + ".tmp"
+    count = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("[")
+        for clinic in clinics:
+            f.write(("," if count else "") + "\n" + json.dumps(clinic, ensure_ascii=False, separators=(",", ":")))
+            count += 1
+        f.write("\n]\n")
+    os.replace(tmp, path)
+    return count
+
+
+def main():
+    ap = argparse.ArgumentParser(description="抓取 finddoc 诊所与医生数据")
+    ap.add_argument("--start", type=int, default=0, help="起始诊所 id")
+    ap.add_argument("--end", type=int, default=10000, help="结束诊所 id（不含）")
+    ap.add_argument("-o", "--output", default="clinic_data_all.json")
+    ap.add_argument("--jsonl", help="抓取过程中逐条写入的 JSONL，默认与 -o 同名、扩展名为 .jsonl")
+    ap.add_argument("--base-url", default=BASE_URL, help="站点地址，可指向本地 fixture 服务器")
+    ap.add_argument("--workers", type=int, default=8, help="同时抓取的诊所数（1 = 逐个抓取）")
+    ap.add_argument("--doctor-workers", type=int, default=8, help="同时抓取的医生页数")
+    ap.add_argument("--rps", type=float, default=5.0, help="每个 host 每秒最多请求数（0 = 不限）")
+    ap.add_argument("--max-in-flight", type=int, default=8, help="每个 host 同时在途的请求数")
+    ap.add_argument("--retries", type=int, default=3)
+    ap.add_argument("--timeout", type=float, default=15.0)
+    ap.add_argument("--parser", choices=sorted(BACKENDS), help="页面解析后端，默认取 CRAWL_PARSER 或 scan")
+    ap.add_argument("--state", default="crawl_state.db", help="抓取状态 SQLite 文件（空字符串 = 不保存状态）")
+    ap.add_argument("--fresh", action="store_true", help="不接续上次未完成的抓取，开始新一轮")
+    ap.add_argument("--recheck-dead", type=float, default=30, help="已知 404 的 id 隔多少天再检查")
+    args = ap.parse_args()
+
+    global EXTRACTOR
+    if args.parser:
+        EXTRACTOR = get_extractor(args.parser)
+    fetcher = Fetcher(rps=args.rps, max_in_flight=args.max_in_flight, retries=args.retries, timeout=args.timeout)
+    state = CrawlState(args.state, dead_ttl=args.recheck_dead * 86400) if args.state else None
+    resumed = bool(state and state.begin_run(fresh=args.fresh))
+    if resumed:
+        print(f"resuming unfinished crawl recorded in {args.state}")
+    jsonl = args.jsonl or os.path.splitext(args.output)[0] + ".jsonl"
+    doctors = DoctorCache()
+    started = time.perf_counter()
+    found = 0
+
+    # 每完成一间诊所就写一行，内存不随诊所数增长
+    with open(jsonl, "a" if resumed else "w", encoding="utf-8") as out:
+        for data in crawl(range(args.start, args.end), fetcher, args.workers, args.doctor_workers,
+                          args.base_url, state, doctors):
+            out.write(json.dumps(data, ensure_ascii=False, separators=(",", ":")) + "\n")
+            out.flush()
+            found += 1
+            print(f"[{found}] clinic {data['clinic_id']}: {data['name']} ({len(data['doctors'])} doctors)")
 
+    # 最后按 clinic_id 组装成紧凑的 JSON；有检查点时从检查点组装（含本轮之前抓到的诊所）
+    if state:
+        state.finish_run()
+    source = state.clinics() if state else iter_jsonl_sorted(jsonl)
+    count = write_compact_json((c for c in source if args.start <= c["clinic_id"] < args.end), args.output)
+    elapsed = time.perf_counter() - started
+    print(f"已保存 {count} 条诊所数据到 {args.output}（逐条记录：{jsonl}）")
+    print(f"{elapsed:.1f}s, {fetcher.stats['requests']} requests, "
+          f"{fetcher.stats['retries']} retries, {fetcher.stats['failures']} failures, "
+          f"{doctors.stats['fetched']} doctor pages, {doctors.stats['hits']} reused")
+    if state:
+        print("state: " + ", ".join(f"{k} {v}" for k, v in state.stats.items()))
+        state.close()
 
 if __name__ == "__main__":
-    clinics = []
-    for i in range(10000):
-        data = get_clinic_data(i)
-        if data:
-            print(json.dumps(data, ensure_ascii=False, indent=2))
-            clinics.append(data)
-
-    # 保存到 clinic_data.json
-    out_file = "clinic_data_all.json"
-    with open(out_file, "w", encoding="utf-8") as f:
-        json.dump(clinics, f, ensure_ascii=False, indent=2)
-    print(f"已保存 {len(clinics)} 条诊所数据到 {out_file}")
+    main()
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+finddoc 页面解析后端（crawl.py 用 --parser 或 CRAWL_PARSER 选择）。
+
+- soup：完整的 BeautifulSoup 树（原始实现，作为对照）
+- strainer：SoupStrainer 只为需要的元素建 Tag，导航、页脚等其余标签直接丢弃
+- scan：标准库 HTMLParser 事件流，只跟踪需要的元素，不建树（默认，最快）
+
+三者输出相同；benchmarks/bench_extract.py 在保存的页面上逐一比对并测速。
+每个后端提供 clinic(html, page_url) -> (诊所基本信息, [(医生页 URL, 姓名, 专科)])
+与 doctor(html) -> [语言]。
+"""
+
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+MAP_HREF = re.compile(r"google\.com/maps")
+MAP_QUERY = re.compile(r"query=([\d\.]+),([\d\.]+)")
+
+# 与 BeautifulSoup 的 html.parser 一致：这些标签没有结束标签，
+# 这些标签里的文字不计入 get_text()
+EMPTY_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta",
+    "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex",
+    "nextid", "spacer",
+}
+STRING_CONTAINERS = {"script", "style", "template", "rt", "rp"}
+
+
+class Extractor(NamedTuple):
+    clinic: Callable[[str, str], Tuple[dict, List[tuple]]]
+    doctor: Callable[[str], List[str]]
+
+
+# ------------------------------------------------------------------
+# soup / strainer：在（可能是裁剪过的）BeautifulSoup 树上查找
+# ------------------------------------------------------------------
+
+def _clinic_from_soup(soup, page_url):
+    # 诊所基本信息
+    clinic_name = soup.find("div", class_="clinic-details__name")
+    clinic_name = clinic_name.get_text(strip=True) if clinic_name else "N/A"
+
+    address_tag = soup.find("p", class_="clinic-address")
+    address = address_tag.get_text(strip=True) if address_tag else "N/A"
+
+    phone_tag = soup.find("a", class_=lambda x: x and "et-phone" in x)
+    phone = phone_tag.get_text(strip=True) if phone_tag else "N/A"
+
+    # 经纬度
+    lat, lng = "N/A", "N/A"
+    map_link = soup.find("a", href=MAP_HREF)
+    if map_link:
+        m = MAP_QUERY.search(map_link["href"])
+        if m:
+            lat, lng = m.group(1), m.group(2)
+
+    # 医生列表
+    doctors = []
+    for item in soup.select("div.doctor-list__item"):
+        link = item.find("a", href=True)
+        if not link:
+            continue
+        name_tag = link.find("h3")
+        spec_tag = link.find("p", class_="doctor-list__specialty")
+        doctors.append((
+            urljoin(page_url, link["href"]),
+            name_tag.get_text(strip=True) if name_tag else "N/A",
+            spec_tag.get_text(strip=True) if spec_tag else "N/A",
+        ))
+
+    info = {"name": clinic_name, "address": address, "phone": phone, "latitude": lat, "longitude": lng}
+    return info, doctors
+
+
+def _doctor_from_soup(soup):
+    languages = []
+    for info in soup.find_all("div", class_="doctor-detail-info-list"):
+        title = info.find("h3", class_="doctor-detail-info-list__title")
+        if title and "語言" in title.get_text():
+            for li in info.select("ul.doctor-detail-info-list__list li"):
+                for lang in li.get_text(strip=True).split("、"):
+                    if lang.strip():
+                        languages.append(lang.strip())
+            break
+    return languages
+
+
+def soup_clinic(html, page_url):
+    return _clinic_from_soup(BeautifulSoup(html, "html.parser"), page_url)
+
+
+def soup_doctor(html):
+    return _doctor_from_soup(BeautifulSoup(html, "html.parser"))
+
+
+def _classes(attrs):
+    value = (attrs or {}).get("class") or ""
+    return value.split() if isinstance(value, str) else list(value)
+
+
+class _TargetStrainer(SoupStrainer):
+    """
+    只允许在顶层建出 want(name, attrs) 为真的标签；被允许的标签连同整棵子树保留，
+    所以查找逻辑与完整树完全相同。class_=True 让顶层的零散文字也被丢弃。
+    """
+
+    def __init__(self, want):
+        super().__init__(class_=True)
+        self._want = want
+
+    def allow_tag_creation(self, nsprefix, name, attrs):      # bs4 >= 4.13
+        return self._want(name, attrs or {})
+
+    def search_tag(self, markup_name=None, markup_attrs={}):  # bs4 < 4.13 的解析期回调
+        if isinstance(markup_name, str):
+            return markup_name if self._want(markup_name, dict(markup_attrs)) else None
+        return super().search_tag(markup_name, markup_attrs)
+
+
+def _clinic_targets(name, attrs):
+    classes = _classes(attrs)
+    if name == "div":
+        return "clinic-details__name" in classes or "doctor-list__item" in classes
+    if name == "p":
+        return "clinic-address" in classes
+    if name == "a":
+        return any("et-phone" in c for c in classes) or bool(MAP_HREF.search(attrs.get("href") or ""))
+    return False
+
+
+def _doctor_targets(name, attrs):
+    return name == "div" and "doctor-detail-info-list" in _classes(attrs)
+
+
+def strainer_clinic(html, page_url):
+    soup = BeautifulSoup(html, "html.parser", parse_only=_TargetStrainer(_clinic_targets))
+    return _clinic_from_soup(soup, page_url)
+
+
+def strainer_doctor(html):
+    return _doctor_from_soup(BeautifulSoup(html, "html.parser", parse_only=_TargetStrainer(_doctor_targets)))
+
+
+# ------------------------------------------------------------------
+# scan：HTMLParser 事件流，不建树
+# ------------------------------------------------------------------
+
+class _Text:
+    """一个元素的文字；parts 是按标签边界切开的文字段（与 BeautifulSoup 的 NavigableString 对应）"""
+
+    __slots__ = ("parts",)
+
+    def __init__(self):
+        self.parts = []
+
+    def get(self, strip=False):
+        if strip:
+            return "".join(p.strip() for p in self.parts)
+        return "".join(self.parts)
+
+
+class _Scanner(HTMLParser):
+    """
+    维护与 BeautifulSoup html.parser 相同的开放元素栈（空元素不入栈，
+    结束标签弹出到最近的同名元素，找不到就忽略），子类在 start / end 中挑出需要的元素。
+    只有 TAGS 中的标签会调用 start，其余标签只维护栈。
+    """
+
+    TAGS = frozenset()
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._stack = []        # [标签名, 该元素开始收集的 _Text 列表]
+        self._active = []       # 正在收集文字的 _Text
+        self._data = []
+        self._containers = 0    # 开着的 script / style 等（其中的文字不算）
+
+    def capture(self, frame):
+        text = _Text()
+        frame[1].append(text)
+        self._active.append(text)
+        return text
+
+    def start(self, tag, attrs, frame):
+        pass
+
+    def end(self, frame):
+        pass
+
+    def _flush(self):
+        if self._data:
+            text = "".join(self._data)
+            self._data = []
+            if not self._containers:
+                for t in self._active:
+                    t.parts.append(text)
+
+    def _close(self, frame):
+        for t in frame[1]:
+            self._active = [a for a in self._active if a is not t]
+        if frame[0] in STRING_CONTAINERS:
+            self._containers -= 1
+        self.end(frame)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        frame = [tag, []]
+        if tag not in EMPTY_ELEMENTS:
+            self._stack.append(frame)
+            if tag in STRING_CONTAINERS:
+                self._containers += 1
+        if tag in self.TAGS:
+            self.start(tag, {k: v if v is not None else "" for k, v in attrs}, frame)
+
+    def handle_endtag(self, tag):
+        self._flush()
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                for frame in reversed(self._stack[i:]):
+                    self._close(frame)
+                del self._stack[i:]
+                return
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+
+    def close(self):
+        super().close()
+        self._flush()
+        for frame in reversed(self._stack):
+            self._close(frame)
+        self._stack = []
+
+
+class _DoctorItem:
+    __slots__ = ("frame", "link", "href", "name", "specialty")
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.link = None
+        self.href = ""
+        self.name = None
+        self.specialty = None
+
+
+class _ClinicScanner(_Scanner):
+    TAGS = frozenset(("div", "p", "a", "h3"))
+
+    def __init__(self):
+        super().__init__()
+        self.name: Optional[_Text] = None
+        self.address: Optional[_Text] = None
+        self.phone: Optional[_Text] = None
+        self.map_href: Optional[str] = None
+        self.items: List[_DoctorItem] = []
+        self._open_items: List[_DoctorItem] = []
+        self._open_links: List[_DoctorItem] = []
+
+    def start(self, tag, attrs, frame):
+        classes = attrs.get("class", "").split() if "class" in attrs else []
+        # 医生链接内的姓名与专科（链接本身不算）
+        for item in self._open_links:
+            if tag == "h3" and item.name is None:
+                item.name = self.capture(frame)
+            elif tag == "p" and item.specialty is None and "doctor-list__specialty" in classes:
+                item.specialty = self.capture(frame)
+
+        if tag == "div":
+            if self.name is None and "clinic-details__name" in classes:
+                self.name = self.capture(frame)
+            if "doctor-list__item" in classes:
+                item = _DoctorItem(frame)
+                self.items.append(item)
+                self._open_items.append(item)
+        elif tag == "p":
+            if self.address is None and "clinic-address" in classes:
+                self.address = self.capture(frame)
+        elif tag == "a":
+            if self.phone is None and any("et-phone" in c for c in classes):
+                self.phone = self.capture(frame)
+            if "href" in attrs:
+                if self.map_href is None and MAP_HREF.search(attrs["href"]):
+                    self.map_href = attrs["href"]
+                for item in self._open_items:
+                    if item.link is None:
+                        item.link, item.href = frame, attrs["href"]
+                        self._open_links.append(item)
+
+    def end(self, frame):
+        if self._open_links:
+            self._open_links = [item for item in self._open_links if item.link is not frame]
+        if self._open_items:
+            self._open_items = [item for item in self._open_items if item.frame is not frame]
+
+
+def scan_clinic(html, page_url):
+    scanner = _ClinicScanner()
+    scanner.feed(html)
+    scanner.close()
+
+    lat, lng = "N/A", "N/A"
+    if scanner.map_href is not None:
+        m = MAP_QUERY.search(scanner.map_href)
+        if m:
+            lat, lng = m.group(1), m.group(2)
+    doctors = [
+        (urljoin(page_url, item.href),
+         item.name.get(strip=True) if item.name else "N/A",
+         item.specialty.get(strip=True) if item.specialty else "N/A")
+        for item in scanner.items if item.link is not None
+    ]
+    info = {
+        "name": scanner.name.get(strip=True) if scanner.name else "N/A",
+        "address": scanner.address.get(strip=True) if scanner.address else "N/A",
+        "phone": scanner.phone.get(strip=True) if scanner.phone else "N/A",
+        "latitude": lat,
+        "longitude": lng,
+    }
+    return info, doctors
+
+
+class _InfoBlock:
+    __slots__ = ("frame", "title", "items")
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.title = None
+        self.items = []
+
+
+class _DoctorScanner(_Scanner):
+    TAGS = frozenset(("div", "h3", "ul", "li"))
+
+    def __init__(self):
+        super().__init__()
+        self.blocks: List[_InfoBlock] = []
+        self._open_blocks: List[_InfoBlock] = []
+        self._open_lists = []
+
+    def start(self, tag, attrs, frame):
+        classes = attrs.get("class", "").split() if "class" in attrs else []
+        if tag == "div" and "doctor-detail-info-list" in classes:
+            block = _InfoBlock(frame)
+            self.blocks.append(block)
+            self._open_blocks.append(block)
+        elif tag == "h3" and "doctor-detail-info-list__title" in classes:
+            for block in self._open_blocks:
+                if block.title is None:
+                    block.title = self.capture(frame)
+        elif tag == "ul" and "doctor-detail-info-list__list" in classes:
+            self._open_lists.append(frame)
+        elif tag == "li" and self._open_lists and self._open_blocks:
+            text = self.capture(frame)
+            for block in self._open_blocks:
+                block.items.append(text)
+
+    def end(self, frame):
+        if self._open_blocks:
+            self._open_blocks = [b for b in self._open_blocks if b.frame is not frame]
+        if self._open_lists:
+            self._open_lists = [f for f in self._open_lists if f is not frame]
+
+
+def scan_doctor(html):
+    scanner = _DoctorScanner()
+    scanner.feed(html)
+    scanner.close()
+    for block in scanner.blocks:
+        if block.title is not None and "語言" in block.title.get():
+            return [lang.strip() for li in block.items for lang in li.get(strip=True).split("、") if lang.strip()]
+    return []
+
+
+BACKENDS: Dict[str, Extractor] = {
+    "soup": Extractor(soup_clinic, soup_doctor),
+    "strainer": Extractor(strainer_clinic, strainer_doctor),
+    "scan": Extractor(scan_clinic, scan_doctor),
+}
+
+
+def get_extractor(name: str) -> Extractor:
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"unknown parser {name!r}, choose from {', '.join(BACKENDS)}") from None
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+crawl.py 的持久化抓取狀態（SQLite）。
+
+pages 表記錄每個 URL 最近一次的狀態碼、ETag / Last-Modified、內容雜湊與解析結果：
+- 重跑時對已知存在的頁面發送條件請求（If-None-Match / If-Modified-Since），
+  304 或內容雜湊相同時直接沿用上次的解析結果，不再解析 HTML
+- 已知 404 的診所 id 在 dead_ttl 內不再請求
+clinics 表是檢查點：每抓完一間診所就寫入，程式中斷也不會丟失已完成的部分。
+runs 表記錄每次抓取的開始時間；上次未完成時接著跑，略過本輪已經檢查過的頁面。
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS pages ("
+    " url TEXT PRIMARY KEY, status INTEGER NOT NULL, etag TEXT, last_modified TEXT,"
+    " content_hash TEXT, parsed TEXT, checked REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS clinics ("
+    " clinic_id INTEGER PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT, started REAL NOT NULL, finished REAL)",
+)
+
+DEAD_STATUS = (404, 410)
+
+
+class CrawlState:
+    def __init__(self, path: str = "crawl_state.db", dead_ttl: float = 30 * 86400) -> None:
+        self.path = path
+        self.dead_ttl = dead_ttl
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        for stmt in _SCHEMA:
+            self._conn.execute(stmt)
+        self.run_started = 0.0
+        self.stats = {"not_modified": 0, "unchanged": 0, "parsed": 0, "skipped": 0}
+
+    # -------------------------------------------------------------- #
+
+    def begin_run(self, fresh: bool = False) -> bool:
+        """開始一輪抓取；上一輪未完成且 fresh=False 時接續它。回傳是否為接續"""
+        with self._lock:
+            row = self._conn.execute("SELECT id, started, finished FROM runs ORDER BY id DESC LIMIT 1").fetchone()
+            if row and row[2] is None and not fresh:
+                self._run_id, self.run_started = row[0], row[1]
+                return True
+            self.run_started = time.time()
+            self._run_id = self._conn.execute(
+                "INSERT INTO runs (started) VALUES (?)", (self.run_started,)
+            ).lastrowid
+            return False
+
+    def finish_run(self) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE runs SET finished = ? WHERE id = ?", (time.time(), self._run_id))
+
+    def should_skip(self, clinic_id: int, url: str) -> bool:
+        """本輪已保存過這間診所，或診所頁是近期確認過的 404"""
+        with self._lock:
+            saved = self._conn.execute(
+                "SELECT 1 FROM clinics WHERE clinic_id = ? AND updated >= ?", (clinic_id, self.run_started)
+            ).fetchone()
+            page = self._conn.execute("SELECT status, checked FROM pages WHERE url = ?", (url,)).fetchone()
+        skip = saved is not None or (
+            page is not None and page[0] in DEAD_STATUS and time.time() - page[1] < self.dead_ttl
+        )
+        if skip:
+            self.count("skipped")
+        return skip
+
+    # -------------------------------------------------------------- #
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, etag, last_modified, content_hash, parsed FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "etag": row[1], "last_modified": row[2], "content_hash": row[3],
+                "parsed": json.loads(row[4]) if row[4] is not None else None}
+
+    def conditional_headers(self, page: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        if not page or page["status"] != 200 or page["parsed"] is None:
+            return {}
+        headers = {}
+        if page["etag"]:
+            headers["If-None-Match"] = page["etag"]
+        if page["last_modified"]:
+            headers["If-Modified-Since"] = page["last_modified"]
+        return headers
+
+    def record(self, url: str, status: int, etag: Optional[str] = None, last_modified: Optional[str] = None,
+               content_hash: Optional[str] = None, parsed: Any = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, status, etag, last_modified, content_hash, parsed, checked)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, status, etag, last_modified, content_hash,
+                 json.dumps(parsed, ensure_ascii=False) if parsed is not None else None, time.time())
+            )
+
+    def touch(self, url: str) -> None:
+        """304：內容沒變，只更新檢查時間"""
+        with self._lock:
+            self._conn.execute("UPDATE pages SET checked = ? WHERE url = ?", (time.time(), url))
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    # -------------------------------------------------------------- #
+
+    def save_clinic(self, clinic_id: int, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO clinics (clinic_id, data, updated) VALUES (?, ?, ?)",
+                (clinic_id, json.dumps(data, ensure_ascii=False), time.time())
+            )
+
+    def drop_clinic(self, clinic_id: int) -> None:
+        """診所頁已不存在"""
+        with self._lock:
+            self._conn.execute("DELETE FROM clinics WHERE clinic_id = ?", (clinic_id,))
+
+    def clinics(self) -> Iterator[Dict[str, Any]]:
+        """依 clinic_id 順序分批讀出所有已保存的診所（不一次載入全部）"""
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT clinic_id, data FROM clinics WHERE clinic_id > ? ORDER BY clinic_id LIMIT 500", (last,)
+                ).fetchall()
+            if not rows:
+                return
+            for _, data in rows:
+                yield json.loads(data)
+            last = rows[-1][0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
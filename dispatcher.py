@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM 請求調度器：所有對上游的呼叫（同步、串流、非同步）都經過這裡。
+
+- 全域與逐端點（conversation / translate / background）並發上限
+- 超出上限的請求進入有界等待佇列，依優先級放行：進行中的問診 > 新問診 > 翻譯與背景任務；
+  佇列已滿時擠掉優先級最低的等待者，自己也排不進去就立刻以 Overloaded 拒絕（上層回 503）
+- 暫時性錯誤（429 / 5xx / 逾時 / 連線錯誤）以指數退避 + 抖動重試，有 Retry-After 時照辦
+- 斷路器：連續失敗達門檻後在冷卻期內直接拒絕，冷卻後放一個試探請求，成功才恢復
+"""
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from bisect import insort
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import openai
+
+PRIORITY_ACTIVE = 0     # 進行中的問診（已有 AI 回覆或正在確認）
+PRIORITY_NEW = 1        # 新問診的第一輪
+PRIORITY_LOW = 2        # 翻譯、推測任務、歷史壓縮
+
+_REQUEST_CLASS: contextvars.ContextVar[Tuple[str, int]] = contextvars.ContextVar(
+    "llm_request_class", default=("default", PRIORITY_NEW)
+)
+
+
+def set_request_class(endpoint: str, priority: int) -> None:
+    """設定目前請求（及其複製出去的 context）呼叫 LLM 時的端點與優先級"""
+    _REQUEST_CLASS.set((endpoint, priority))
+
+
+class Overloaded(Exception):
+    """等待佇列已滿、等待逾時或斷路器開啟；retry_after 為建議的重試秒數"""
+
+    def __init__(self, message: str, retry_after: float = 1.0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpen(Overloaded):
+    pass
+
+
+def is_transient(exc: BaseException) -> bool:
+    err = openai.error
+    if isinstance(exc, (err.RateLimitError, err.Timeout, err.TryAgain,
+                        err.APIConnectionError, err.ServiceUnavailableError)):
+        return True
+    if isinstance(exc, err.APIError):
+        return exc.http_status is None or exc.http_status >= 500
+    return isinstance(exc, (TimeoutError, ConnectionError))
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """讀取上游錯誤回應中的 Retry-After（秒）；沒有或無法解析時回傳 None"""
+    headers = getattr(exc, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "endpoint", "notify", "state")
+
+    def __init__(self, priority: int, seq: int, endpoint: str, notify: Callable[[], None]) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.endpoint = endpoint
+        self.notify = notify
+        self.state = "waiting"      # waiting / granted / evicted
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class LLMDispatcher:
+    def __init__(
+            self,
+            max_concurrency: int = 64,
+            endpoint_limits: Optional[Dict[str, int]] = None,
+            max_queue: int = 256,
+            queue_timeout: float = 30.0,
+            max_retries: int = 2,
+            backoff_base: float = 0.5,
+            backoff_max: float = 8.0,
+            breaker_threshold: int = 10,
+            breaker_cooldown: float = 30.0
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.endpoint_limits = dict(endpoint_limits or {})
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._active_by_endpoint: Dict[str, int] = {}
+        self._queue: List[_Waiter] = []         # 依 (priority, seq) 排序
+        self._seq = 0
+        self._failures = 0                      # 連續失敗次數
+        self._open_until = 0.0
+        self._probe_until = 0.0                 # 半開狀態下試探請求的期限
+        self._counters = {"admitted": 0, "queued": 0, "shed": 0, "evicted": 0, "timeouts": 0,
+                          "retries": 0, "failures": 0, "breaker_opens": 0, "breaker_rejects": 0}
+
+    # -------------------------------------------------------------- #
+    # 准入
+    # -------------------------------------------------------------- #
+
+    def _has_room(self, endpoint: str) -> bool:
+        limit = self.endpoint_limits.get(endpoint)
+        return self._active < self.max_concurrency and (
+            limit is None or self._active_by_endpoint.get(endpoint, 0) < limit
+        )
+
+    def _take_slot(self, endpoint: str) -> None:
+        self._active += 1
+        self._active_by_endpoint[endpoint] = self._active_by_endpoint.get(endpoint, 0) + 1
+        self._counters["admitted"] += 1
+
+    def _check_breaker(self) -> None:
+        """呼叫時持有 self._lock；斷路器開啟時拒絕，冷卻結束後只放行一個試探請求"""
+        if self._failures < self.breaker_threshold:
+            return
+        now = time.monotonic()
+        if now < self._open_until or now < self._probe_until:
+            self._counters["breaker_rejects"] += 1
+            raise CircuitOpen("LLM upstream circuit open", max(1.0, self._open_until - now))
+        self._probe_until = now + self.breaker_cooldown
+
+    def _enqueue(self, endpoint: str, priority: int, notify: Callable[[], None]) -> Optional[_Waiter]:
+        """有空位時直接占用並回傳 None；否則排入佇列（必要時擠掉最低優先級的等待者）"""
+        evicted = None
+        with self._lock:
+            self._check_breaker()
+            if self._has_room(endpoint):
+                self._take_slot(endpoint)
+                return None
+            if len(self._queue) >= self.max_queue:
+                if not self._queue or self._queue[-1].priority <= priority:
+                    self._counters["shed"] += 1
+                    raise Overloaded("LLM queue full")
+                evicted = self._queue.pop()
+                evicted.state = "evicted"
+                self._counters["evicted"] += 1
+            self._seq += 1
+            waiter = _Waiter(priority, self._seq, endpoint, notify)
+            insort(self._queue, waiter)
+            self._counters["queued"] += 1
+        if evicted is not None:
+            evicted.notify()
+        return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """停止等待：還在佇列中就移除並回傳 False；若恰好已被放行（名額已占用）回傳 True"""
+        with self._lock:
+            if waiter.state == "waiting":
+                self._queue.remove(waiter)
+                self._counters["timeouts"] += 1
+                return False
+            return waiter.state == "granted"
+
+    def _granted(self, waiter: _Waiter) -> None:
+        if waiter.state == "evicted":
+            raise Overloaded("LLM queue full (preempted by higher-priority request)")
+
+    def _release(self, endpoint: str) -> None:
+        notify: List[_Waiter] = []
+        with self._lock:
+            self._active -= 1
+            self._active_by_endpoint[endpoint] -= 1
+            i = 0
+            while i < len(self._queue) and self._active < self.max_concurrency:
+                waiter = self._queue[i]
+                if self._has_room(waiter.endpoint):
+                    del self._queue[i]
+                    waiter.state = "granted"
+                    self._take_slot(waiter.endpoint)
+                    notify.append(waiter)
+                else:
+                    i += 1
+        for waiter in notify:
+            waiter.notify()
+
+    def _acquire(self, endpoint: str, priority: int) -> None:
+        event = threading.Event()
+        waiter = self._enqueue(endpoint, priority, event.set)
+        if waiter is None:
+            return
+        if not event.wait(self.queue_timeout) and not self._abandon(waiter):
+            raise Overloaded("timed out waiting for an LLM slot")
+        self._granted(waiter)
+
+    async def _aacquire(self, endpoint: str, priority: int) -> None:
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future = loop.create_future()
+
+        def notify() -> None:
+            loop.call_soon_threadsafe(lambda: fut.done() or fut.set_result(None))
+
+        waiter = self._enqueue(endpoint, priority, notify)
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter):
+                raise Overloaded("timed out waiting for an LLM slot")
+        except asyncio.CancelledError:
+            if self._abandon(waiter):
+                self._release(waiter.endpoint)
+            raise
+        self._granted(waiter)
+
+    # -------------------------------------------------------------- #
+    # 結果與重試
+    # -------------------------------------------------------------- #
+
+    def _record(self, ok: bool) -> None:
+        with self._lock:
+            self._probe_until = 0.0
+            if ok:
+                self._failures = 0
+                return
+            self._failures += 1
+            self._counters["failures"] += 1
+            if self._failures >= self.breaker_threshold:
+                if self._failures == self.breaker_threshold or time.monotonic() >= self._open_until:
+                    self._counters["breaker_opens"] += 1
+                self._open_until = time.monotonic() + self.breaker_cooldown
+
+    def _backoff(self, attempt: int, exc: BaseException) -> Optional[float]:
+        """回傳下一次重試前的等待秒數；不該重試時回傳 None"""
+        if attempt >= self.max_retries or not is_transient(exc):
+            return None
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        hinted = retry_after(exc)
+        if hinted is not None:
+            delay = min(self.backoff_max, hinted) + delay / 2
+        with self._lock:
+            self._counters["retries"] += 1
+        return delay
+
+    def _settle(self, exc: BaseException) -> None:
+        # 呼叫端自身的錯誤（如 400）不計入斷路器
+        if is_transient(exc):
+            self._record(False)
+        else:
+            with self._lock:
+                self._probe_until = 0.0
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        endpoint, priority = _REQUEST_CLASS.get()
+        self._acquire(endpoint, priority)
+        try:
+            attempt = 0
+            while True:
+                try:
+                    out = fn(*args, **kwargs)
+                except Exception as e:
+                    delay = self._backoff(attempt, e)
+                    if delay is None:
+                        self._settle(e)
+                        raise
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                self._record(True)
+                return out
+        finally:
+            self._release(endpoint)
+
+    async def acall(self, fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        endpoint, priority = _REQUEST_CLASS.get()
+        await self._aacquire(endpoint, priority)
+        try:
+            attempt = 0
+            while True:
+                try:
+                    out = await fn(*args, **kwargs)
+                except Exception as e:
+                    delay = self._backoff(attempt, e)
+                    if delay is None:
+                        self._settle(e)
+                        raise
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                self._record(True)
+                return out
+        finally:
+            self._release(endpoint)
+
+    def stream(self, fn: Callable[..., Iterator[Any]], *args: Any, **kwargs: Any) -> Iterator[Any]:
+        """串流呼叫：整個迭代期間占用名額；只有在收到第一段之前的失敗才重試"""
+        endpoint, priority = _REQUEST_CLASS.get()
+        self._acquire(endpoint, priority)
+        try:
+            attempt = 0
+            while True:
+                try:
+                    chunks = iter(fn(*args, **kwargs))
+                    first = next(chunks, None)
+                except Exception as e:
+                    delay = self._backoff(attempt, e)
+                    if delay is None:
+                        self._settle(e)
+                        raise
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                break
+            try:
+                if first is not None:
+                    yield first
+                yield from chunks
+            except GeneratorExit:
+                self._record(True)
+                raise
+            except Exception as e:
+                self._settle(e)
+                raise
+            self._record(True)
+        finally:
+            self._release(endpoint)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counters)
+            out["in_flight"] = self._active
+            out["queue_depth"] = len(self._queue)
+            out["circuit_open"] = int(
+                self._failures >= self.breaker_threshold and time.monotonic() < self._open_until
+            )
+        return out
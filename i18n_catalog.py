@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+科室 / 語言四語對照表與查詢索引，crawl.py、public/rewrite.py、app.py 與 clinic_index.py 共用。
+
+匯入時為每張表各建一次索引：
+- 精確索引：任一語言（简体 / 繁體 / English / Bahasa Indonesia）的名稱與別名，
+  正規化後 → 規範鍵（简体名稱），O(1) 查詢。正規化包括 NFKC、大小寫、
+  去掉空白與標點，以及「&」/「and」/「dan」
+- 模糊索引：正規化名稱的字元 bigram（含首尾標記）→ 名稱列表。查詢時按共用 bigram
+  的 Dice 係數挑出少數候選，再精算 SequenceMatcher 相似度；最高分低於門檻、或最高分
+  同時落在兩個不同的鍵上時，不猜測
+
+python i18n_catalog.py --check 比對前端的 JSON 副本與本表，--write 重新產生它們。
+"""
+
+import argparse
+import difflib
+import heapq
+import json
+import os
+import re
+import sys
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+LOCALES = ("zh_CN", "zh_TW", "en", "id")
+FUZZY_CANDIDATES = 8   # 模糊查詢時按 bigram 重疊挑出、再精算相似度的名稱數
+
+# 科室四語對照，鍵為简体名稱（即規範鍵）
+DEPARTMENT_I18N = {
+    "外科":                   {"zh_CN":"外科",             "zh_TW":"外科",             "en":"Surgery",                                       "id":"Bedah"},
+    "小儿外科":               {"zh_CN":"小儿外科",         "zh_TW":"小兒外科",         "en":"Pediatric Surgery",                            "id":"Bedah Anak"},
+    "普通科":                 {"zh_CN":"普通科",           "zh_TW":"普通科",           "en":"General Practice",                             "id":"Praktik Umum"},
+    "肠胃肝脏科":             {"zh_CN":"肠胃肝脏科",       "zh_TW":"腸胃肝臟科",       "en":"Gastroenterology & Hepatology",                 "id":"Gastroenterologi & Hepatologi"},
+    "精神科":                 {"zh_CN":"精神科",           "zh_TW":"精神科",           "en":"Psychiatry",                                    "id":"Psikiatri"},
+    "临床心理学":             {"zh_CN":"临床心理学",       "zh_TW":"臨床心理學",       "en":"Clinical Psychology",                          "id":"Psikologi Klinis"},
+    "内科":                   {"zh_CN":"内科",             "zh_TW":"內科",             "en":"Internal Medicine",                            "id":"Penyakit Dalam"},
+    "耳鼻喉科":               {"zh_CN":"耳鼻喉科",         "zh_TW":"耳鼻喉科",         "en":"Otolaryngology",                                "id":"Telinga Hidung Tenggorokan"},
+    "家庭医学":               {"zh_CN":"家庭医学",         "zh_TW":"家庭醫學",         "en":"Family Medicine",                              "id":"Kedokteran Keluarga"},
+    "放射科":                 {"zh_CN":"放射科",           "zh_TW":"放射科",           "en":"Radiology",                                     "id":"Radiologi"},
+    "麻醉科":                 {"zh_CN":"麻醉科",           "zh_TW":"麻醉科",           "en":"Anesthesiology",                                "id":"Anestesiologi"},
+    "病理学":                 {"zh_CN":"病理学",           "zh_TW":"病理學",           "en":"Pathology",                                     "id":"Patologi"},
+    "眼科":                   {"zh_CN":"眼科",             "zh_TW":"眼科",             "en":"Ophthalmology",                                 "id":"Oftalmologi"},
+    "整形外科":               {"zh_CN":"整形外科",         "zh_TW":"整形外科",         "en":"Plastic Surgery",                               "id":"Bedah Plastik"},
+    "骨科":                   {"zh_CN":"骨科",             "zh_TW":"骨科",             "en":"Orthopedics",                                   "id":"Ortopedi"},
+    "泌尿外科":               {"zh_CN":"泌尿外科",         "zh_TW":"泌尿外科",         "en":"Urology",                                       "id":"Urologi"},
+    "临床肿瘤科":             {"zh_CN":"临床肿瘤科",       "zh_TW":"臨床腫瘤科",       "en":"Clinical Oncology",                             "id":"Onkologi Klinis"},
+    "血液及血液肿瘤科":       {"zh_CN":"血液及血液肿瘤科", "zh_TW":"血液及血液腫瘤科", "en":"Hematology & Hemato-oncology",                  "id":"Hematologi & Hemato-onkologi"},
+    "妇产科":                 {"zh_CN":"妇产科",           "zh_TW":"婦產科",           "en":"Obstetrics & Gynecology",                       "id":"Obstetri & Ginekologi"},
+    "内分泌及糖尿科":         {"zh_CN":"内分泌及糖尿科",   "zh_TW":"內分泌及糖尿科",   "en":"Endocrinology & Diabetology",                   "id":"Endokrinologi & Diabetologi"},
+    "风湿病科":               {"zh_CN":"风湿病科",         "zh_TW":"風濕病科",         "en":"Rheumatology",                                  "id":"Reumatologi"},
+    "神经外科":               {"zh_CN":"神经外科",         "zh_TW":"神經外科",         "en":"Neurosurgery",                                  "id":"Bedah Saraf"},
+    "核子医学科":             {"zh_CN":"核子医学科",       "zh_TW":"核子醫學科",       "en":"Nuclear Medicine",                              "id":"Kedokteran Nuklir"},
+    "临床微生物及感染学":     {"zh_CN":"临床微生物及感染学","zh_TW":"臨床微生物及感染學","en":"Clinical Microbiology & Infectious Diseases",    "id":"Mikrobiologi Klinis & Penyakit Infeksi"},
+    "急症科":                 {"zh_CN":"急症科",           "zh_TW":"急症科",           "en":"Emergency Medicine",                            "id":"Kedokteran Darurat"},
+    "儿科":                   {"zh_CN":"儿科",             "zh_TW":"兒科",             "en":"Pediatrics",                                    "id":"Pediatri"},
+    "复康科":                 {"zh_CN":"复康科",           "zh_TW":"復康科",           "en":"Rehabilitation",                                 "id":"Rehabilitasi"},
+    "脑神经科":               {"zh_CN":"脑神经科",         "zh_TW":"腦神經科",         "en":"Neurology",                                     "id":"Neurologi"},
+    "心脏科":                 {"zh_CN":"心脏科",           "zh_TW":"心臟科",           "en":"Cardiology",                                    "id":"Kardiologi"},
+    "肾病科":                 {"zh_CN":"肾病科",           "zh_TW":"腎病科",           "en":"Nephrology",                                    "id":"Nefrologi"},
+    "呼吸系统科":             {"zh_CN":"呼吸系统科",       "zh_TW":"呼吸系統科",       "en":"Pulmonology",                                   "id":"Pulmonologi"},
+    "牙科":                   {"zh_CN":"牙科",             "zh_TW":"牙科",             "en":"Dentistry",                                     "id":"Kedokteran Gigi"},
+    "物理治疗":               {"zh_CN":"物理治疗",         "zh_TW":"物理治療",         "en":"Physiotherapy",                                 "id":"Fisioterapi"},
+    "免疫及过敏病科":         {"zh_CN":"免疫及过敏病科",   "zh_TW":"免疫及過敏病科",   "en":"Immunology & Allergy",                          "id":"Imunologi & Alergi"},
+    "疼痛医学":               {"zh_CN":"疼痛医学",         "zh_TW":"疼痛醫學",         "en":"Pain Medicine",                                 "id":"Ilmu Nyeri"},
+    "皮肤及性病科":           {"zh_CN":"皮肤及性病科",     "zh_TW":"皮膚及性病科",     "en":"Dermatology & Venereology",                     "id":"Dermatologi & Venereologi"},
+    "老人科":                 {"zh_CN":"老人科",           "zh_TW":"老人科",           "en":"Geriatrics",                                    "id":"Geriatri"},
+    "社会医学":               {"zh_CN":"社会医学",         "zh_TW":"社會醫學",         "en":"Social Medicine",                               "id":"Kedokteran Sosial"},
+    "中医":                   {"zh_CN":"中医",             "zh_TW":"中醫",             "en":"Traditional Chinese Medicine",                  "id":"Pengobatan Tradisional Tiongkok"},
+    "儿童免疫、过敏及传染病科":{"zh_CN":"儿童免疫、过敏及传染病科","zh_TW":"兒童免疫、過敏及傳染病科","en":"Pediatric Immunology, Allergy & Infectious Diseases","id":"Imunologi Anak, Alergi & Penyakit Infeksi"},
+    "营养学":                 {"zh_CN":"营养学",           "zh_TW":"營養學",           "en":"Nutrition",                                     "id":"Gizi"},
+    "心胸肺外科":             {"zh_CN":"心胸肺外科",       "zh_TW":"心胸肺外科",       "en":"Thoracic Surgery",                              "id":"Bedah Toraks"},
+    "内科肿瘤科":             {"zh_CN":"内科肿瘤科",       "zh_TW":"內科腫瘤科",       "en":"Medical Oncology",                              "id":"Onkologi Medis"},
+    "妇科肿瘤科":             {"zh_CN":"妇科肿瘤科",       "zh_TW":"婦科腫瘤科",       "en":"Gynecologic Oncology",                          "id":"Onkologi Ginekologi"},
+    "解剖病理学":             {"zh_CN":"解剖病理学",       "zh_TW":"解剖病理學",       "en":"Anatomical Pathology",                          "id":"Patologi Anatomi"},
+    "感染及传染病科":         {"zh_CN":"感染及传染病科",   "zh_TW":"感染及傳染病科",   "en":"Infectious Diseases",                           "id":"Penyakit Infeksi"},
+    "法医病理学":             {"zh_CN":"法医病理学",       "zh_TW":"法醫病理學",       "en":"Forensic Pathology",                            "id":"Patologi Forensik"},
+    "生殖医学科":             {"zh_CN":"生殖医学科",       "zh_TW":"生殖醫學科",       "en":"Reproductive Medicine",                         "id":"Kedokteran Reproduksi"},
+    "职业医学":               {"zh_CN":"职业医学",         "zh_TW":"職業醫學",         "en":"Occupational Medicine",                        "id":"Kedokteran Kerja"},
+    "牙周治疗科":             {"zh_CN":"牙周治疗科",       "zh_TW":"牙周治療科",       "en":"Periodontics",                                  "id":"Periodontia"},
+    "修复齿科专科":           {"zh_CN":"修复齿科专科",     "zh_TW":"修復齒科專科",     "en":"Prosthodontics",                                "id":"Prostodonsia"},
+    "口腔颌面外科":           {"zh_CN":"口腔颌面外科",     "zh_TW":"口腔顎面外科",     "en":"Oral & Maxillofacial Surgery",                  "id":"Bedah Mulut & Maksilofasial"},
+}
+
+# 語言四語對照
+LANGUAGE_I18N = {
+    "上海话":     {"zh_CN":"上海话",    "zh_TW":"上海話",    "en":"Shanghainese",    "id":"Bahasa Shanghai"},
+    "印尼语":     {"zh_CN":"印尼语",    "zh_TW":"印尼語",    "en":"Indonesian",      "id":"Bahasa Indonesia"},
+    "台湾话":     {"zh_CN":"台湾话",    "zh_TW":"台灣話",    "en":"Taiwanese",       "id":"Bahasa Taiwan"},
+    "客家话":     {"zh_CN":"客家话",    "zh_TW":"客家話",    "en":"Hakka",           "id":"Bahasa Hakka"},
+    "广东话":     {"zh_CN":"广东话",    "zh_TW":"廣東話",    "en":"Cantonese",       "id":"Bahasa Kanton"},
+    "德语":       {"zh_CN":"德语",      "zh_TW":"德語",      "en":"German",          "id":"Bahasa Jerman"},
+    "日语":       {"zh_CN":"日语",      "zh_TW":"日語",      "en":"Japanese",        "id":"Bahasa Jepang"},
+    "普通话":     {"zh_CN":"普通话",    "zh_TW":"普通話",    "en":"Mandarin",        "id":"Bahasa Mandarin"},
+    "法语":       {"zh_CN":"法语",      "zh_TW":"法語",      "en":"French",          "id":"Bahasa Prancis"},
+    "泰语":       {"zh_CN":"泰语",      "zh_TW":"泰語",      "en":"Thai",            "id":"Bahasa Thailand"},
+    "潮州话":     {"zh_CN":"潮州话",    "zh_TW":"潮州話",    "en":"Teochew",         "id":"Bahasa Teochew"},
+    "福州话":     {"zh_CN":"福州话",    "zh_TW":"福州話",    "en":"Fuzhounese",      "id":"Bahasa Fuzhou"},
+    "福建话":     {"zh_CN":"福建话",    "zh_TW":"福建話",    "en":"Hokkien",         "id":"Bahasa Hokkien"},
+    "福建话(厦门)": {"zh_CN":"福建话(厦门)","zh_TW":"福建話(廈門)","en":"Xiamen Hokkien",  "id":"Hokkien Xiamen"},
+    "福建话(闽南)": {"zh_CN":"福建话(闽南)","zh_TW":"福建話(閩南)","en":"Minnan Hokkien",  "id":"Hokkien Minnan"},
+    "英语":       {"zh_CN":"英语",      "zh_TW":"英語",      "en":"English",         "id":"Bahasa Inggris"},
+}
+
+# 表中沒有、但常見的同義名稱（內地與香港的叫法不同、英文縮寫等），只用於查詢
+DEPARTMENT_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "肠胃肝脏科": ("消化内科", "消化內科", "消化科", "胃肠科", "腸胃科", "肝病科", "Gastroenterology", "Hepatology"),
+    "脑神经科": ("神经内科", "神經內科", "神经科", "神經科", "Neurologist"),
+    "心脏科": ("心内科", "心內科", "心血管内科", "Cardiologist"),
+    "呼吸系统科": ("呼吸内科", "呼吸內科", "呼吸科", "胸肺科", "Respiratory Medicine", "Pulmonology & Respiratory"),
+    "内分泌及糖尿科": ("内分泌科", "糖尿病科", "Endocrinology", "Diabetology"),
+    "肾病科": ("肾内科", "腎內科", "肾科", "腎科"),
+    "皮肤及性病科": ("皮肤科", "皮膚科", "Dermatology"),
+    "妇产科": ("妇科", "婦科", "产科", "產科", "OB/GYN", "Gynecology", "Obstetrics"),
+    "耳鼻喉科": ("耳鼻咽喉科", "ENT"),
+    "急症科": ("急诊科", "急診科", "急诊", "Emergency", "A&E"),
+    "复康科": ("康复科", "康復科", "康复医学科"),
+    "风湿病科": ("风湿免疫科", "风湿科"),
+    "感染及传染病科": ("感染科", "传染病科"),
+    "临床肿瘤科": ("肿瘤科", "腫瘤科", "Oncology"),
+    "牙科": ("口腔科", "Dentist", "Dental"),
+    "临床心理学": ("心理科", "Psychology"),
+    "老人科": ("老年科", "老年医学科", "老年醫學科"),
+    "普通科": ("全科", "General Medicine", "GP"),
+    "家庭医学": ("全科医学",),
+    "整形外科": ("Plastic & Reconstructive Surgery",),
+    "骨科": ("Orthopaedics", "Orthopedic Surgery"),
+    "儿科": ("小儿科", "小兒科", "Paediatrics"),
+    "小儿外科": ("Paediatric Surgery",),
+    "放射科": ("影像科",),
+}
+
+LANGUAGE_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "广东话": ("粤语", "粵語", "广州话", "廣州話", "白话"),
+    "普通话": ("国语", "國語", "华语", "華語", "Putonghua"),
+    "福建话(闽南)": ("闽南话", "閩南話", "闽南语", "閩南語"),
+    "英语": ("英文",),
+    "日语": ("日文",),
+    "法语": ("法文",),
+    "德语": ("德文",),
+}
+
+_CONNECTIVES = {"and", "dan"}
+_WORD = re.compile(r"\w+")
+
+
+def normalize(label: str) -> str:
+    """比較用的鍵：NFKC、忽略大小寫、去掉空白 / 標點 / 連接詞（Hematology & Hemato-oncology → hematologyhematooncology）"""
+    text = unicodedata.normalize("NFKC", str(label)).casefold()
+    return "".join(w for w in _WORD.findall(text) if w not in _CONNECTIVES)
+
+
+def _bigrams(key: str) -> frozenset:
+    padded = "\x02" + key + "\x03"
+    return frozenset(padded[i:i + 2] for i in range(len(padded) - 1))
+
+
+class Catalog:
+    """一張四語對照表的精確 / 模糊查詢；規範鍵為表的鍵（简体名稱）"""
+
+    def __init__(self, table: Dict[str, Dict[str, str]],
+                 aliases: Optional[Dict[str, Iterable[str]]] = None, cutoff: float = 0.75) -> None:
+        self.table = table
+        self.cutoff = cutoff
+        self._exact: Dict[str, str] = {}
+        for key, entry in table.items():
+            for label in (key, *entry.values()):
+                self._exact.setdefault(normalize(label), key)
+        for key, labels in (aliases or {}).items():
+            if key not in table:
+                raise KeyError(f"alias target {key!r} is not in the table")
+            for label in labels:
+                self._exact.setdefault(normalize(label), key)
+        self._exact.pop("", None)
+
+        # 模糊索引：編號 → (名稱, bigram 集合, 規範鍵)；bigram → 含有它的名稱編號
+        self._names: List[Tuple[str, frozenset, str]] = []
+        self._postings: Dict[str, List[int]] = {}
+        for label, key in self._exact.items():
+            grams = _bigrams(label)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(len(self._names))
+            self._names.append((label, grams, key))
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.table
+
+    def __iter__(self):
+        return iter(self.table)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def lookup(self, label: str) -> Optional[str]:
+        """精確查詢（正規化後）；找不到時回傳 None"""
+        return self._exact.get(normalize(label)) if label else None
+
+    def match(self, label: str, cutoff: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """
+        模糊查詢：回傳 (規範鍵, 相似度)；低於門檻或有歧義（最佳分數相同的不同科室）時回傳 None。
+        先用 bigram 倒排索引按 Dice 係數挑出少數候選，再以 SequenceMatcher 計算相似度
+        （與 difflib.get_close_matches 同一種分數），不用與全部名稱逐一比較。
+        """
+        key = normalize(label) if label else ""
+        if not key:
+            return None
+        if key in self._exact:
+            return self._exact[key], 1.0
+        grams = _bigrams(key)
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for i in self._postings.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        candidates = heapq.nlargest(
+            FUZZY_CANDIDATES, shared, key=lambda i: 2 * shared[i] / (len(grams) + len(self._names[i][1]))
+        )
+        cutoff = self.cutoff if cutoff is None else cutoff
+        matcher = difflib.SequenceMatcher(b=key, autojunk=False)
+        best_score, best = 0.0, set()
+        for i in candidates:
+            name, _, canonical = self._names[i]
+            matcher.set_seq1(name)
+            if matcher.real_quick_ratio() < max(cutoff, best_score) or matcher.quick_ratio() < max(cutoff, best_score):
+                continue
+            score = matcher.ratio()
+            if score > best_score:
+                best_score, best = score, {canonical}
+            elif score == best_score:
+                best.add(canonical)
+        if best_score < cutoff or len(best) != 1:
+            return None
+        return best.pop(), best_score
+
+    def resolve(self, label: str, fuzzy: bool = True) -> Optional[str]:
+        """先精確、再（可選）模糊查詢；回傳規範鍵或 None"""
+        key = self.lookup(label)
+        if key is None and fuzzy:
+            found = self.match(label)
+            key = found[0] if found else None
+        return key
+
+    def i18n(self, label: str, fuzzy: bool = False) -> Dict[str, str]:
+        """四語名稱；查不到時四種語言都用原名稱"""
+        key = self.resolve(label, fuzzy)
+        if key is None:
+            return {loc: label for loc in LOCALES}
+        return self.table[key]
+
+
+DEPARTMENTS = Catalog(DEPARTMENT_I18N, DEPARTMENT_ALIASES)
+LANGUAGES = Catalog(LANGUAGE_I18N, LANGUAGE_ALIASES)
+
+
+# ------------------------------------------------------------------
+# 前端 JSON 副本
+# ------------------------------------------------------------------
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+# 路徑 → (對照表, 作為鍵的語言, 排版)。排版沿用各檔案原有的格式，重新產生時 diff 只有內容變更：
+# 科室檔為 4 / 6 格縮排、外層右括號縮 2 格；語言檔為標準的 2 格縮排
+JSON_COPIES = {
+    os.path.join("app", "map", "department_i18n.json"): (DEPARTMENT_I18N, ("zh_CN", "zh_TW"), 2),
+    os.path.join("app", "report", "department_i18n.json"): (DEPARTMENT_I18N, ("zh_CN", "zh_TW"), 2),
+    os.path.join("app", "map", "language_i18n.json"): (LANGUAGE_I18N, ("zh_TW",), 0),
+}
+
+
+def json_copy(table: Dict[str, Dict[str, str]], key_locales: Tuple[str, ...]) -> Dict[str, Dict[str, str]]:
+    """前端用的字典：以指定語言的名稱為鍵（頁面以原始資料中的名稱查四語名稱）"""
+    out: Dict[str, Dict[str, str]] = {}
+    for entry in table.values():
+        for loc in key_locales:
+            out.setdefault(entry[loc], entry)
+    return out
+
+
+def dump_copy(data: Dict[str, Dict[str, str]], margin: int) -> str:
+    """2 格縮排的 JSON，第一行以外的每行再多縮排 margin 格"""
+    first, *rest = json.dumps(data, ensure_ascii=False, indent=2).split("\n")
+    return "\n".join([first] + [" " * margin + line for line in rest]) + "\n"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="比對 / 重新產生前端的四語 JSON 副本")
+    group = ap.add_mutually_exclusive_group(required=True)
+    group.add_argument("--check", action="store_true", help="與本表不一致時列出差異並以狀態碼 1 結束")
+    group.add_argument("--write", action="store_true", help="依本表重新產生 JSON 副本")
+    args = ap.parse_args()
+
+    stale = 0
+    for path, (table, key_locales, margin) in JSON_COPIES.items():
+        expected = json_copy(table, key_locales)
+        full = os.path.join(_ROOT, path)
+        if args.write:
+            with open(full, "w", encoding="utf-8") as f:
+                f.write(dump_copy(expected, margin))
+            print(f"wrote {path} ({len(expected)} entries)")
+            continue
+        with open(full, encoding="utf-8") as f:
+            current = json.load(f)
+        diff = sorted(k for k in set(current) | set(expected) if current.get(k) != expected.get(k))
+        if diff:
+            stale += 1
+            print(f"{path}: {len(diff)} entries differ: {', '.join(diff[:10])}")
+    if stale:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM 回覆快取。
+
+以 (model, messages, kwargs) 的正規化雜湊為鍵，快取模型輸出文本：
+- 第一層：行程內 LRU（OrderedDict），依條目數淘汰
+- 第二層（可選）：SQLite 檔案，多個 worker 共用，依條目數淘汰
+兩層都套用 TTL，過期條目視為未命中並刪除。
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def make_key(model: str, messages: List[dict], **kwargs: Any) -> str:
+    """對請求內容做正規化（排序鍵、緊湊分隔符）後取 sha256"""
+    canonical = json.dumps(
+        {"model": model, "messages": messages, "kwargs": kwargs},
+        ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(
+            self,
+            max_entries: int = 1024,
+            ttl: float = 3600.0,
+            sqlite_path: Optional[str] = None,
+            sqlite_max_entries: int = 100_000
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sqlite_path = sqlite_path
+        self.sqlite_max_entries = sqlite_max_entries
+        self._mem: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._disk_writes = 0
+        self._counters = {"hits_memory": 0, "hits_disk": 0, "misses": 0,
+                          "stores": 0, "evictions": 0, "expired": 0}
+        if sqlite_path:
+            self._db().execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db().execute(
+                "CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache(accessed)"
+            )
+
+    # -------------------------------------------------------------- #
+
+    def _db(self) -> sqlite3.Connection:
+        """sqlite3 連線不可跨執行緒共用，每個執行緒各開一條"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.sqlite_path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def _remember(self, key: str, created: float, value: str) -> None:
+        with self._lock:
+            self._mem[key] = (created, value)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    # -------------------------------------------------------------- #
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._mem.move_to_end(key)
+                    self._counters["hits_memory"] += 1
+                    return entry[1]
+                del self._mem[key]
+                self._counters["expired"] += 1
+
+        if self.sqlite_path:
+            try:
+                db = self._db()
+                row = db.execute(
+                    "SELECT value, created FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created = row
+                    if now - created <= self.ttl:
+                        db.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+                        self._remember(key, created, value)
+                        self._count("hits_disk")
+                        return value
+                    db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._count("expired")
+            except sqlite3.Error:
+                pass
+
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        self._remember(key, now, value)
+        self._count("stores")
+        if not self.sqlite_path:
+            return
+        try:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            with self._lock:
+                self._disk_writes += 1
+                check = self._disk_writes % 100 == 1
+            if not check:
+                return
+            # 每 100 次寫入才統計一次條目數，避免每次寫入都掃表
+            excess = db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.sqlite_max_entries
+            if excess > 0:
+                db.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY accessed LIMIT ?)", (excess,)
+                )
+                self._count("evictions", excess)
+        except sqlite3.Error:
+            pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        if self.sqlite_path:
+            self._db().execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counters)
+            out["memory_entries"] = len(self._mem)
+        lookups = out["hits_memory"] + out["hits_disk"] + out["misses"]
+        out["hit_rate"] = (out["hits_memory"] + out["hits_disk"]) / lookups if lookups else 0.0
+        return out
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM 輸出 JSON 的增量抽取器。
+
+模型輸出常帶 ``` 圍欄、前置說明文字，或在 JSON 之後再補一句含 '}' 的話；
+IncrementalJSONExtractor 可以一段一段地餵入 completion，只解析第一個頂層
+{...} 物件，每個頂層欄位一閉合就能取用，不必等整段回覆結束。
+頂層出現不合 JSON 語法的字元（說明文字裡的 {...}、缺逗號等）或物件沒有任何欄位時，
+不把它當結果，改從下一個 '{' 找起；找不到時 result() 丟出 ValueError。
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_STR_SPECIAL = re.compile(r'["\\]')
+_DECODER = json.JSONDecoder(strict=False)
+_JSON_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+
+def decode_partial_string(raw: str) -> str:
+    """解碼 JSON 字串內容的前綴；結尾未完成的轉義序列先略過，等下一段再處理"""
+    out: List[str] = []
+    i, n = 0, len(raw)
+    while i < n:
+        ch = raw[i]
+        if ch != "\\":
+            out.append(ch)
+            i += 1
+            continue
+        if i + 1 >= n:
+            break
+        esc = raw[i + 1]
+        if esc == "u":
+            if i + 6 > n:
+                break
+            try:
+                out.append(chr(int(raw[i + 2:i + 6], 16)))
+            except ValueError:
+                out.append(raw[i:i + 6])
+            i += 6
+            continue
+        out.append(_JSON_ESCAPES.get(esc, esc))
+        i += 2
+    return "".join(out)
+
+
+class IncrementalJSONExtractor:
+    """
+    逐段解析 LLM 輸出中的第一個頂層 JSON 物件。
+
+    - feed(chunk) 回傳本段新閉合的 (欄位, 值) 列表
+    - partial(field) 回傳尚在生成中的字串欄位目前的內容
+    - result() 在物件閉合後回傳完整 dict，否則丟出 ValueError
+    """
+
+    def __init__(self) -> None:
+        self._buf = ""
+        self._pos = 0
+        self.error: Optional[str] = None
+        self._reset(-1)
+
+    def _reset(self, start: int) -> None:
+        """開始解析位於 start 的候選物件（-1 表示尚未找到 '{'）"""
+        self._start = start       # 目前候選物件的 '{' 位置
+        self._depth = 1 if start >= 0 else 0
+        self._in_str = False
+        self._esc = False
+        self._expect = "key"      # 頂層狀態：key -> colon -> value -> comma
+        self._key: Optional[str] = None
+        self._key_start = -1
+        self._value_start = -1
+        self.fields: Dict[str, Any] = {}
+        self.closed = False
+
+    def _reject(self, reason: str) -> int:
+        """
+        目前的 {...} 不是 JSON 物件（說明文字中的括號、格式錯誤）：記下原因，
+        從它之後的下一個 '{' 重新開始，回傳繼續掃描的位置
+        """
+        self.error = reason
+        restart = self._start + 1
+        self._reset(-1)
+        return restart
+
+    # -------------------------------------------------------------- #
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        if self.closed or not chunk:
+            return []
+        self._buf += chunk
+        emitted: List[Tuple[str, Any]] = []
+        buf = self._buf
+        n = len(buf)
+        i = self._pos
+
+        while i < n and not self.closed:
+            if self._start < 0:
+                i = buf.find("{", i)
+                if i < 0:
+                    i = n
+                    break
+                self._reset(i)
+                i += 1
+                continue
+
+            ch = buf[i]
+
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch != '"' and ch != "\\":
+                    # 字串內容一次跳到下一個引號或反斜線
+                    m = _STR_SPECIAL.search(buf, i)
+                    i = m.start() if m else n
+                    continue
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+                    if self._depth == 1:
+                        if self._expect == "key":
+                            self._key = json.loads(buf[self._key_start:i + 1], strict=False)
+                            self._expect = "colon"
+                        elif self._expect == "value" and not self._emit(buf[self._value_start:i + 1], emitted):
+                            i = self._reject("invalid value")
+                            continue
+                i += 1
+                continue
+
+            if self._depth == 1 and not ch.isspace() and not self._expected(ch):
+                i = self._reject(f"unexpected {ch!r} while expecting {self._expect}")
+                continue
+            if ch == '"':
+                self._in_str = True
+                if self._depth == 1:
+                    if self._expect == "key":
+                        self._key_start = i
+                    elif self._expect == "value" and self._value_start < 0:
+                        self._value_start = i
+            elif ch in "{[":
+                if self._depth == 1 and self._expect == "value" and self._value_start < 0:
+                    self._value_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._expect == "value" and self._value_start >= 0:
+                    if not self._emit(buf[self._value_start:i + 1], emitted):
+                        i = self._reject("invalid value")
+                        continue
+                elif self._depth == 0:
+                    if self._expect == "value" and self._value_start >= 0 and \
+                            not self._emit(buf[self._value_start:i], emitted):
+                        i = self._reject("invalid value")
+                        continue
+                    if not self.fields:
+                        i = self._reject("object has no fields")
+                        continue
+                    self.closed = True
+            elif self._depth == 1:
+                if ch == ":":
+                    self._expect = "value"
+                    self._value_start = -1
+                elif ch == ",":
+                    if self._expect == "value" and self._value_start >= 0 and \
+                            not self._emit(buf[self._value_start:i], emitted):
+                        i = self._reject("invalid value")
+                        continue
+                    self._expect = "key"
+                elif not ch.isspace() and self._expect == "value" and self._value_start < 0:
+                    # 數字 / true / false / null
+                    self._value_start = i
+            i += 1
+
+        self._pos = i
+        return emitted
+
+    def _expected(self, ch: str) -> bool:
+        """頂層的非空白字元是否符合目前狀態（字串內容不經過這裡）"""
+        expect = self._expect
+        if expect == "key":
+            return ch == '"' or ch == "}" and bool(self.fields)     # 容許 {"a": 1,} 的尾逗號
+        if expect == "colon":
+            return ch == ":"
+        if expect == "comma":
+            return ch == "," or ch == "}"
+        # value：開始一個值，或在已開始的數字 / 常量值之後接 ',' / '}'
+        if self._value_start < 0:
+            return ch not in ",:}]"
+        return ch not in '{[":]'
+
+    def _emit(self, raw: str, emitted: List[Tuple[str, Any]]) -> bool:
+        key = self._key
+        self._expect = "comma"
+        self._value_start = -1
+        if key is None:
+            return False
+        try:
+            value = json.loads(raw.strip(), strict=False)
+        except ValueError:
+            return False
+        self.fields[key] = value
+        emitted.append((key, value))
+        return True
+
+    # -------------------------------------------------------------- #
+
+    def partial(self, field: str) -> str:
+        """字串欄位的目前內容：已閉合回傳完整值，生成中回傳已解碼的前綴"""
+        if field in self.fields:
+            value = self.fields[field]
+            return value if isinstance(value, str) else ""
+        if (self._key == field and self._expect == "value" and self._in_str
+                and self._depth == 1 and self._value_start >= 0):
+            return decode_partial_string(self._buf[self._value_start + 1:self._pos])
+        return ""
+
+    def result(self) -> dict:
+        if self._start < 0:
+            reason = f" ({self.error})" if self.error else ""
+            raise ValueError(f"LLM did not return JSON{reason}: {self._buf[:120]}...")
+        if not self.closed:
+            raise ValueError(f"LLM returned incomplete JSON: {self._buf[:120]}...")
+        return dict(self.fields)
+
+
+def extract_json(text: str) -> dict:
+    """一次性解析整段輸出；語義與 IncrementalJSONExtractor.result() 相同"""
+    start = text.find("{")
+    if start >= 0:
+        # 快速路徑：C 實作的 raw_decode 會在物件閉合處停下，不受尾部說明文字影響
+        try:
+            obj, _ = _DECODER.raw_decode(text, start)
+            if isinstance(obj, dict) and obj:
+                return obj
+        except ValueError:
+            pass
+    parser = IncrementalJSONExtractor()
+    parser.feed(text)
+    return parser.result()
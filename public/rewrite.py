@@ -1,117 +1,376 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+"""
+给爬虫输出的诊所数据补上四语科室 / 语言名称。
+
+默认：clinic_data.json → clinic_data_i18n.json（每位医生带完整的 specialty_i18n / languages_i18n）
+--normalized：另外输出规范化数据集 clinic_data_norm.json
+  - 科室、语言各一张共享的四语表，医生只引用整数 id；诊所、医生为定长数组（字段名见 *_fields）
+  - 紧凑分隔符、坐标保留 6 位小数（约 0.1 米），并预压缩 .gz（装了 brotli 时另有 .br）
+  - --locales zh_TW,en 另外输出单语切片 clinic_data_norm.<locale>.json，表中只有该语言的名称
+  - --report 对比各输出的原始 / gzip / brotli 大小与 json.loads 耗时
+--stream：大文件的流式模式，内存占用与数据量无关
+  - 输入为 JSON 数组或 JSONL，逐条读取；每行一间诊所时（crawl.py 的输出格式）
+    主进程只按行切分，解析交给子进程，否则退回增量 raw_decode
+  - 按 --chunk-size 分块交给 --workers 个进程补充多语言名称，同时在途的块数有上限，按输入顺序写出
+  - 输出为每行一间诊所的紧凑 JSON 数组（-o 以 .jsonl 结尾时为 JSONL）
+  - 结束时报告对照表中没有的科室 / 语言
+"""
+
+import argparse
+import gzip
+import itertools
 import json
 import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli
+except ImportError:   # 可选依赖：没有时只输出 .gz
+    brotli = None
+
+# 四语对照表在仓库根目录的 i18n_catalog.py（与 crawl.py、app.py 共用）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from i18n_catalog import DEPARTMENT_I18N, DEPARTMENTS, LANGUAGE_I18N, LANGUAGES, LOCALES  # noqa: E402
 
 INPUT = "clinic_data.json"
 OUTPUT = "clinic_data_i18n.json"
+NORMALIZED_OUTPUT = "clinic_data_norm.json"
+CHUNK_SIZE = 2000
+CLINIC_FIELDS = ("clinic_id", "name", "address", "phone", "latitude", "longitude", "doctors")
+DOCTOR_FIELDS = ("name", "department", "languages")
 
-# 完整的科室四语映射
-DEPARTMENT_I18N = {
-    "外科":                   {"zh_CN":"外科",             "zh_TW":"外科",             "en":"Surgery",                                       "id":"Bedah"},
-    "小儿外科":               {"zh_CN":"小儿外科",         "zh_TW":"小兒外科",         "en":"Pediatric Surgery",                            "id":"Bedah Anak"},
-    "普通科":                 {"zh_CN":"普通科",           "zh_TW":"普通科",           "en":"General Practice",                             "id":"Praktik Umum"},
-    "肠胃肝脏科":             {"zh_CN":"肠胃肝脏科",       "zh_TW":"腸胃肝臟科",       "en":"Gastroenterology & Hepatology",                 "id":"Gastroenterologi & Hepatologi"},
-    "精神科":                 {"zh_CN":"精神科",           "zh_TW":"精神科",           "en":"Psychiatry",                                    "id":"Psikiatri"},
-    "临床心理学":             {"zh_CN":"临床心理学",       "zh_TW":"臨床心理學",       "en":"Clinical Psychology",                          "id":"Psikologi Klinis"},
-    "内科":                   {"zh_CN":"内科",             "zh_TW":"內科",             "en":"Internal Medicine",                            "id":"Penyakit Dalam"},
-    "耳鼻喉科":               {"zh_CN":"耳鼻喉科",         "zh_TW":"耳鼻喉科",         "en":"Otolaryngology",                                "id":"Telinga Hidung Tenggorokan"},
-    "家庭医学":               {"zh_CN":"家庭医学",         "zh_TW":"家庭醫學",         "en":"Family Medicine",                              "id":"Kedokteran Keluarga"},
-    "放射科":                 {"zh_CN":"放射科",           "zh_TW":"放射科",           "en":"Radiology",                                     "id":"Radiologi"},
-    "麻醉科":                 {"zh_CN":"麻醉科",           "zh_TW":"麻醉科",           "en":"Anesthesiology",                                "id":"Anestesiologi"},
-    "病理学":                 {"zh_CN":"病理学",           "zh_TW":"病理學",           "en":"Pathology",                                     "id":"Patologi"},
-    "眼科":                   {"zh_CN":"眼科",             "zh_TW":"眼科",             "en":"Ophthalmology",                                 "id":"Oftalmologi"},
-    "整形外科":               {"zh_CN":"整形外科",         "zh_TW":"整形外科",         "en":"Plastic Surgery",                               "id":"Bedah Plastik"},
-    "骨科":                   {"zh_CN":"骨科",             "zh_TW":"骨科",             "en":"Orthopedics",                                   "id":"Ortopedi"},
-    "泌尿外科":               {"zh_CN":"泌尿外科",         "zh_TW":"泌尿外科",         "en":"Urology",                                       "id":"Urologi"},
-    "临床肿瘤科":             {"zh_CN":"临床肿瘤科",       "zh_TW":"臨床腫瘤科",       "en":"Clinical Oncology",                             "id":"Onkologi Klinis"},
-    "血液及血液肿瘤科":       {"zh_CN":"血液及血液肿瘤科", "zh_TW":"血液及血液腫瘤科", "en":"Hematology & Hemato-oncology",                  "id":"Hematologi & Hemato-onkologi"},
-    "妇产科":                 {"zh_CN":"妇产科",           "zh_TW":"婦產科",           "en":"Obstetrics & Gynecology",                       "id":"Obstetri & Ginekologi"},
-    "内分泌及糖尿科":         {"zh_CN":"内分泌及糖尿科",   "zh_TW":"內分泌及糖尿科",   "en":"Endocrinology & Diabetology",                   "id":"Endokrinologi & Diabetologi"},
-    "风湿病科":               {"zh_CN":"风湿病科",         "zh_TW":"風濕病科",         "en":"Rheumatology",                                  "id":"Reumatologi"},
-    "神经外科":               {"zh_CN":"神经外科",         "zh_TW":"神經外科",         "en":"Neurosurgery",                                  "id":"Bedah Saraf"},
-    "核子医学科":             {"zh_CN":"核子医学科",       "zh_TW":"核子醫學科",       "en":"Nuclear Medicine",                              "id":"Kedokteran Nuklir"},
-    "临床微生物及感染学":     {"zh_CN":"临床微生物及感染学","zh_TW":"臨床微生物及感染學","en":"Clinical Microbiology & Infectious Diseases",    "id":"Mikrobiologi Klinis & Penyakit Infeksi"},
-    "急症科":                 {"zh_CN":"急症科",           "zh_TW":"急症科",           "en":"Emergency Medicine",                            "id":"Kedokteran Darurat"},
-    "儿科":                   {"zh_CN":"儿科",             "zh_TW":"兒科",             "en":"Pediatrics",                                    "id":"Pediatri"},
-    "复康科":                 {"zh_CN":"复康科",           "zh_TW":"復康科",           "en":"Rehabilitation",                                 "id":"Rehabilitasi"},
-    "脑神经科":               {"zh_CN":"脑神经科",         "zh_TW":"腦神經科",         "en":"Neurology",                                     "id":"Neurologi"},
-    "心脏科":                 {"zh_CN":"心脏科",           "zh_TW":"心臟科",           "en":"Cardiology",                                    "id":"Kardiologi"},
-    "肾病科":                 {"zh_CN":"肾病科",           "zh_TW":"腎病科",           "en":"Nephrology",                                    "id":"Nefrologi"},
-    "呼吸系统科":             {"zh_CN":"呼吸系统科",       "zh_TW":"呼吸系統科",       "en":"Pulmonology",                                   "id":"Pulmonologi"},
-    "牙科":                   {"zh_CN":"牙科",             "zh_TW":"牙科",             "en":"Dentistry",                                     "id":"Kedokteran Gigi"},
-    "物理治疗":               {"zh_CN":"物理治疗",         "zh_TW":"物理治療",         "en":"Physiotherapy",                                 "id":"Fisioterapi"},
-    "免疫及过敏病科":         {"zh_CN":"免疫及过敏病科",   "zh_TW":"免疫及過敏病科",   "en":"Immunology & Allergy",                          "id":"Imunologi & Alergi"},
-    "疼痛医学":               {"zh_CN":"疼痛医学",         "zh_TW":"疼痛醫學",         "en":"Pain Medicine",                                 "id":"Ilmu Nyeri"},
-    "皮肤及性病科":           {"zh_CN":"皮肤及性病科",     "zh_TW":"皮膚及性病科",     "en":"Dermatology & Venereology",                     "id":"Dermatologi & Venereologi"},
-    "老人科":                 {"zh_CN":"老人科",           "zh_TW":"老人科",           "en":"Geriatrics",                                    "id":"Geriatri"},
-    "社会医学":               {"zh_CN":"社会医学",         "zh_TW":"社會醫學",         "en":"Social Medicine",                               "id":"Kedokteran Sosial"},
-    "中医":                   {"zh_CN":"中医",             "zh_TW":"中醫",             "en":"Traditional Chinese Medicine",                  "id":"Pengobatan Tradisional Tiongkok"},
-    "儿童免疫、过敏及传染病科":{"zh_CN":"儿童免疫、过敏及传染病科","zh_TW":"兒童免疫、過敏及傳染病科","en":"Pediatric Immunology, Allergy & Infectious Diseases","id":"Imunologi Anak, Alergi & Penyakit Infeksi"},
-    "营养学":                 {"zh_CN":"营养学",           "zh_TW":"營養學",           "en":"Nutrition",                                     "id":"Gizi"},
-    "心胸肺外科":             {"zh_CN":"心胸肺外科",       "zh_TW":"心胸肺外科",       "en":"Thoracic Surgery",                              "id":"Bedah Toraks"},
-    "内科肿瘤科":             {"zh_CN":"内科肿瘤科",       "zh_TW":"內科腫瘤科",       "en":"Medical Oncology",                              "id":"Onkologi Medis"},
-    "妇科肿瘤科":             {"zh_CN":"妇科肿瘤科",       "zh_TW":"婦科腫瘤科",       "en":"Gynecologic Oncology",                          "id":"Onkologi Ginekologi"},
-    "解剖病理学":             {"zh_CN":"解剖病理学",       "zh_TW":"解剖病理學",       "en":"Anatomical Pathology",                          "id":"Patologi Anatomi"},
-    "感染及传染病科":         {"zh_CN":"感染及传染病科",   "zh_TW":"感染及傳染病科",   "en":"Infectious Diseases",                           "id":"Penyakit Infeksi"},
-    "法医病理学":             {"zh_CN":"法医病理学",       "zh_TW":"法醫病理學",       "en":"Forensic Pathology",                            "id":"Patologi Forensik"},
-    "生殖医学科":             {"zh_CN":"生殖医学科",       "zh_TW":"生殖醫學科",       "en":"Reproductive Medicine",                         "id":"Kedokteran Reproduksi"},
-    "职业医学":               {"zh_CN":"职业医学",         "zh_TW":"職業醫學",         "en":"Occupational Medicine",                        "id":"Kedokteran Kerja"},
-    "牙周治疗科":             {"zh_CN":"牙周治疗科",       "zh_TW":"牙周治療科",       "en":"Periodontics",                                  "id":"Periodontia"},
-    "修复齿科专科":           {"zh_CN":"修复齿科专科",     "zh_TW":"修復齒科專科",     "en":"Prosthodontics",                                "id":"Prostodonsia"},
-    "口腔颌面外科":           {"zh_CN":"口腔颌面外科",     "zh_TW":"口腔顎面外科",     "en":"Oral & Maxillofacial Surgery",                  "id":"Bedah Mulut & Maksilofasial"},
-}
-
-# 语言映射保持不变
-LANGUAGE_I18N = {
-    "上海话":     {"zh_CN":"上海话",    "zh_TW":"上海話",    "en":"Shanghainese",    "id":"Bahasa Shanghai"},
-    "印尼语":     {"zh_CN":"印尼语",    "zh_TW":"印尼語",    "en":"Indonesian",      "id":"Bahasa Indonesia"},
-    "台湾话":     {"zh_CN":"台湾话",    "zh_TW":"台灣話",    "en":"Taiwanese",       "id":"Bahasa Taiwan"},
-    "客家话":     {"zh_CN":"客家话",    "zh_TW":"客家話",    "en":"Hakka",           "id":"Bahasa Hakka"},
-    "广东话":     {"zh_CN":"广东话",    "zh_TW":"廣東話",    "en":"Cantonese",       "id":"Bahasa Kanton"},
-    "德语":       {"zh_CN":"德语",      "zh_TW":"德語",      "en":"German",          "id":"Bahasa Jerman"},
-    "日语":       {"zh_CN":"日语",      "zh_TW":"日語",      "en":"Japanese",        "id":"Bahasa Jepang"},
-    "普通话":     {"zh_CN":"普通话",    "zh_TW":"普通話",    "en":"Mandarin",        "id":"Bahasa Mandarin"},
-    "法语":       {"zh_CN":"法语",      "zh_TW":"法語",      "en":"French",          "id":"Bahasa Prancis"},
-    "泰语":       {"zh_CN":"泰语",      "zh_TW":"泰語",      "en":"Thai",            "id":"Bahasa Thailand"},
-    "潮州话":     {"zh_CN":"潮州话",    "zh_TW":"潮州話",    "en":"Teochew",         "id":"Bahasa Teochew"},
-    "福州话":     {"zh_CN":"福州话",    "zh_TW":"福州話",    "en":"Fuzhounese",      "id":"Bahasa Fuzhou"},
-    "福建话":     {"zh_CN":"福建话",    "zh_TW":"福建話",    "en":"Hokkien",         "id":"Bahasa Hokkien"},
-    "福建话(厦门)": {"zh_CN":"福建话(厦门)","zh_TW":"福建話(廈門)","en":"Xiamen Hokkien",  "id":"Hokkien Xiamen"},
-    "福建话(闽南)": {"zh_CN":"福建话(闽南)","zh_TW":"福建話(閩南)","en":"Minnan Hokkien",  "id":"Hokkien Minnan"},
-    "英语":       {"zh_CN":"英语",      "zh_TW":"英語",      "en":"English",         "id":"Bahasa Inggris"},
-}
 
-def main():
-    if not os.path.isfile(INPUT):
-        raise FileNotFoundError(f"找不到文件：{INPUT}")
+def specialty_i18n(spec):
+    return DEPARTMENTS.i18n(spec)
 
-    with open(INPUT, "r", encoding="utf-8") as f:
-        clinics = json.load(f)
 
+def language_i18n(lang):
+    return LANGUAGES.i18n(lang)
+
+
+def enrich(clinics, unmapped=None):
+    """原地给每位医生填充 specialty_i18n / languages_i18n；传入 Counter 时统计对照表中没有的名称"""
     for clinic in clinics:
         for doc in clinic.get("doctors", []):
             spec = doc.get("specialty", "").strip()
             # 填充科室 i18n
-            doc["specialty_i18n"] = DEPARTMENT_I18N.get(
-                spec,
-                {"zh_CN": spec, "zh_TW": spec, "en": spec, "id": spec}
-            )
+            doc["specialty_i18n"] = specialty_i18n(spec)
             # 填充语言 i18n
-            langs = doc.get("languages", [])
-            doc["languages_i18n"] = [
-                LANGUAGE_I18N.get(
-                    l.strip(),
-                    {"zh_CN": l, "zh_TW": l, "en": l, "id": l}
-                )
-                for l in langs if l.strip()
-            ]
-
-    with open(OUTPUT, "w", encoding="utf-8") as f:
-        json.dump(clinics, f, ensure_ascii=False, indent=2)
-
-    print(f"已生成多语言文件：{OUTPUT}")
+            langs = [l.strip() for l in doc.get("languages", []) if l.strip()]
+            doc["languages_i18n"] = [language_i18n(l) for l in langs]
+            if unmapped is not None:
+                if spec and DEPARTMENTS.lookup(spec) is None:
+                    unmapped[("specialty", spec)] += 1
+                unmapped.update(("language", l) for l in langs if LANGUAGES.lookup(l) is None)
+    return clinics
+
+
+def print_unmapped(unmapped, top=20):
+    if not unmapped:
+        print("所有科室与语言均有对照")
+        return
+    for kind in ("specialty", "language"):
+        items = sorted(((n, name) for (k, name), n in unmapped.items() if k == kind), reverse=True)
+        if items:
+            print(f"未收录的{'科室' if kind == 'specialty' else '语言'}（{len(items)} 个，按出现次数）：")
+            for n, name in items[:top]:
+                print(f"  {n:>8}  {name}")
+            if len(items) > top:
+                print(f"  …… 另有 {len(items) - top} 个")
+
+
+# ------------------------------------------------------------------
+# 流式模式
+# ------------------------------------------------------------------
+
+def _decode_array(lines):
+    """增量解析 JSON 数组的剩余部分（元素跨多行时）；lines 从数组内部开始"""
+    decoder = json.JSONDecoder()
+    lines = iter(lines)
+    buf, pos, need, eof = "", 0, 1 << 16, False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if len(buf) - pos < need and not eof:
+            more = list(itertools.islice(lines, 1024))
+            eof = not more
+            buf, pos = buf[pos:] + "".join(more), 0
+            continue
+        if pos >= len(buf):
+            raise ValueError("JSON 数组缺少结尾的 ]")
+        if buf[pos] == "]":
+            return
+        try:
+            obj, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            need *= 2   # 元素比缓冲区大，读更多再试
+            continue
+        yield obj
+
+
+def iter_records(f):
+    """
+    逐条读取诊所记录（JSON 数组或 JSONL）。
+    每行一条时 yield 该行文本（由子进程解析），否则 yield 已解析的 dict
+    """
+    first = f.readline()
+    while first and not first.strip():
+        first = f.readline()
+    if not first.lstrip().startswith("["):
+        for line in itertools.chain([first], f):
+            line = line.strip()
+            if line:
+                yield line
+        return
+    lines = itertools.chain([first.lstrip()[1:]], f)
+    for line in lines:
+        text = line.strip()
+        if not text:
+            continue
+        if text == "]":
+            return
+        text = text[:-1].rstrip() if text.endswith(",") else text
+        if text.startswith("{") and text.endswith("}"):
+            yield text
+            continue
+        # 不是每行一条（如 indent=2 的文件）：剩余部分改为增量解析
+        yield from _decode_array(itertools.chain([line], lines))
+        return
+    raise ValueError("JSON 数组缺少结尾的 ]")
+
+
+def process_chunk(records):
+    """子进程：解析、补充多语言名称并序列化一块记录；返回 (每条的 JSON 文本, 未收录名称计数)"""
+    unmapped = Counter()
+    clinics = enrich([json.loads(r) if isinstance(r, str) else r for r in records], unmapped)
+    return [dumps_compact(c) for c in clinics], unmapped
+
+
+def stream_rewrite(input_path, output_path, workers=None, chunk_size=CHUNK_SIZE):
+    """流式补充多语言名称；同时在途的块数不超过 workers × 2，输出顺序与输入相同。返回 (条数, 未收录计数)"""
+    workers = workers or os.cpu_count() or 1
+    jsonl = output_path.endswith(".jsonl")
+    unmapped = Counter()
+    count = 0
+    tmp = output_path + ".tmp"
+
+    def write(texts):
+        nonlocal count
+        for text in texts:
+            if jsonl:
+                fout.write(text + "\n")
+            else:
+                fout.write(("," if count else "") + "\n" + text)
+            count += 1
+
+    with open(input_path, "r", encoding="utf-8") as fin, open(tmp, "w", encoding="utf-8") as fout:
+        if not jsonl:
+            fout.write("[")
+        records = iter_records(fin)
+        chunks = iter(lambda: list(itertools.islice(records, chunk_size)), [])
+        if workers == 1:
+            for chunk in chunks:
+                texts, counts = process_chunk(chunk)
+                write(texts)
+                unmapped.update(counts)
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(process_chunk, chunk))
+                    if len(pending) >= workers * 2:
+                        texts, counts = pending.popleft().result()
+                        write(texts)
+                        unmapped.update(counts)
+                while pending:
+                    texts, counts = pending.popleft().result()
+                    write(texts)
+                    unmapped.update(counts)
+        if not jsonl:
+            fout.write("\n]\n")
+    os.replace(tmp, output_path)
+    return count, unmapped
+
+
+# ------------------------------------------------------------------
+# 规范化数据集
+# ------------------------------------------------------------------
+
+class Interner:
+    """名称 → 整数 id；相同的四语条目只保存一次"""
+
+    def __init__(self, lookup, order):
+        self.lookup = lookup
+        self.order = {name: i for i, name in enumerate(order)}
+        self.ids = {}
+
+    def id(self, name):
+        entry = self.lookup(name)
+        key = entry["zh_CN"]
+        if key not in self.ids:
+            self.ids[key] = entry
+        return key
+
+    def table(self):
+        """按对照表顺序排列（未收录的排在最后），id 在重建之间保持稳定"""
+        keys = sorted(self.ids, key=lambda k: (self.order.get(k, len(self.order)), k))
+        return keys, [[self.ids[k][loc] for loc in LOCALES] for k in keys]
+
+
+def coordinate(value):
+    try:
+        return round(float(value), 6)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize(clinics):
+    """
+    返回规范化数据集：
+    {"locales", "clinic_fields", "doctor_fields", "departments": [[四语名称]], "languages": [[四语名称]],
+     "clinics": [[clinic_id, name, address, phone, lat, lng, [[医生名, 科室 id, [语言 id]]]]]}
+    """
+    depts = Interner(specialty_i18n, DEPARTMENT_I18N)
+    langs = Interner(language_i18n, LANGUAGE_I18N)
+    rows = []
+    for clinic in clinics:
+        doctors = []
+        for doc in clinic.get("doctors", []):
+            spec = depts.id(doc.get("specialty", "").strip())
+            doctors.append([doc.get("name", ""), spec,
+                            [langs.id(l.strip()) for l in doc.get("languages", []) if l.strip()]])
+        rows.append([clinic.get("clinic_id"), clinic.get("name", ""), clinic.get("address", ""),
+                     clinic.get("phone", ""), coordinate(clinic.get("latitude")),
+                     coordinate(clinic.get("longitude")), doctors])
+
+    dept_keys, dept_table = depts.table()
+    lang_keys, lang_table = langs.table()
+    dept_id = {k: i for i, k in enumerate(dept_keys)}
+    lang_id = {k: i for i, k in enumerate(lang_keys)}
+    for row in rows:
+        row[6] = [[name, dept_id[spec], [lang_id[l] for l in ls]] for name, spec, ls in row[6]]
+    return {
+        "locales": list(LOCALES),
+        "clinic_fields": list(CLINIC_FIELDS),
+        "doctor_fields": list(DOCTOR_FIELDS),
+        "departments": dept_table,
+        "languages": lang_table,
+        "clinics": rows,
+    }
+
+
+def locale_slice(dataset, locale):
+    """单语切片：表中只保留一种语言的名称"""
+    i = dataset["locales"].index(locale)
+    return {**dataset, "locales": [locale],
+            "departments": [row[i] for row in dataset["departments"]],
+            "languages": [row[i] for row in dataset["languages"]]}
+
+
+def dumps_compact(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def write_variants(path, text):
+    """写入 path 以及预压缩的 path.gz / path.br，返回 {变体: 字节数}"""
+    raw = text.encode("utf-8")
+    variants = {"raw": raw, "gzip": gzip.compress(raw, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["brotli"] = brotli.compress(raw, quality=11)
+    suffix = {"raw": "", "gzip": ".gz", "brotli": ".br"}
+    for name, data in variants.items():
+        tmp = path + suffix[name] + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path + suffix[name])
+    return {name: len(data) for name, data in variants.items()}
+
+
+def parse_ms(text, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        json.loads(text)
+        best = min(best, time.perf_counter() - started)
+    return best * 1e3
+
+
+def print_report(rows):
+    """rows: [(名称, 文本)]；第一行为对比基准"""
+    base = None
+    print(f"\n{'output':<34}{'raw KB':>9}{'gzip KB':>9}{'br KB':>8}{'parse ms':>10}{'vs base':>9}")
+    for name, text in rows:
+        raw = text.encode("utf-8")
+        gz = len(gzip.compress(raw, compresslevel=9, mtime=0))
+        br = f"{len(brotli.compress(raw, quality=11)) / 1024:>8.1f}" if brotli is not None else f"{'-':>8}"
+        base = base or len(raw)
+        print(f"{name:<34}{len(raw) / 1024:>9.1f}{gz / 1024:>9.1f}{br}{parse_ms(text):>10.2f}"
+              f"{len(raw) / base:>8.0%}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="给诊所数据补上四语科室 / 语言名称")
+    ap.add_argument("-i", "--input", default=INPUT)
+    ap.add_argument("-o", "--output", default=OUTPUT)
+    ap.add_argument("--normalized", nargs="?", const=NORMALIZED_OUTPUT, metavar="PATH",
+                    help=f"另外输出规范化数据集（默认 {NORMALIZED_OUTPUT}）及其 .gz / .br")
+    ap.add_argument("--locales", default="", help="逗号分隔，另外输出这些语言的单语切片，如 zh_TW,en")
+    ap.add_argument("--report", action="store_true", help="对比各输出的大小与解析耗时")
+    ap.add_argument("--stream", action="store_true", help="流式处理大文件（输出为每行一间诊所的紧凑 JSON）")
+    ap.add_argument("--workers", type=int, default=0, help="流式模式的进程数，默认为 CPU 核数")
+    ap.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="流式模式每块的诊所数")
+    args = ap.parse_args()
+
+    if not os.path.isfile(args.input):
+        raise FileNotFoundError(f"找不到文件：{args.input}")
+    locales = [l.strip() for l in args.locales.split(",") if l.strip()]
+    unknown = set(locales) - set(LOCALES)
+    if unknown:
+        ap.error(f"未知语言：{', '.join(sorted(unknown))}（可选 {', '.join(LOCALES)}）")
+
+    if args.stream:
+        if args.normalized:
+            ap.error("--normalized 需要完整的科室 / 语言表，不能与 --stream 同时使用")
+        started = time.perf_counter()
+        count, unmapped = stream_rewrite(args.input, args.output, args.workers, args.chunk_size)
+        print(f"已生成多语言文件：{args.output}（{count} 间诊所，{time.perf_counter() - started:.1f}s）")
+        print_unmapped(unmapped)
+        return
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        clinics = json.load(f)
+
+    unmapped = Counter()
+    enrich(clinics, unmapped)
+    legacy = json.dumps(clinics, ensure_ascii=False, indent=2)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(legacy)
+    print(f"已生成多语言文件：{args.output}")
+    print_unmapped(unmapped)
+
+    if not args.normalized:
+        return
+    dataset = normalize(clinics)
+    outputs = [(args.normalized, dumps_compact(dataset))]
+    root, ext = os.path.splitext(args.normalized)
+    outputs += [(f"{root}.{loc}{ext}", dumps_compact(locale_slice(dataset, loc))) for loc in locales]
+    for path, text in outputs:
+        sizes = write_variants(path, text)
+        print(f"已生成规范化文件：{path}（" + "，".join(f"{k} {v / 1024:.1f} KB" for k, v in sizes.items()) + "）")
+    if brotli is None:
+        print("未安装 brotli，跳过 .br 输出")
+
+    if args.report:
+        print_report([(args.output + " (indent=2)", legacy),
+                      (args.output + " (minified)", dumps_compact(clinics))] + outputs)
+
 
 if __name__ == "__main__":
     main()
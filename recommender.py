@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地科室推薦：不呼叫 LLM，依症狀關鍵詞在幾毫秒內給出排序後的科室與置信度。
+
+- 關鍵詞涵蓋简体 / 繁體（先轉成简体比對）/ English / Bahasa Indonesia
+- 每個關鍵詞的權重為 IDF：越多科室共用的詞權重越低，同一個詞只計一次
+- 關鍵詞前面緊接否定詞（没有 / 不 / no / tidak ...）時不計分
+- 科室鍵與 DEPARTMENT_I18N 的简体鍵一致，輸出格式同 LLM 的 recommended_specialties
+
+用途：專業報告階段失敗時的後備推薦，以及縮短 prompt 中的科室列表。
+"""
+
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 常用醫療用字的繁→简對照（兩字一組）；「疼」統一成「痛」方便比對
+_T2S_PAIRS = (
+    "頭头 體体 發发 燒烧 熱热 嘔呕 噁恶 惡恶 瀉泻 腸肠 嚨咙 膚肤 癢痒 視视 聽听 齒齿 關关 節节 "
+    "腫肿 經经 腦脑 暈晕 婦妇 腎肾 臟脏 悶闷 氣气 壓压 傷伤 頸颈 憂忧 鬱郁 慮虑 兒儿 過过 減减 "
+    "勞劳 顫颤 覺觉 飲饮 陰阴 狀状 頻频 結结 癲癫 癇痫 記记 憶忆 齦龈 脫脱 髮发 紅红 瘡疮 濕湿 "
+    "膽胆 劇剧 續续 斷断 難难 驚惊 膿脓 瘍疡 潰溃 帶带 脹胀 藥药 沒没 無无 醫医 療疗 聲声 啞哑 "
+    "緊紧 張张 乾干 蟲虫 嚴严 腳脚 黃黄 產产 懷怀 嬰婴 閉闭 蕁荨 復复 聾聋 鳴鸣 淚泪 蝕蚀 顎颚 "
+    "壞坏 攣挛 癱瘫 瘓痪 語语 識识 亂乱 風风 營营 養养 餓饿 飢饥 貧贫 寶宝 長长 試试 針针 "
+    "內内 調调 禍祸 滿满 塊块 闌阑 痠酸 喪丧 殺杀 線线 級级 邊边 類类 統统 傳传 臨临 車车 蓋盖 竇窦 頜颌 緒绪 適适 祕秘 齊齐 疼痛"
+)
+_T2S = str.maketrans({pair[0]: pair[1] for pair in _T2S_PAIRS.split()})
+
+_NEGATORS_CJK = ("没有", "没", "无", "不", "未", "否认")
+_NEGATORS_LATIN = ("no", "not", "without", "never", "tidak", "tanpa", "bukan", "tak")
+
+# 科室 → 症狀 / 科室名關鍵詞（简体、English、Bahasa Indonesia；English 與印尼文小寫）
+KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "内科": (
+        "发烧", "发热", "乏力", "疲劳", "体重下降", "感冒", "全身不适", "内科",
+        "fever", "fatigue", "tired", "weight loss", "malaise", "flu", "internal medicine",
+        "demam", "lelah", "lemas", "berat badan turun", "penyakit dalam",
+    ),
+    "肠胃肝脏科": (
+        "胃痛", "腹痛", "肚子痛", "腹泻", "拉肚子", "便秘", "恶心", "呕吐", "反酸", "烧心", "胃胀",
+        "腹胀", "便血", "黑便", "黄疸", "肝", "消化不良", "胃",
+        "stomach", "abdominal pain", "diarrhea", "diarrhoea", "constipation", "nausea", "vomiting",
+        "heartburn", "acid reflux", "bloating", "jaundice", "liver", "indigestion",
+        "gastroenterology", "sakit perut", "nyeri perut", "diare", "mencret", "sembelit", "mual",
+        "muntah", "maag", "kembung", "sakit kuning", "hati", "lambung",
+    ),
+    "呼吸系统科": (
+        "咳嗽", "咳痰", "气短", "气喘", "呼吸困难", "哮喘", "胸闷", "痰", "肺",
+        "cough", "shortness of breath", "wheezing", "asthma", "phlegm", "breathing", "lung",
+        "respiratory", "batuk", "sesak napas", "sesak nafas", "asma", "dahak", "paru",
+    ),
+    "心脏科": (
+        "心悸", "心慌", "胸痛", "心跳", "心律不齐", "高血压", "血压高", "胸口痛", "心脏",
+        "palpitation", "palpitations", "chest pain", "heart", "irregular heartbeat",
+        "high blood pressure", "hypertension", "cardiology",
+        "jantung berdebar", "nyeri dada", "sakit dada", "jantung", "darah tinggi", "hipertensi",
+    ),
+    "脑神经科": (
+        "头痛", "头晕", "眩晕", "麻木", "抽搐", "癫痫", "记忆力", "中风", "偏头痛", "手抖", "颤抖",
+        "headache", "dizziness", "dizzy", "vertigo", "numbness", "seizure", "epilepsy", "memory",
+        "stroke", "migraine", "tremor", "neurology",
+        "sakit kepala", "pusing", "kesemutan", "kejang", "epilepsi", "migrain", "gemetar", "saraf",
+    ),
+    "耳鼻喉科": (
+        "喉咙痛", "咽喉痛", "嗓子", "喉咙", "耳痛", "耳鸣", "听力", "鼻塞", "流鼻涕", "鼻出血",
+        "声音嘶哑", "扁桃体", "鼻窦", "耳朵",
+        "sore throat", "throat", "ear pain", "earache", "tinnitus", "hearing loss", "stuffy nose",
+        "runny nose", "nosebleed", "hoarse", "tonsil", "sinus", "ent",
+        "sakit tenggorokan", "tenggorokan", "sakit telinga", "telinga berdenging", "pendengaran",
+        "hidung tersumbat", "pilek", "mimisan", "suara serak", "amandel", "telinga",
+    ),
+    "眼科": (
+        "眼睛", "视力", "视物模糊", "看不清", "眼痛", "眼红", "红眼", "流泪", "眼干",
+        "eye", "eyes", "vision", "blurry vision", "blurred vision", "red eye", "ophthalmology",
+        "mata", "penglihatan", "pandangan kabur", "mata merah", "mata kering",
+    ),
+    "皮肤及性病科": (
+        "皮疹", "红疹", "起疹", "瘙痒", "皮肤痒", "湿疹", "痘", "青春痘", "脱发", "荨麻疹", "皮肤", "性病",
+        "rash", "itchy", "itching", "eczema", "acne", "hair loss", "hives", "skin", "dermatology",
+        "ruam", "gatal", "eksim", "jerawat", "rambut rontok", "biduran", "kulit",
+    ),
+    "骨科": (
+        "骨折", "扭伤", "关节痛", "膝盖痛", "膝盖", "腰痛", "背痛", "颈椎", "肩膀痛", "脚踝", "骨头",
+        "fracture", "sprain", "joint pain", "knee", "back pain", "neck pain", "shoulder pain",
+        "ankle", "bone", "orthopedic", "orthopaedic",
+        "patah tulang", "keseleo", "nyeri sendi", "sakit lutut", "lutut", "sakit pinggang",
+        "sakit punggung", "sakit leher", "tulang",
+    ),
+    "妇产科": (
+        "月经", "痛经", "怀孕", "妊娠", "阴道", "白带", "经期", "闭经",
+        "period", "menstrual", "pregnant", "pregnancy", "vaginal", "missed period", "gynecology",
+        "haid", "menstruasi", "hamil", "kehamilan", "keputihan",
+    ),
+    "泌尿外科": (
+        "尿频", "尿急", "尿痛", "血尿", "排尿", "前列腺", "结石", "肾结石",
+        "frequent urination", "painful urination", "blood in urine", "prostate", "kidney stone",
+        "urology", "sering kencing", "nyeri saat kencing", "kencing berdarah", "prostat", "batu ginjal",
+    ),
+    "肾病科": (
+        "肾", "水肿", "浮肿", "蛋白尿", "肾功能",
+        "kidney", "swelling", "edema", "oedema", "protein in urine", "nephrology",
+        "ginjal", "bengkak",
+    ),
+    "内分泌及糖尿科": (
+        "糖尿病", "血糖", "口渴", "多饮", "多尿", "甲状腺", "消瘦",
+        "diabetes", "blood sugar", "thirst", "thirsty", "thyroid", "endocrinology",
+        "gula darah", "kencing manis", "haus", "tiroid",
+    ),
+    "精神科": (
+        "抑郁", "忧郁", "焦虑", "失眠", "幻觉", "情绪低落", "自杀", "躁狂",
+        "depression", "depressed", "anxiety", "insomnia", "hallucination", "suicidal", "psychiatry",
+        "depresi", "cemas", "kecemasan", "susah tidur", "halusinasi",
+    ),
+    "临床心理学": (
+        "压力", "心理", "情绪", "紧张",
+        "stress", "psychological", "emotional", "psychology",
+        "stres", "psikologis", "emosi",
+    ),
+    "儿科": (
+        "小孩", "孩子", "宝宝", "婴儿", "儿童",
+        "child", "baby", "infant", "toddler", "kid", "pediatric", "paediatric",
+        "anak", "bayi", "balita",
+    ),
+    "牙科": (
+        "牙痛", "牙齿", "牙龈", "蛀牙", "牙龈出血", "牙",
+        "toothache", "tooth", "teeth", "gum", "gums", "cavity", "dentist", "dental",
+        "sakit gigi", "gigi", "gusi", "gigi berlubang",
+    ),
+    "风湿病科": (
+        "关节肿", "晨僵", "痛风", "类风湿", "红斑狼疮", "风湿",
+        "gout", "rheumatoid", "lupus", "morning stiffness", "swollen joints", "rheumatology",
+        "asam urat", "rematik", "sendi bengkak",
+    ),
+    "免疫及过敏病科": (
+        "过敏", "花粉", "过敏性",
+        "allergy", "allergic", "pollen", "alergi", "serbuk sari",
+    ),
+    "感染及传染病科": (
+        "传染", "感染", "化脓", "高烧不退",
+        "infection", "infected", "contagious", "infeksi", "menular",
+    ),
+    "急症科": (
+        "昏迷", "大出血", "晕倒", "昏倒", "车祸", "严重外伤",
+        "unconscious", "fainted", "severe bleeding", "accident", "emergency",
+        "pingsan", "pendarahan hebat", "kecelakaan", "darurat",
+    ),
+    "外科": (
+        "伤口", "肿块", "疝气", "阑尾", "割伤",
+        "wound", "lump", "hernia", "appendicitis", "cut", "surgery",
+        "luka", "benjolan", "usus buntu", "bedah",
+    ),
+    "疼痛医学": ("慢性疼痛", "长期痛", "chronic pain", "nyeri kronis"),
+    "物理治疗": (
+        "康复", "复健", "肌肉拉伤",
+        "rehabilitation", "physiotherapy", "muscle strain", "rehabilitasi", "fisioterapi",
+    ),
+    "临床肿瘤科": ("肿瘤", "癌", "化疗", "tumor", "tumour", "cancer", "chemotherapy", "kanker", "kemoterapi"),
+    "血液及血液肿瘤科": (
+        "贫血", "出血不止", "淤青", "瘀斑", "白血病",
+        "anemia", "anaemia", "bruising", "leukemia", "kurang darah", "memar",
+    ),
+    "老人科": ("老人", "老年", "长者", "失智", "elderly", "dementia", "lansia", "orang tua", "demensia"),
+    "营养学": ("营养", "减肥", "肥胖", "饮食", "nutrition", "diet", "obesity", "overweight", "gizi", "obesitas"),
+    "中医": ("中医", "针灸", "调理", "acupuncture", "akupunktur"),
+    "生殖医学科": ("不孕", "不育", "试管婴儿", "infertility", "ivf", "mandul", "infertilitas", "bayi tabung"),
+    "整形外科": ("整形", "疤痕", "烧伤", "scar", "burn", "cosmetic", "bekas luka", "luka bakar"),
+    "口腔颌面外科": ("下巴", "颌", "智齿", "jaw", "wisdom tooth", "rahang", "gigi bungsu"),
+}
+
+# 沒有任何關鍵詞命中時的推薦，以及縮短科室列表時一律保留的綜合科室
+DEFAULT_DEPARTMENT = "内科"
+GENERAL_DEPARTMENTS = ("内科", "普通科", "家庭医学", "急症科")
+
+
+def normalize(text: str) -> str:
+    """繁→简、轉小寫，讓各語言的輸入可以直接用關鍵詞比對"""
+    return text.translate(_T2S).lower()
+
+
+def consultation_text(history: Iterable[dict]) -> str:
+    """只取使用者訊息與 system（壓縮摘要）；AI 的提問會提到使用者否認的症狀"""
+    return "\n".join(
+        str(m.get("content", "")) for m in history if m.get("role") in ("user", "system")
+    )
+
+
+def _is_cjk(word: str) -> bool:
+    return any("一" <= ch <= "鿿" for ch in word)
+
+
+class DepartmentRecommender:
+    def __init__(self, keywords: Optional[Dict[str, Iterable[str]]] = None) -> None:
+        keywords = KEYWORDS if keywords is None else keywords
+        self.departments = list(keywords)
+        owners: Dict[str, List[str]] = {}
+        for dept, words in keywords.items():
+            for word in words:
+                owners.setdefault(normalize(word), [])
+                if dept not in owners[normalize(word)]:
+                    owners[normalize(word)].append(dept)
+        n = len(self.departments)
+        self._owners = owners
+        self._weight = {w: math.log(1 + n / len(d)) for w, d in owners.items()}
+        # 一條正則一次掃描全文；長詞優先，英文 / 印尼文加詞邊界
+        parts = [
+            re.escape(w) if _is_cjk(w) else rf"\b{re.escape(w)}\b"
+            for w in sorted(owners, key=len, reverse=True)
+        ]
+        self._pattern = re.compile("|".join(parts))
+        self._negation = re.compile(
+            r"(?:%s)\s*$|\b(?:%s)\s+(?:\w+\s+)?$" % ("|".join(_NEGATORS_CJK), "|".join(_NEGATORS_LATIN))
+        )
+
+    def scores(self, text: str) -> Dict[str, float]:
+        text = normalize(text)
+        seen = set()
+        out: Dict[str, float] = {}
+        for m in self._pattern.finditer(text):
+            word = m.group(0)
+            if word in seen or self._negation.search(text[max(0, m.start() - 12):m.start()]):
+                continue
+            seen.add(word)
+            for dept in self._owners[word]:
+                out[dept] = out.get(dept, 0.0) + self._weight[word]
+        return out
+
+    def recommend(self, text: str, top_k: int = 3) -> List[Dict[str, int]]:
+        """回傳 [{"科目": ..., "置信度": ...}]，置信度總和為 100（與 professional prompt 的要求相同）"""
+        ranked = sorted(self.scores(text).items(), key=lambda kv: -kv[1])[:top_k]
+        if not ranked:
+            return [{"科目": DEFAULT_DEPARTMENT, "置信度": 100}]
+        total = sum(s for _, s in ranked)
+        confidences = [int(round(100 * s / total)) for _, s in ranked]
+        confidences[0] += 100 - sum(confidences)
+        return [{"科目": d, "置信度": c} for (d, _), c in zip(ranked, confidences)]
+
+    def shortlist(self, text: str, n: int, always: Iterable[str] = GENERAL_DEPARTMENTS) -> List[str]:
+        """得分最高的 n 個科室，再加上一律保留的綜合科室"""
+        ranked = [d for d, _ in sorted(self.scores(text).items(), key=lambda kv: -kv[1])[:n]]
+        return ranked + [d for d in always if d not in ranked]
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+伺服器端對話 session。
+
+每個 session 保存語言、只增不改的 turns，以及壓縮狀態：
+summary 為 turns[:summary_upto] 的滾動臨床摘要，送給模型的 history
+只包含摘要 + summary_upto 之後的 turns。
+
+資料放在 SQLite；預設是行程內的記憶體資料庫，設定檔案路徑後
+可由多個 worker 共用。行程內所有存取共用一條連線並以鎖串行化。
+"""
+
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    " id TEXT PRIMARY KEY, lang TEXT NOT NULL, summary TEXT NOT NULL DEFAULT '',"
+    " summary_upto INTEGER NOT NULL DEFAULT 0, refusal_times INTEGER NOT NULL DEFAULT 0,"
+    " created REAL NOT NULL, updated REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS turns ("
+    " session_id TEXT NOT NULL, idx INTEGER NOT NULL, role TEXT NOT NULL,"
+    " content TEXT NOT NULL, created REAL NOT NULL, PRIMARY KEY (session_id, idx))",
+)
+
+class SessionStore:
+    def __init__(self, path: str = ":memory:", ttl: float = 86400.0) -> None:
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        for stmt in _SCHEMA:
+            self._conn.execute(stmt)
+        self._last_purge = 0.0
+
+    # -------------------------------------------------------------- #
+
+    def create(self, lang: str) -> str:
+        self._purge_expired()
+        sid = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (id, lang, created, updated) VALUES (?, ?, ?, ?)",
+                (sid, lang, now, now)
+            )
+        return sid
+
+    def get(self, sid: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT lang, summary, summary_upto, refusal_times, updated FROM sessions WHERE id = ?",
+                (sid,)
+            ).fetchone()
+            if row is None or time.time() - row[4] > self.ttl:
+                return None
+            turns = [
+                {"role": role, "content": content}
+                for role, content in self._conn.execute(
+                    "SELECT role, content FROM turns WHERE session_id = ? ORDER BY idx", (sid,)
+                )
+            ]
+        return {"session_id": sid, "lang": row[0], "summary": row[1], "summary_upto": row[2],
+                "refusal_times": row[3], "turns": turns}
+
+    def append(self, sid: str, role: str, content: str) -> int:
+        """追加一則 turn，回傳其索引"""
+        now = time.time()
+        with self._lock:
+            db = self._conn
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                idx = db.execute(
+                    "SELECT COUNT(*) FROM turns WHERE session_id = ?", (sid,)
+                ).fetchone()[0]
+                db.execute(
+                    "INSERT INTO turns (session_id, idx, role, content, created) VALUES (?, ?, ?, ?, ?)",
+                    (sid, idx, role, content, now)
+                )
+                db.execute("UPDATE sessions SET updated = ? WHERE id = ?", (now, sid))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return idx
+
+    def update(self, sid: str, **fields: Any) -> None:
+        allowed = {"lang", "summary", "summary_upto", "refusal_times"}
+        cols = [k for k in fields if k in allowed]
+        if not cols:
+            return
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE sessions SET {', '.join(f'{c} = ?' for c in cols)}, updated = ? WHERE id = ?",
+                [fields[c] for c in cols] + [time.time(), sid]
+            )
+
+    def _purge_expired(self) -> None:
+        now = time.time()
+        if now - self._last_purge < 600:
+            return
+        self._last_purge = now
+        cutoff = now - self.ttl
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM turns WHERE session_id IN (SELECT id FROM sessions WHERE updated < ?)", (cutoff,)
+            )
+            self._conn.execute("DELETE FROM sessions WHERE updated < ?", (cutoff,))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+相同 LLM 請求的合併（single-flight）。
+
+同一個鍵（正規化 messages 的雜湊）已有請求在途時，後到者不再呼叫上游，
+而是等待第一個請求（leader）的結果；leader 失敗時所有等待者拿到同一個例外。
+共用的是 concurrent.futures.Future，所以執行緒與事件迴圈上的呼叫可以互相合併。
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._counters = {"upstream_calls": 0, "saved_calls": 0}
+
+    def claim(self, key: str) -> Tuple[Future, bool]:
+        """回傳 (future, 是否為 leader)；leader 完成後必須呼叫 finish()"""
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self._counters["saved_calls"] += 1
+                return fut, False
+            fut = self._inflight[key] = Future()
+            self._counters["upstream_calls"] += 1
+            return fut, True
+
+    def finish(self, key: str, fut: Future, result: Any = None, error: BaseException | None = None) -> None:
+        with self._lock:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+        if error is None:
+            fut.set_result(result)
+        elif isinstance(error, Exception):
+            fut.set_exception(error)
+        else:
+            # leader 被取消（如客戶端斷線）時不把 CancelledError 傳給其他等待者
+            fut.set_exception(RuntimeError("coalesced LLM call was cancelled"))
+
+    def do(self, key: str, fn: Callable[..., Any], *args: Any) -> Tuple[Any, bool]:
+        """執行或等待 fn(*args)；回傳 (結果, 是否沿用了其他請求的結果)"""
+        fut, leader = self.claim(key)
+        if not leader:
+            return fut.result(), True
+        try:
+            out = fn(*args)
+        except BaseException as e:
+            self.finish(key, fut, error=e)
+            raise
+        self.finish(key, fut, out)
+        return out, False
+
+    async def ado(self, key: str, fn: Callable[..., Awaitable[Any]], *args: Any) -> Tuple[Any, bool]:
+        fut, leader = self.claim(key)
+        if not leader:
+            # shield：等待者被取消時不要連帶取消共用的 Future
+            return await asyncio.shield(asyncio.wrap_future(fut)), True
+        try:
+            out = await fn(*args)
+        except BaseException as e:
+            self.finish(key, fut, error=e)
+            raise
+        self.finish(key, fut, out)
+        return out, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counters)
+            out["in_flight"] = len(self._inflight)
+        return out
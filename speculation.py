@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+推測式背景任務。
+
+在確定需要之前先把可能用到的 LLM 呼叫丟到執行緒池執行，結果以字串鍵保存；
+需要時 take() 取出 Future，確定用不到時 discard()。每個任務可掛在一個
+「分組鍵」下，方便在對話走向改變時一次丟棄。
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+
+class SpeculativeJobs:
+    def __init__(self, max_workers: int = 8, ttl: float = 600.0) -> None:
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Tuple[float, Optional[str], Future]] = {}
+        self._groups: Dict[str, str] = {}
+        self._counters = {"started": 0, "used": 0, "discarded": 0, "expired": 0, "failed": 0}
+
+    def start(self, key: str, fn: Callable[..., Any], *args: Any, group: Optional[str] = None) -> None:
+        """背景執行 fn(*args)；同一 key 已有任務時先丟棄舊的"""
+        self._expire()
+        fut = self._pool.submit(fn, *args)
+        with self._lock:
+            old = self._jobs.pop(key, None)
+            self._jobs[key] = (time.monotonic(), group, fut)
+            if group is not None:
+                self._groups[group] = key
+            self._counters["started"] += 1
+            if old is not None:
+                self._counters["discarded"] += 1
+        if old is not None:
+            old[2].cancel()
+
+    def take(self, key: str) -> Optional[Future]:
+        with self._lock:
+            entry = self._jobs.pop(key, None)
+            if entry is None:
+                return None
+            created, group, fut = entry
+            if group is not None and self._groups.get(group) == key:
+                del self._groups[group]
+            if time.monotonic() - created > self.ttl:
+                self._counters["expired"] += 1
+                fut.cancel()
+                return None
+            self._counters["used"] += 1
+        return fut
+
+    def release(self, fut: Future) -> None:
+        """take() 取出後最終沒有用上的任務（例如分析階段失敗）：取消，並改記為 discarded"""
+        with self._lock:
+            self._counters["used"] -= 1
+            self._counters["discarded"] += 1
+        fut.cancel()
+
+    def discard(self, key: str) -> bool:
+        with self._lock:
+            entry = self._jobs.pop(key, None)
+            if entry is None:
+                return False
+            if entry[1] is not None and self._groups.get(entry[1]) == key:
+                del self._groups[entry[1]]
+            self._counters["discarded"] += 1
+        entry[2].cancel()   # 尚未開始的任務直接取消，已在執行的結果會被丟棄
+        return True
+
+    def discard_groups(self, groups: Iterable[str]) -> int:
+        """丟棄掛在任一分組鍵下的任務，回傳丟棄數"""
+        with self._lock:
+            keys = [self._groups[g] for g in groups if g in self._groups]
+        return sum(self.discard(k) for k in keys)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._counters["failed"] += 1
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            stale = [k for k, (created, _, _) in self._jobs.items() if now - created > self.ttl]
+        for k in stale:
+            if self.discard(k):
+                with self._lock:
+                    self._counters["discarded"] -= 1
+                    self._counters["expired"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counters)
+            out["pending"] = len(self._jobs)
+        return out
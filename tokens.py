@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 token 估算。
+
+不依賴 tokenizer，按 DeepSeek 文件給出的經驗比例估算：
+1 個中日韓字元 ≈ 0.6 token，1 個其他字元 ≈ 0.3 token；每則訊息另加固定開銷。
+"""
+
+import re
+from typing import List, Tuple
+
+_CJK = re.compile(r"[　-〿㐀-䶿一-鿿豈-﫿＀-￯]")
+
+CJK_TOKENS_PER_CHAR = 0.6
+OTHER_TOKENS_PER_CHAR = 0.3
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return int(cjk * CJK_TOKENS_PER_CHAR + (len(text) - cjk) * OTHER_TOKENS_PER_CHAR + 0.5)
+
+
+def estimate_messages_tokens(messages: List[dict]) -> int:
+    return sum(MESSAGE_OVERHEAD_TOKENS + estimate_tokens(str(m.get("content", ""))) for m in messages)
+
+
+def trim_to_budget(messages: List[dict], budget: int) -> Tuple[List[dict], int]:
+    """
+    從最舊的非 system 訊息開始刪，直到估算值不超過 budget；至少保留最後一則訊息。
+    刪完後若第一則對話訊息是 assistant 也一併刪除，保持以使用者訊息開頭。
+    回傳 (裁剪後的訊息, 刪除條數)。
+    """
+    total = estimate_messages_tokens(messages)
+    if budget <= 0 or total <= budget:
+        return messages, 0
+    system = [m for m in messages if m.get("role") == "system"]
+    dialog = [m for m in messages if m.get("role") != "system"]
+    dropped = 0
+    while len(dialog) > 1 and (total > budget or dialog[0].get("role") == "assistant"):
+        total -= MESSAGE_OVERHEAD_TOKENS + estimate_tokens(str(dialog[0].get("content", "")))
+        dialog.pop(0)
+        dropped += 1
+    return system + dialog, dropped